@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from models import db, User
 from forms import RegisterForm
@@ -86,3 +86,13 @@ def delete_user(user_id):
     db.session.commit()
     flash('User deleted successfully.', 'success')
     return redirect(url_for('admin.users'))
+
+@admin.route('/model-usage')
+@login_required
+def model_usage():
+    """Per-tier LLM call counts, tokens, estimated cost and latency percentiles."""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied.', 'code': 'FORBIDDEN'}), 403
+
+    from agents.model_router import usage_summary
+    return jsonify({'success': True, 'tiers': usage_summary()})
@@ -0,0 +1,22 @@
+from utils.app_runner import AppStartError, release, serve
+
+def launch_app(state):
+    """
+    Code generation stage: run the uploaded project with the generated feature
+    applied, so the test script is written and executed against a live app.
+    """
+    if not state.extracted_code or not state.generated_code:
+        return {"app_url": None, "app_status": None}
+    try:
+        url, info = serve(state.extracted_code, state.generated_code, state.framework)
+    except AppStartError as e:
+        return {"app_url": None, "app_status": f"The app could not be started: {e}"}
+    changed = f", {len(info['changed'])} files swapped" if info['changed'] else ""
+    return {"app_url": url, "app_lease": info['lease'],
+            "app_status": f"Running at {url} ({info['mode']} start in {info['seconds']:.1f}s{changed})."}
+
+def release_app(state):
+    """Code generation stage after the test ran: the app server may now be swapped or stopped."""
+    if state.app_lease:
+        release(state.app_lease)
+    return {"app_lease": None}
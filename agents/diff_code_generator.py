@@ -0,0 +1,145 @@
+"""
+Diff-based code generation.
+
+The model is shown the uploaded project and answers with a unified diff
+instead of whole files, so a one-route change to a large routes.py costs a
+few dozen output tokens rather than the whole file. The diff is applied
+locally with utils.patch_apply; a diff that does not apply goes back to the
+model once with the problems, and if that fails too the whole-file generator
+runs instead. The integration guide is then derived from the applied diff
+without another model call.
+"""
+
+import os
+from utils.patch_apply import PatchError, apply_patch
+
+OUTPUT_FORMAT = (os.environ.get('PW_CODEGEN_OUTPUT') or 'diff').lower()
+CONTEXT_CHARS = int(os.environ.get('PW_CODEGEN_CONTEXT_CHARS') or 120000)
+# Files the model may need to read to write a correct diff, most useful first
+CONTEXT_EXTENSIONS = ('.py', '.html', '.css', '.js', '.txt', '.cfg', '.toml', '.ini')
+# Modules whose added lines fill the whole-file generator's per-kind keys
+CODE_KEYS = {'routes.py': 'routes_code', 'views.py': 'routes_code', 'models.py': 'models_code', 'forms.py': 'forms_code'}
+
+DIFF_PROMPT = """You are adding a feature to an existing {framework} project.
+Requirement:
+{requirement}
+
+Project files (path, then content):
+{project}
+
+Answer with a single unified diff (`diff -u` format, paths relative to the project root with a/ and b/ prefixes)
+that implements the requirement: new routes, templates, CSS, JS, models and forms as needed.
+- Create new files with `--- /dev/null` and `+++ b/<path>`.
+- Modify existing files with hunks that copy their context lines exactly from the files above.
+- Follow the project's structure and conventions (blueprints, base templates, static folders).
+Output only the diff, no explanations."""
+
+RETRY_PROMPT = """Your previous diff did not apply:
+{problems}
+
+Previous diff:
+{patch}
+
+Answer with a corrected unified diff for the whole feature. Copy context lines exactly from the project files."""
+
+def project_context(extracted_code, budget=CONTEXT_CHARS):
+    """Project files for the prompt, source files first, within `budget` characters."""
+    paths = sorted(extracted_code or {}, key=lambda p: (not p.endswith(CONTEXT_EXTENSIONS), p.count('/'), p))
+    parts, skipped = [], []
+    for path in paths:
+        content = str(extracted_code[path])
+        if not path.endswith(CONTEXT_EXTENSIONS) or len(content) > budget:
+            skipped.append(path)
+            continue
+        parts.append(f"=== {path} ===\n{content}")
+        budget -= len(content)
+    if skipped:
+        parts.append("Other files (content not shown): " + ", ".join(skipped))
+    return "\n\n".join(parts)
+
+def _added(change):
+    return "\n".join(line for hunk in change['hunks'] for line in hunk['added'])
+
+def to_generated_code(files, changes, patch):
+    """
+    generated_code for a diff: the patch itself, the full content of every touched
+    file (None for deleted ones) and the per-kind keys the templates and history show.
+    """
+    generated = {'patch': patch, 'files': {c['path']: files.get(c['path']) for c in changes},
+                 'routes_code': '', 'template_code': {}, 'css_code': {}, 'js_code': {},
+                 'models_code': '', 'forms_code': ''}
+    for change in changes:
+        path, name = change['path'], os.path.basename(change['path'])
+        if change['action'] == 'delete':
+            continue
+        if path.endswith('.html'):
+            generated['template_code'][name] = files[path]
+        elif path.endswith(('.css', '.js')):
+            generated['css_code' if path.endswith('.css') else 'js_code'][name] = files[path]
+        elif name in CODE_KEYS:
+            key = CODE_KEYS[name]
+            code = files[path] if change['action'] == 'create' else _added(change)
+            generated[key] = f"{generated[key]}\n\n{code}".strip()
+    return generated
+
+def _strip_fences(text):
+    text = (text or '').strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit('```', 1)[0]
+    return text.strip() + '\n'
+
+def generate_code_diff(state):
+    """Code generator node: ask for a unified diff and apply it to the extracted project."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from agents.model_router import get_llm
+
+    llm = get_llm()
+    values = {"framework": state.framework or "Flask", "requirement": state.requirement,
+              "project": project_context(state.extracted_code)}
+    patch = _strip_fences((ChatPromptTemplate.from_template(DIFF_PROMPT) | llm).invoke(values).content)
+    try:
+        files, changes = apply_patch(state.extracted_code, patch)
+    except PatchError as e:
+        retry = ChatPromptTemplate.from_template(DIFF_PROMPT + "\n\n" + RETRY_PROMPT)
+        patch = _strip_fences((retry | llm).invoke(dict(values, problems=str(e), patch=patch)).content)
+        try:
+            files, changes = apply_patch(state.extracted_code, patch)
+        except PatchError:
+            from agents.code_generator import generate_code
+            return generate_code(state)
+    return {"generated_code": to_generated_code(files, changes, patch)}
+
+def integration_guide_from_changes(changes):
+    """Step-by-step integration instructions for an applied diff."""
+    steps = []
+    for change in changes:
+        path = change['path']
+        if change['action'] == 'create':
+            steps.append(f"Create `{path}` (full content under Generated Code).")
+        elif change['action'] == 'delete':
+            steps.append(f"Delete `{path}`.")
+        for hunk in change['hunks']:
+            where = f"at line {hunk['line']}" + (f" (near `{hunk['anchor'].strip()}`)" if hunk['anchor'] else "")
+            if hunk['removed'] and hunk['added']:
+                action = f"replace {len(hunk['removed'])} line(s) with"
+            elif hunk['removed']:
+                action = f"remove {len(hunk['removed'])} line(s)"
+            else:
+                action = "add"
+            body = "\n".join(hunk['added'] or hunk['removed'])
+            steps.append(f"In `{path}` {where}, {action}:\n```\n{body}\n```")
+    lines = ["Integration Guide (derived from the generated diff):"]
+    lines += [f"{number}. {step}" for number, step in enumerate(steps, 1)]
+    lines.append("Or apply the whole change at once from the project root: save the diff as feature.patch and run `git apply feature.patch`.")
+    return "\n".join(lines)
+
+def integration_guide_node(fallback):
+    """Integration guide node: derive the guide from the diff, or call `fallback` for whole-file output."""
+    def run(state):
+        patch = (state.generated_code or {}).get('patch')
+        if not patch:
+            return fallback(state)
+        _, changes = apply_patch(state.extracted_code, patch)
+        return {"integration_instructions": integration_guide_from_changes(changes)}
+    return run
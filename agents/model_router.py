@@ -0,0 +1,163 @@
+"""
+Model tiers for the LLM agents.
+
+Graph nodes are wrapped with `routed(agent, node)`, which picks a tier from the
+agent and the job's state, and agents build their chat model with `get_llm()`,
+which returns the model of the current node's tier. Short or predefined
+requirements and stats commentary go to the fast tier; code generation,
+debugging and anything after a failed run go to the strong tier. Every call's
+latency, tokens and estimated cost are accounted per tier in Redis.
+"""
+
+import contextvars
+import os
+import time
+import redis
+from langchain_core.callbacks import BaseCallbackHandler
+from config import PREDEFINED_REQUIREMENTS
+from extensions import redis_client
+
+# Prices are USD per million input/output tokens
+TIERS = {
+    'fast': {'model': os.environ.get('PW_MODEL_FAST') or 'gemini-2.5-flash-lite', 'input_cost': 0.10, 'output_cost': 0.40},
+    'standard': {'model': os.environ.get('PW_MODEL_STANDARD') or 'gemini-2.5-flash', 'input_cost': 0.30, 'output_cost': 2.50},
+    'strong': {'model': os.environ.get('PW_MODEL_STRONG') or 'gemini-2.5-pro', 'input_cost': 1.25, 'output_cost': 10.00}
+}
+DEFAULT_TIER = 'standard'
+STRONG_AGENTS = {'code_generator', 'debug'}
+FAST_AGENTS = {'stats_commentary'}
+SHORT_REQUIREMENT_CHARS = int(os.environ.get('PW_SHORT_REQUIREMENT_CHARS') or 160)
+
+USAGE_PREFIX = 'modelusage:'
+LATENCY_SAMPLES = 500
+
+_current = contextvars.ContextVar('model_route', default=None)
+
+def _normalize(text):
+    return ' '.join((text or '').lower().split())
+
+def is_predefined(requirement):
+    """True when the requirement is one of the generate form's predefined requirements."""
+    return _normalize(requirement) in {_normalize(text) for text in PREDEFINED_REQUIREMENTS.values()}
+
+def choose_tier(agent, state=None):
+    """Tier for one agent call, given the job state it runs on."""
+    if agent in STRONG_AGENTS:
+        return 'strong'
+    if agent in FAST_AGENTS:
+        return 'fast'
+    # Once a run has failed, every further attempt gets the strongest model
+    if state is not None and state.execution_result and "[FAIL]" in state.execution_result:
+        return 'strong'
+    if agent == 'script' and state is not None:
+        requirement = state.requirement or ''
+        if len(requirement) <= SHORT_REQUIREMENT_CHARS or is_predefined(requirement):
+            return 'fast'
+    return DEFAULT_TIER
+
+def routed(agent, node):
+    """Wrap a graph node so get_llm() calls made while it runs use the tier chosen for it."""
+    def run(state):
+        token = _current.set((agent, choose_tier(agent, state)))
+        try:
+            return node(state)
+        finally:
+            _current.reset(token)
+    return run
+
+def current_route():
+    """(agent, tier) of the node running in this context, or None outside a routed node."""
+    return _current.get()
+
+def get_llm(agent=None, tier=None, temperature=0, **kwargs):
+    """Chat model for the current node's tier, with usage accounting attached."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    route_agent, route_tier = _current.get() or (None, None)
+    agent = agent or route_agent or 'unrouted'
+    tier = tier or route_tier or choose_tier(agent)
+    return ChatGoogleGenerativeAI(
+        model=TIERS[tier]['model'],
+        temperature=temperature,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        callbacks=[UsageRecorder(agent, tier)],
+        **kwargs
+    )
+
+def estimate_tokens(text):
+    # Gemini averages about four characters per token for English and code
+    return max(1, len(text or '') // 4)
+
+def record_usage(tier, agent, latency_ms, input_tokens, output_tokens, error=False):
+    """Add one call to the tier's counters. Accounting never breaks a generation."""
+    prices = TIERS[tier]
+    cost = (input_tokens * prices['input_cost'] + output_tokens * prices['output_cost']) / 1_000_000
+    key = f'{USAGE_PREFIX}{tier}'
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hincrby(key, 'calls', 1)
+        pipe.hincrby(key, 'errors', int(error))
+        pipe.hincrby(key, 'input_tokens', input_tokens)
+        pipe.hincrby(key, 'output_tokens', output_tokens)
+        pipe.hincrbyfloat(key, 'cost_usd', cost)
+        pipe.hincrby(key, f'agent:{agent}', 1)
+        pipe.lpush(f'{key}:latency', round(latency_ms))
+        pipe.ltrim(f'{key}:latency', 0, LATENCY_SAMPLES - 1)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+    return cost
+
+class UsageRecorder(BaseCallbackHandler):
+    """Measures latency and tokens of each LLM call and records them for its tier."""
+
+    def __init__(self, agent, tier):
+        self.agent = agent
+        self.tier = tier
+        self._calls = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        text = ''.join(str(m.content) for batch in messages for m in batch)
+        self._calls[run_id] = (time.time(), estimate_tokens(text))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._calls[run_id] = (time.time(), estimate_tokens(''.join(prompts)))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started, input_tokens = self._calls.pop(run_id, (time.time(), 0))
+        output_tokens = estimate_tokens(''.join(g.text for batch in response.generations for g in batch))
+        # Prefer the provider's counts when the integration reports them
+        usage = (response.llm_output or {}).get('usage_metadata') or {}
+        record_usage(self.tier, self.agent, (time.time() - started) * 1000,
+                     usage.get('prompt_token_count') or input_tokens,
+                     usage.get('candidates_token_count') or output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started, input_tokens = self._calls.pop(run_id, (time.time(), 0))
+        record_usage(self.tier, self.agent, (time.time() - started) * 1000, input_tokens, 0, error=True)
+
+def _percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else None
+
+def usage_summary():
+    """Per-tier call counts, tokens, cost and latency percentiles (ms)."""
+    summary = {}
+    for tier, prices in TIERS.items():
+        key = f'{USAGE_PREFIX}{tier}'
+        counters = redis_client.hgetall(key)
+        latencies = [int(v) for v in redis_client.lrange(f'{key}:latency', 0, -1)]
+        calls = int(counters.get('calls', 0))
+        summary[tier] = {
+            'model': prices['model'],
+            'calls': calls,
+            'errors': int(counters.get('errors', 0)),
+            'input_tokens': int(counters.get('input_tokens', 0)),
+            'output_tokens': int(counters.get('output_tokens', 0)),
+            'cost_usd': round(float(counters.get('cost_usd', 0)), 4),
+            'cost_per_call_usd': round(float(counters.get('cost_usd', 0)) / calls, 6) if calls else None,
+            'latency_p50_ms': _percentile(latencies, 0.5),
+            'latency_p90_ms': _percentile(latencies, 0.9),
+            'agents': {k.split(':', 1)[1]: int(v) for k, v in counters.items() if k.startswith('agent:')}
+        }
+    return summary
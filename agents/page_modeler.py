@@ -0,0 +1,10 @@
+from utils.page_model import extract_urls, summary_for
+
+def snapshot_pages(state):
+    """
+    Pre-generation stage: summarize the pages the requirement points at so the
+    script generator works from the real DOM instead of guessing it.
+    """
+    summaries = [summary for summary in (summary_for(url, cancel_key=state.cancel_key)
+                                         for url in extract_urls(state.requirement)) if summary]
+    return {"page_model": "\n\n".join(summaries) if summaries else None}
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from utils.async_runner import is_async_script, run_async_jobs
+from utils.script_runner import run_script, format_execution_result
+from utils.sharding import is_shardable, run_sharded
+from utils.artifacts import new_run_id
+from utils import async_batcher, locator_store
+
+def run_on_browser(script, browser, artifact_run_id, log_channel=None, cancel_key=None, artifact_prefix=None, batch=True):
+    """
+    Run one script on one engine through the matching runner and return its run dict.
+    With `batch` off an async script gets a batch of its own, so cancelling it stops it at once.
+    """
+    # Failure artifacts from every browser and attempt collect under one run id
+    options = {'artifact_run_id': artifact_run_id, 'artifact_prefix': artifact_prefix or browser,
+               'log_channel': log_channel, 'cancel_key': cancel_key}
+    # Scripts that define setup()/shard_*() fan out from a storage_state checkpoint
+    if is_shardable(script):
+        run = run_sharded(script, browser=browser, options=options)
+    # Async scripts run as a context in the event-loop runner, batched with concurrent runs
+    elif is_async_script(script):
+        run = (async_batcher.run(script, browser=browser, options=options) if batch
+               else run_async_jobs([dict(options, script=script, browser=browser)])[0])
+    else:
+        run = run_script(script, browser=browser, options=options)
+    # Selectors resolved through pwstats.locate become known-good once the run passed
+    locator_store.record_run((run['stats'] or {}).get('locators'), run['passed'])
+    return run
+
+def run_matrix(script, browsers, artifact_run_id, log_channel=None, cancel_key=None):
+    """Run one script on several engines; async scripts share a single batch. Returns browser -> run dict."""
+    if is_async_script(script) and not is_shardable(script):
+        jobs = [{'script': script, 'browser': browser, 'artifact_run_id': artifact_run_id, 'artifact_prefix': browser,
+                 'log_channel': log_channel, 'cancel_key': cancel_key} for browser in browsers]
+        runs = dict(zip(browsers, run_async_jobs(jobs)))
+        for run in runs.values():
+            locator_store.record_run((run['stats'] or {}).get('locators'), run['passed'])
+        return runs
+    with ThreadPoolExecutor(max_workers=len(browsers)) as pool:
+        return dict(zip(browsers, pool.map(lambda browser: run_on_browser(script, browser, artifact_run_id, log_channel, cancel_key), browsers)))
+
+def _matrix_report(runs):
+    """Side-by-side summary of one script executed on several engines."""
+    lines = ["🌐 Cross-Browser Matrix:", f"{'Browser':<10} | {'Result':<6} | {'Assertions':<10} | Time"]
+    for browser, run in runs.items():
+        stats = run['stats'] or {}
+        assertions = f"{stats.get('assertions_passed', 0)}/{stats.get('total_assertions', 0)}"
+        lines.append(f"{browser:<10} | {'PASS' if run['passed'] else 'FAIL':<6} | {assertions:<10} | {run['duration']:.2f}s")
+    return "\n".join(lines)
+
+def execute_script(state):
+    """
+    Execute the generated script through the script runner.
+    When `state.browsers` lists several engines the same script runs on all of
+    them concurrently and per-browser results are kept in `matrix_results`.
+    """
+    script = state.playwright_script
+    browsers = list(dict.fromkeys(state.browsers or [])) or [state.browser or "chromium"]
+    artifact_run_id = state.artifact_run_id or new_run_id()
+
+    if len(browsers) == 1:
+        run = run_on_browser(script, browsers[0], artifact_run_id, state.log_channel, state.cancel_key)
+        return {
+            "execution_result": format_execution_result(run),
+            "test_stats": run['stats'],
+            "artifact_run_id": run['artifact_run_id'] or state.artifact_run_id
+        }
+
+    runs = run_matrix(script, browsers, artifact_run_id, state.log_channel, state.cancel_key)
+    # The primary browser's stats feed the regular stats report
+    return matrix_update(runs, state.browser if state.browser in runs else browsers[0], state.artifact_run_id)
+
+def matrix_update(runs, primary, artifact_run_id=None):
+    """State update for one script's runs on several engines (browser -> run dict, in matrix order)."""
+    failed = [browser for browser, run in runs.items() if not run['passed']]
+    if failed:
+        execution_result = f"[FAIL] Failed on {', '.join(failed)}."
+        for browser in failed:
+            execution_result += f"\n\n--- {browser} ---\n{format_execution_result(runs[browser])}"
+    else:
+        execution_result = f"[PASS] Execution succeeded on {', '.join(runs)}."
+
+    return {
+        "execution_result": execution_result,
+        "test_stats": runs[primary]['stats'],
+        "artifact_run_id": next((run['artifact_run_id'] for run in runs.values() if run['artifact_run_id']), artifact_run_id),
+        "matrix_results": {
+            browser: {
+                "passed": run['passed'],
+                "duration": run['duration'],
+                "execution_result": format_execution_result(run),
+                "test_stats": run['stats']
+            }
+            for browser, run in runs.items()
+        },
+        "matrix_report": _matrix_report(runs)
+    }
@@ -0,0 +1,120 @@
+import ast
+import re
+from utils.async_runner import is_async_script
+from utils.sharding import is_shardable
+from utils.script_ast import parse_script
+
+ALLOWED_IMPORTS = {
+    "playwright", "pwstats", "utils", "time", "json", "re", "os", "sys", "datetime", "random", "string",
+    "math", "typing", "traceback", "logging", "pathlib", "collections", "functools",
+    "itertools", "uuid", "urllib", "asyncio"
+}
+STATS_MARKERS = ("STATS_JSON_START", "STATS_JSON_END")
+LOCATOR_METHODS = {"locator", "query_selector", "query_selector_all", "wait_for_selector", "click", "fill"}
+BRITTLE_SELECTORS = [
+    (re.compile(r"^(xpath=)?/html"), "absolute XPath selector"),
+    (re.compile(r":nth-child\(|:nth-of-type\("), "position-based CSS selector"),
+    (re.compile(r"[#.\[][\w-]*\d{4,}"), "selector depends on a generated id/class")
+]
+
+def _issue(severity, node, message):
+    return {"severity": severity, "line": getattr(node, "lineno", None), "message": message}
+
+def _call_name(node):
+    func = node.func
+    return func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+
+def _check_imports(tree):
+    issues = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules = [node.module]
+        else:
+            continue
+        for module in modules:
+            if module.split(".")[0] not in ALLOWED_IMPORTS:
+                issues.append(_issue("error", node, f"Import of '{module}' is not allowed in test scripts."))
+    return issues
+
+def _check_api_usage(tree, script):
+    issues = []
+    imports = {node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom) and node.module}
+    if "playwright.sync_api" in imports and "playwright.async_api" in imports:
+        issues.append(_issue("error", None, "Script mixes the sync and async Playwright APIs; use only sync_api."))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AsyncWith):
+            for item in node.items:
+                if isinstance(item.context_expr, ast.Call) and _call_name(item.context_expr) == "sync_playwright":
+                    issues.append(_issue("error", node, "sync_playwright() used with 'async with'."))
+        elif isinstance(node, ast.With):
+            for item in node.items:
+                if isinstance(item.context_expr, ast.Call) and _call_name(item.context_expr) == "async_playwright":
+                    issues.append(_issue("error", node, "async_playwright() used with a plain 'with'."))
+        elif isinstance(node, ast.Await) and "playwright.sync_api" in imports and "playwright.async_api" not in imports:
+            issues.append(_issue("error", node, "'await' used on the sync Playwright API."))
+        elif isinstance(node, ast.Call):
+            for keyword in node.keywords:
+                if keyword.arg == "headless" and isinstance(keyword.value, ast.Constant) and keyword.value.value is False:
+                    issues.append(_issue("warning", node, "headless=False is ignored; the executor owns launch settings (use launch_browser(p))."))
+
+    # Shardable, async and pwstats scripts get their markers printed by their runners
+    uses_pwstats = "pwstats" in imports or any(
+        isinstance(node, ast.Import) and any(alias.name == "pwstats" for alias in node.names) for node in ast.walk(tree)
+    )
+    if not is_shardable(script) and not is_async_script(script) and not uses_pwstats:
+        strings = {node.value for node in ast.walk(tree) if isinstance(node, ast.Constant) and isinstance(node.value, str)}
+        for marker in STATS_MARKERS:
+            if marker not in strings:
+                issues.append(_issue("error", None, f"Script never prints the {marker} marker, so its stats cannot be read."))
+    return issues
+
+def _check_locators(tree):
+    issues = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _call_name(node)
+        if name == "sleep" or name == "wait_for_timeout":
+            issues.append(_issue("warning", node, f"Fixed wait via {name}(); wait for a locator instead."))
+        elif name == "wait_for_load_state" and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == "networkidle":
+            issues.append(_issue("warning", node, "wait_for_load_state('networkidle'); use utils.readiness helpers instead."))
+        elif name in LOCATOR_METHODS and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+            selector = node.args[0].value
+            for pattern, message in BRITTLE_SELECTORS:
+                if pattern.search(selector):
+                    issues.append(_issue("warning", node, f"Brittle locator '{selector}': {message}; prefer get_by_role/get_by_label/get_by_test_id."))
+                    break
+    return issues
+
+def check_script(script):
+    """Static checks for a generated script. Returns a list of issue dicts."""
+    if not script or not script.strip():
+        return [_issue("error", None, "No script was generated.")]
+    try:
+        tree = parse_script(script)
+    except SyntaxError as e:
+        return [{"severity": "error", "line": e.lineno, "message": f"SyntaxError: {e.msg}"}]
+    return _check_imports(tree) + _check_api_usage(tree, script) + _check_locators(tree)
+
+def format_issues(issues):
+    lines = []
+    for issue in issues:
+        where = f" line {issue['line']}" if issue["line"] else ""
+        lines.append(f"- [{issue['severity']}]{where}: {issue['message']}")
+    return "\n".join(lines)
+
+def validate_script(state):
+    """
+    Pre-flight check between script generation and execution.
+    Scripts with errors get a [FAIL] execution result without launching a
+    browser, so the graph can route them straight to the debugger.
+    """
+    issues = check_script(state.playwright_script)
+    errors = [issue for issue in issues if issue["severity"] == "error"]
+    update = {"validation_issues": issues}
+    if errors:
+        update["execution_result"] = "[FAIL] Pre-flight validation failed; the script was not executed.\n\n" + format_issues(issues)
+    return update
@@ -0,0 +1,181 @@
+"""
+Speculative execution: generate several candidate scripts at once, run them in
+parallel and keep the first that passes.
+
+Opt-in per job (`speculative_candidates`) or per worker (PW_SPECULATIVE_CANDIDATES).
+Each candidate is generated, validated and executed on its own thread as soon as
+it is ready; when one passes, the runs of the others are cancelled. Extra
+candidates beyond the first count against an hourly budget shared by all jobs,
+so a busy hour falls back to the regular single-script path.
+"""
+
+import contextvars
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import redis
+from extensions import redis_client
+from agents.runner_executor import matrix_update, run_matrix, run_on_browser
+from agents.script_validator import check_script, format_issues
+from utils.artifacts import new_run_id
+from utils.cancellation import child_key, is_cancelled, request_cancel
+from utils.script_runner import format_execution_result
+
+DEFAULT_CANDIDATES = int(os.environ.get('PW_SPECULATIVE_CANDIDATES') or 1)
+MAX_CANDIDATES = int(os.environ.get('PW_SPECULATIVE_MAX_CANDIDATES') or 4)
+# Extra candidates (beyond the first of each job) allowed per hour across all jobs
+HOURLY_BUDGET = int(os.environ.get('PW_SPECULATIVE_HOURLY_BUDGET') or 60)
+BUDGET_PREFIX = 'speculative:budget:'
+METRICS_KEY = 'speculative:metrics'
+
+# Candidate 0 is generated exactly like the regular path; the others are nudged apart
+CANDIDATE_HINTS = [
+    None,
+    "Variant: prefer role- and label-based locators (get_by_role, get_by_label, get_by_placeholder).",
+    "Variant: prefer id, name and data-testid attribute selectors, with a readiness wait before every interaction.",
+    "Variant: prefer visible-text locators (get_by_text) and check each step's outcome before moving on."
+]
+
+def requested_candidates(state):
+    """Number of candidates the job asked for, within MAX_CANDIDATES; 1 means speculation is off."""
+    requested = state.speculative_candidates or DEFAULT_CANDIDATES
+    return max(1, min(MAX_CANDIDATES, requested, len(CANDIDATE_HINTS)))
+
+def reserve_candidates(requested, now=None):
+    """Take extra candidates from this hour's budget; returns how many candidates may run."""
+    extra = requested - 1
+    if extra <= 0:
+        return 1
+    key = f'{BUDGET_PREFIX}{int((now or time.time()) // 3600)}'
+    try:
+        used = redis_client.incrby(key, extra)
+        redis_client.expire(key, 7200)
+        over = min(extra, max(0, used - HOURLY_BUDGET))
+        if over:
+            redis_client.decrby(key, over)
+    except redis.RedisError:
+        # Without the shared budget there is no cost cap, so do not speculate
+        return 1
+    return 1 + extra - over
+
+def _record_metrics(metrics):
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hincrby(METRICS_KEY, 'jobs', 1)
+        pipe.hincrby(METRICS_KEY, 'wins', 1 if metrics['winner'] is not None else 0)
+        for field in ('candidates', 'executed', 'cancelled'):
+            pipe.hincrby(METRICS_KEY, field, metrics[field])
+        pipe.hincrbyfloat(METRICS_KEY, 'browser_seconds', metrics['browser_seconds'])
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+def speculation_report(metrics):
+    """One-line summary of a speculative run, shown above the execution result."""
+    if metrics['winner'] is None:
+        return (f"⚡ Speculative: none of {metrics['candidates']} candidates passed "
+                f"({metrics['executed']} executed, {metrics['wall_seconds']:.1f}s).")
+    return (f"⚡ Speculative: candidate {metrics['winner'] + 1}/{metrics['candidates']} passed first "
+            f"after {metrics['time_to_pass']:.1f}s ({metrics['cancelled']} cancelled).")
+
+def _better(a, b):
+    """The more useful of two failed attempts to hand to the debugger: executed, then most assertions passed."""
+    if b is None:
+        return a
+    score = lambda attempt: (attempt['run'] is not None, ((attempt['run'] or {}).get('stats') or {}).get('assertions_passed', 0))
+    return a if score(a) > score(b) else b
+
+def speculative_node(generate):
+    """
+    Build the graph node for speculative mode around a script generator node.
+    Candidates race on the job's primary browser; a winner then runs on the
+    job's other matrix browsers.
+    """
+    def speculate(state):
+        requested = requested_candidates(state)
+        count = reserve_candidates(requested)
+        browser = state.browser or (state.browsers or ["chromium"])[0]
+        artifact_run_id = state.artifact_run_id or new_run_id()
+        base_key = state.cancel_key or uuid.uuid4().hex
+        started = time.time()
+
+        def attempt(index):
+            hint = CANDIDATE_HINTS[index]
+            requirement = f"{state.requirement}\n\n{hint}" if hint else state.requirement
+            script = generate(state.model_copy(update={"requirement": requirement}))["playwright_script"]
+            issues = check_script(script)
+            result = {"index": index, "script": script, "issues": issues, "run": None, "passed": False}
+            if any(issue["severity"] == "error" for issue in issues):
+                result["execution_result"] = "[FAIL] Pre-flight validation failed; the script was not executed.\n\n" + format_issues(issues)
+                return result
+            cancel_key = child_key(base_key, f"candidate-{index}")
+            if is_cancelled(cancel_key):
+                result["execution_result"] = "[FAIL] Execution cancelled."
+                return result
+            # Unbatched, so the losing candidates can be cancelled as soon as one passes
+            run = run_on_browser(script, browser, artifact_run_id, state.log_channel, cancel_key,
+                                 artifact_prefix=f"{browser}-candidate{index + 1}", batch=False)
+            result.update(run=run, passed=run['passed'], execution_result=format_execution_result(run),
+                          finished=time.time())
+            return result
+
+        pool = ThreadPoolExecutor(max_workers=count)
+        # Each candidate thread keeps the caller's context (e.g. the model tier chosen for this node)
+        futures = [pool.submit(contextvars.copy_context().run, attempt, index) for index in range(count)]
+        winner = best = None
+        attempts = []
+        errors = []
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # One candidate's generator error does not sink the others
+                    errors.append(e)
+                    continue
+                attempts.append(result)
+                if result["passed"]:
+                    winner = result
+                    break
+                best = _better(result, best)
+        finally:
+            pending = [index for index, future in enumerate(futures) if not future.done()]
+            try:
+                for index in pending:
+                    request_cancel(child_key(base_key, f"candidate-{index}"))
+            except redis.RedisError:
+                pass
+            # Losing runs stop within a second of the cancel; do not wait for them
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        chosen = winner or best
+        if chosen is None:
+            raise errors[0]
+        runs = [a["run"] for a in attempts if a["run"] is not None]
+        metrics = {
+            "requested": requested,
+            "candidates": count,
+            "winner": winner["index"] if winner else None,
+            "executed": len(runs),
+            "cancelled": len(pending),
+            "time_to_pass": round(winner["finished"] - started, 2) if winner else None,
+            "wall_seconds": round(time.time() - started, 2),
+            "browser_seconds": round(sum(run['duration'] or 0 for run in runs), 2)
+        }
+        _record_metrics(metrics)
+
+        run = chosen["run"]
+        update = {
+            "execution_result": chosen['execution_result'],
+            "test_stats": run['stats'] if run else None,
+            "artifact_run_id": (run or {}).get('artifact_run_id') or state.artifact_run_id
+        }
+        others = [b for b in dict.fromkeys(state.browsers or []) if b != browser]
+        if winner and others:
+            # The failing path reaches every browser through debug -> reexecute; a winner has to be run on the rest here
+            runs = dict({browser: run}, **run_matrix(chosen["script"], others, artifact_run_id, state.log_channel, base_key))
+            update = matrix_update(runs, browser, update["artifact_run_id"])
+        return dict(update, playwright_script=chosen["script"], validation_issues=chosen["issues"], speculation=metrics,
+                    execution_result=f"{speculation_report(metrics)}\n\n{update['execution_result']}")
+    return speculate
@@ -0,0 +1,124 @@
+import re
+
+# Thresholds from the statistics interpretation guide (USER_GUIDE.md)
+SLOW_PAGE_LOAD = 3.0
+SLOW_ACTION = 1.0
+MAX_ERROR_GROUPS = 5
+
+COMMENTARY_PROMPT = """You are reviewing the result of an automated Playwright test run.
+Execution result:
+{execution_result}
+
+Statistics report:
+{report}
+
+In at most five short bullet points, explain what the numbers say about the test and the site
+(failures, slow steps, flaky locators, accessibility) and what to look at next. Do not repeat the numbers verbatim."""
+
+def _timing(samples):
+    samples = sorted(s for s in samples if isinstance(s, (int, float)))
+    if not samples:
+        return None
+    return {
+        'count': len(samples),
+        'avg': sum(samples) / len(samples),
+        'p50': samples[len(samples) // 2],
+        'p90': samples[min(len(samples) - 1, int(len(samples) * 0.9))],
+        'max': samples[-1]
+    }
+
+def _error_signature(error):
+    # Messages that differ only in numbers (timeouts, counts, ids) belong to one group
+    first_line = str(error).strip().splitlines()[0] if str(error).strip() else ''
+    return ' '.join(re.sub(r'\d+(\.\d+)?', 'N', first_line).split())[:160]
+
+def group_errors(errors):
+    """[(count, example message)] for distinct errors, most frequent first."""
+    groups = {}
+    for error in errors or []:
+        signature = _error_signature(error)
+        count, example = groups.get(signature, (0, str(error).strip().splitlines()[0][:200] if str(error).strip() else ''))
+        groups[signature] = (count + 1, example)
+    return sorted(groups.values(), key=lambda group: -group[0])
+
+def summarize_stats(stats):
+    """Numbers the report is built from; pure and fast enough to run after every execution."""
+    stats = stats or {}
+    total = stats.get('total_assertions') or 0
+    performance = stats.get('performance') or {}
+    return {
+        'execution_time': stats.get('execution_time') or 0.0,
+        'assertions_passed': stats.get('assertions_passed') or 0,
+        'assertions_failed': stats.get('assertions_failed') or 0,
+        'total_assertions': total,
+        'pass_rate': (stats.get('assertions_passed') or 0) / total * 100 if total else None,
+        'steps': stats.get('step_coverage') or [],
+        'page_loads': _timing(performance.get('page_loads') or []),
+        'action_times': _timing(performance.get('action_times') or []),
+        'accessibility_violations': stats.get('accessibility_violations') or 0,
+        'locator_retries': stats.get('locator_retries') or 0,
+        'errors': group_errors(stats.get('errors')),
+        'error_count': len(stats.get('errors') or []),
+        'shards': stats.get('shards') or {},
+        'resource_usage': stats.get('resource_usage') or {}
+    }
+
+def _timing_line(label, timing, slow):
+    line = f"- {label}: {timing['count']} (avg {timing['avg']:.2f}s, p50 {timing['p50']:.2f}s, p90 {timing['p90']:.2f}s, max {timing['max']:.2f}s)"
+    return line + (f" ⚠️ p90 over {slow:.0f}s" if timing['p90'] > slow else "")
+
+def format_report(stats):
+    """Render the 📊 Test Statistics Report from a script's stats dict."""
+    if not stats:
+        return "📊 Test Statistics Report:\n- No statistics were reported by the script."
+    summary = summarize_stats(stats)
+    lines = ["📊 Test Statistics Report:", f"- Execution Time: {summary['execution_time']:.2f}s"]
+
+    if summary['total_assertions']:
+        lines.append(f"- Assertions: {summary['assertions_passed']}/{summary['total_assertions']} passed "
+                     f"({summary['pass_rate']:.1f}% pass rate, {summary['assertions_failed']} failed)")
+    else:
+        lines.append("- Assertions: none recorded")
+
+    steps = summary['steps']
+    lines.append(f"- Step Coverage: {len(steps)} step{'s' if len(steps) != 1 else ''}" + (f" ({', '.join(steps)})" if steps else ""))
+    if summary['page_loads']:
+        lines.append(_timing_line("Page Loads", summary['page_loads'], SLOW_PAGE_LOAD))
+    if summary['action_times']:
+        lines.append(_timing_line("Actions", summary['action_times'], SLOW_ACTION))
+    lines.append(f"- Accessibility Violations: {summary['accessibility_violations']}")
+    lines.append(f"- Locator Retries: {summary['locator_retries']}")
+
+    if summary['shards']:
+        shards = ', '.join(f"{name} {'✓' if shard['passed'] else '✗'} ({shard['execution_time']:.2f}s)"
+                           for name, shard in summary['shards'].items())
+        lines.append(f"- Shards: {shards}")
+    usage = summary['resource_usage']
+    if usage.get('peak_memory_mb') is not None:
+        lines.append(f"- Resources: peak {usage['peak_memory_mb']} MB, {usage.get('cpu_seconds', 0)}s CPU")
+
+    if summary['errors']:
+        lines.append(f"- Errors: {summary['error_count']} ({len(summary['errors'])} distinct)")
+        for count, example in summary['errors'][:MAX_ERROR_GROUPS]:
+            lines.append(f"  - {f'[{count}x] ' if count > 1 else ''}{example}")
+        if len(summary['errors']) > MAX_ERROR_GROUPS:
+            lines.append(f"  - ... and {len(summary['errors']) - MAX_ERROR_GROUPS} more")
+    else:
+        lines.append("- Errors: none")
+    return "\n".join(lines)
+
+def aggregate_stats(state):
+    """Deterministic stats report; no model call, so it adds milliseconds, not seconds, to a run."""
+    return {"test_stats_report": format_report(state.test_stats)}
+
+def stats_commentary(stats, execution_result):
+    """
+    Optional LLM commentary on a finished run's stats. Called off the request
+    path (background task or thread) and never part of the run result itself.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from agents.model_router import get_llm
+
+    chain = ChatPromptTemplate.from_template(COMMENTARY_PROMPT) | get_llm(agent="stats_commentary")
+    response = chain.invoke({"execution_result": (execution_result or "")[:2000], "report": format_report(stats)})
+    return (response.content or "").strip()
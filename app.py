@@ -2,14 +2,20 @@ import os
 import logging
 from flask import Flask, render_template, request
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from extensions import limiter, cache
 from config import config
-from models import db, User
+from models import db, User, upgrade_schema
 
 app = Flask(__name__)
 config_name = os.environ.get('FLASK_ENV') or 'development'
 app.config.from_object(config[config_name])
 
+# Behind a reverse proxy, take the client address from X-Forwarded-For so rate limits see real clients
+if app.config['TRUSTED_PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'],
+                            x_proto=app.config['TRUSTED_PROXY_COUNT'], x_host=app.config['TRUSTED_PROXY_COUNT'])
+
 db.init_app(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -51,9 +57,10 @@ app.register_blueprint(auth_blueprint)
 app.register_blueprint(main_blueprint)
 app.register_blueprint(admin_blueprint, url_prefix='/admin')
 
-# Create database tables
+# Create database tables and add columns introduced since the database was created
 with app.app_context():
     db.create_all()
+    upgrade_schema()
 
 if __name__ == '__main__':
     app.run(debug=app.config['DEBUG'])
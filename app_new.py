@@ -2,15 +2,21 @@ import os
 import logging
 from flask import Flask, render_template, request
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from extensions import limiter, cache
 from config import config
-from models import db, User
-from celery_app import make_celery
+from models import db, User, upgrade_schema
+from celery_app import make_celery, celery as task_queue
 
 app = Flask(__name__)
 config_name = os.environ.get('FLASK_ENV') or 'development'
 app.config.from_object(config[config_name])
 
+# Behind a reverse proxy, take the client address from X-Forwarded-For so rate limits see real clients
+if app.config['TRUSTED_PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'],
+                            x_proto=app.config['TRUSTED_PROXY_COUNT'], x_host=app.config['TRUSTED_PROXY_COUNT'])
+
 # Celery configuration
 app.config['CELERY_BROKER_URL'] = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 app.config['CELERY_RESULT_BACKEND'] = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
@@ -28,6 +34,8 @@ cache.init_app(app)
 
 # Setup Celery
 celery = make_celery(app)
+# Tasks run on the shared celery_app instance and open this app's context for database work
+task_queue.flask_app = app
 
 # Setup logging
 logging.basicConfig(level=getattr(logging, app.config['LOG_LEVEL']),
@@ -52,16 +60,18 @@ def internal_error(error):
 
 # Import and register blueprints
 from auth import auth as auth_blueprint
-from routes import main as main_blueprint
+# Background-job variant of the main blueprint: generation runs in Celery through the fair queue
+from routes_new import main as main_blueprint
 from admin import admin as admin_blueprint
 
 app.register_blueprint(auth_blueprint)
 app.register_blueprint(main_blueprint)
 app.register_blueprint(admin_blueprint, url_prefix='/admin')
 
-# Create database tables
+# Create database tables and add columns introduced since the database was created
 with app.app_context():
     db.create_all()
+    upgrade_schema()
 
 if __name__ == '__main__':
     app.run(debug=app.config['DEBUG'])
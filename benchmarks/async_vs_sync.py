@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sync (process per test) and async (contexts in one event loop)
+execution paths on the same workload.
+
+Usage: python benchmarks/async_vs_sync.py [--tests 32] [--concurrency 8] [--browser chromium]
+                                         [--matrix chromium,firefox,webkit]
+
+With --matrix every test also runs on each listed engine, the way a
+cross-browser job does: one process per test and engine on the sync path,
+one shared batch for the whole matrix on the async path.
+
+Pages are rendered from inline HTML, so the numbers measure executor overhead
+rather than the network.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.async_runner import run_async_jobs, run_async_scripts
+from utils.script_runner import run_script
+
+PAGE_HTML = "<form><input placeholder='Username'><button>Login</button></form><p id='out'></p>"
+
+SYNC_SCRIPT = f'''
+import json
+from playwright.sync_api import sync_playwright
+from utils.launch_policy import launch_browser
+
+stats = {{"assertions_passed": 0, "assertions_failed": 0, "total_assertions": 1, "errors": []}}
+
+with sync_playwright() as p:
+    browser = launch_browser(p)
+    page = browser.new_page()
+    page.set_content("{PAGE_HTML}")
+    page.get_by_placeholder("Username").fill("standard_user")
+    page.get_by_role("button", name="Login").click()
+    stats["assertions_passed"] += 1
+    browser.close()
+
+print("STATS_JSON_START")
+print(json.dumps(stats))
+print("STATS_JSON_END")
+'''
+
+ASYNC_SCRIPT = f'''
+stats = {{"assertions_passed": 0, "assertions_failed": 0, "total_assertions": 1, "errors": []}}
+
+async def run(context):
+    page = await context.new_page()
+    await page.set_content("{PAGE_HTML}")
+    await page.get_by_placeholder("Username").fill("standard_user")
+    await page.get_by_role("button", name="Login").click()
+    stats["assertions_passed"] += 1
+'''
+
+# Benchmarks measure execution only
+OPTIONS = {'network': {'mode': 'off'}, 'artifacts': False}
+
+def bench_sync(tests, concurrency, browser):
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        runs = list(pool.map(lambda _: run_script(SYNC_SCRIPT, browser=browser, options=OPTIONS), range(tests)))
+    wall = time.time() - started
+    per_test_mb = sum(r['resource_usage']['peak_memory_mb'] for r in runs) / tests
+    return {
+        'passed': sum(r['passed'] for r in runs),
+        'wall_seconds': wall,
+        'cpu_seconds': sum(r['resource_usage']['cpu_seconds'] for r in runs),
+        # Each in-flight test holds its own Python process and browser
+        'peak_memory_mb': per_test_mb * min(concurrency, tests),
+        'memory_per_test_mb': per_test_mb
+    }
+
+def bench_async(tests, concurrency, browser):
+    started = time.time()
+    runs = run_async_scripts([ASYNC_SCRIPT] * tests, browser=browser, options=OPTIONS, concurrency=concurrency)
+    wall = time.time() - started
+    usage = runs[0]['resource_usage']
+    return {
+        'passed': sum(r['passed'] for r in runs),
+        'wall_seconds': wall,
+        'cpu_seconds': usage['cpu_seconds'],
+        'peak_memory_mb': usage['peak_memory_mb'],
+        'memory_per_test_mb': usage['peak_memory_mb'] / min(concurrency, tests)
+    }
+
+def bench_sync_matrix(tests, concurrency, browsers):
+    started = time.time()
+    work = [browser for _ in range(tests) for browser in browsers]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        runs = list(pool.map(lambda browser: run_script(SYNC_SCRIPT, browser=browser, options=OPTIONS), work))
+    per_test_mb = sum(r['resource_usage']['peak_memory_mb'] for r in runs) / len(runs)
+    return {
+        'passed': sum(r['passed'] for r in runs),
+        'wall_seconds': time.time() - started,
+        'cpu_seconds': sum(r['resource_usage']['cpu_seconds'] for r in runs),
+        'peak_memory_mb': per_test_mb * min(concurrency, len(runs)),
+        'memory_per_test_mb': per_test_mb
+    }
+
+def bench_async_matrix(tests, concurrency, browsers):
+    started = time.time()
+    jobs = [{'script': ASYNC_SCRIPT, 'browser': browser} for _ in range(tests) for browser in browsers]
+    runs = run_async_jobs(jobs, options=OPTIONS, concurrency=concurrency)
+    usage = runs[0]['resource_usage']
+    return {
+        'passed': sum(r['passed'] for r in runs),
+        'wall_seconds': time.time() - started,
+        'cpu_seconds': usage['cpu_seconds'],
+        'peak_memory_mb': usage['peak_memory_mb'],
+        'memory_per_test_mb': usage['peak_memory_mb'] / min(concurrency, len(runs))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tests', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--browser', default='chromium')
+    parser.add_argument('--matrix', default='', help='Comma-separated engines for the cross-browser comparison')
+    args = parser.parse_args()
+
+    results = {
+        'sync': bench_sync(args.tests, args.concurrency, args.browser),
+        'async': bench_async(args.tests, args.concurrency, args.browser)
+    }
+    matrix = [browser.strip() for browser in args.matrix.split(',') if browser.strip()]
+    if matrix:
+        results['sync-matrix'] = bench_sync_matrix(args.tests, args.concurrency, matrix)
+        results['async-matrix'] = bench_async_matrix(args.tests, args.concurrency, matrix)
+
+    print(f"{args.tests} tests, concurrency {args.concurrency}, {args.browser}")
+    print(f"{'Path':<12} | {'Passed':<6} | {'Wall (s)':<8} | {'CPU (s)':<8} | {'Peak MB':<8} | MB per in-flight test")
+    for name, r in results.items():
+        print(f"{name:<12} | {r['passed']:<6} | {r['wall_seconds']:<8.2f} | {r['cpu_seconds']:<8.2f} | "
+              f"{r['peak_memory_mb']:<8.0f} | {r['memory_per_test_mb']:.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Measure what the pwstats runtime saves per generated script.
+
+Finds the stats boilerplate (stats dict, track_* helpers, STATS_JSON printing)
+in scripts and reports the output tokens it costs and the generation time
+that takes at a given decode speed.
+
+Usage:
+    python benchmarks/pwstats_savings.py                      # built-in legacy template
+    python benchmarks/pwstats_savings.py script.py ...        # scripts on disk
+    python benchmarks/pwstats_savings.py --history app.db     # every script saved in history
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import ast
+import sqlite3
+
+# The helper block every script generated before pwstats repeated
+LEGACY_TEMPLATE = '''import time
+import json
+from playwright.sync_api import sync_playwright, expect
+
+# Initialize stats dictionary
+stats = {
+    'execution_time': 0.0,
+    'assertions_passed': 0,
+    'assertions_failed': 0,
+    'total_assertions': 0,
+    'step_coverage': [],
+    'performance': {
+        'page_loads': [],  # List of floats (time in seconds)
+        'action_times': [] # List of floats (time in seconds)
+    },
+    'accessibility_violations': 0,
+    'locator_retries': 0,
+    'errors': []
+}
+
+def track_assertion(assertion_func, *args, **kwargs):
+    """Helper to wrap assertions and track stats."""
+    stats['total_assertions'] += 1
+    try:
+        assertion_func(*args, **kwargs)
+        stats['assertions_passed'] += 1
+    except AssertionError as e:
+        stats['assertions_failed'] += 1
+        stats['errors'].append(f"Assertion Failed: {e}")
+    except Exception as e:
+        stats['assertions_failed'] += 1
+        stats['errors'].append(f"Unexpected Error during assertion: {e}")
+
+def track_action_time(action_func, *args, **kwargs):
+    """Helper to measure and track action execution time."""
+    start = time.time()
+    result = action_func(*args, **kwargs)
+    end = time.time()
+    stats['performance']['action_times'].append(end - start)
+    return result
+
+def run_test():
+    global stats
+    start_time = time.time()
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        page.goto("https://example.com")
+        browser.close()
+    stats['execution_time'] = time.time() - start_time
+    print("STATS_JSON_START")
+    print(json.dumps(stats, indent=4))
+    print("STATS_JSON_END")
+
+if __name__ == "__main__":
+    run_test()
+'''
+REPLACEMENT = 'from pwstats import track_assertion, track_action_time, step\n'
+HELPERS = ('track_assertion', 'track_action_time')
+MARKERS = ('STATS_JSON_START', 'STATS_JSON_END')
+
+def count_tokens(text):
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding('cl100k_base').encode(text))
+    except ImportError:
+        # Roughly four characters per token for Python source
+        return round(len(text) / 4)
+
+def _is_stats_target(node):
+    target = node.value if isinstance(node, ast.Subscript) else node
+    return isinstance(target, ast.Name) and target.id == 'stats'
+
+def boilerplate(script):
+    """Source segments of a script that pwstats makes unnecessary."""
+    try:
+        tree = ast.parse(script)
+    except SyntaxError:
+        return []
+    segments = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) and node.name in HELPERS:
+            segments.append(node)
+        elif isinstance(node, ast.Assign) and any(_is_stats_target(t) for t in node.targets) and (
+                node in tree.body or any(isinstance(t, ast.Subscript) and isinstance(t.slice, ast.Constant)
+                                         and t.slice.value == 'execution_time' for t in node.targets)):
+            segments.append(node)
+        elif isinstance(node, ast.Global) and 'stats' in node.names:
+            segments.append(node)
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) and getattr(node.value.func, 'id', None) == 'print':
+            source = ast.get_source_segment(script, node) or ''
+            if any(marker in source for marker in MARKERS) or 'json.dumps(stats' in source:
+                segments.append(node)
+    return [ast.get_source_segment(script, node) for node in segments]
+
+def measure(script):
+    removed = boilerplate(script)
+    removed_tokens = sum(count_tokens(segment) for segment in removed)
+    saved = max(0, removed_tokens - count_tokens(REPLACEMENT)) if removed else 0
+    return {'total': count_tokens(script), 'saved': saved}
+
+def _history_scripts(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute('SELECT script FROM script_history') if row[0]]
+
+def main():
+    parser = argparse.ArgumentParser(description='Token and latency savings of the pwstats runtime')
+    parser.add_argument('scripts', nargs='*', help='Generated scripts to analyse')
+    parser.add_argument('--history', help='SQLite database whose script_history rows to analyse')
+    parser.add_argument('--tokens-per-second', type=float, default=60.0, help='LLM output decode speed')
+    args = parser.parse_args()
+
+    scripts = []
+    for path in args.scripts:
+        with open(path, encoding='utf-8') as f:
+            scripts.append(f.read())
+    if args.history:
+        scripts.extend(_history_scripts(args.history))
+    if not scripts:
+        scripts = [LEGACY_TEMPLATE]
+
+    results = [measure(script) for script in scripts]
+    total = sum(r['total'] for r in results)
+    saved = sum(r['saved'] for r in results)
+    per_script = saved / len(results)
+
+    print(f"Scripts analysed:        {len(results)}")
+    print(f"Output tokens (total):   {total}")
+    print(f"Boilerplate tokens:      {saved} ({saved / total * 100 if total else 0:.1f}%)")
+    print(f"Saved per script:        {per_script:.0f} tokens, "
+          f"{per_script / args.tokens_per_second:.1f}s at {args.tokens_per_second:.0f} tok/s")
+
+if __name__ == '__main__':
+    main()
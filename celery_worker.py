@@ -5,6 +5,8 @@ Run this to start the background task worker.
 """
 
 from celery_app import celery
+# Binds celery.flask_app and registers the tasks imported by the blueprints
+import app_new
 
 if __name__ == '__main__':
     celery.start()
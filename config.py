@@ -1,5 +1,20 @@
 import os
 
+# Offered on the generate form; agents.model_router sends them to the fast model tier
+PREDEFINED_REQUIREMENTS = {
+    'search': 'Search for a product on Amazon',
+    'login': 'Login to Amazon account',
+    'cart': 'Add item to cart',
+    'checkout': 'Complete checkout process',
+    'full_flow': 'Complete Amazon Purchase Flow (Login -> Search -> Add to Cart -> Checkout)',
+    'failed_login': 'Test failed login attempt',
+    'out_of_stock': 'Test out of stock item handling',
+    'invalid_payment': 'Test invalid payment method',
+    'guest_checkout': 'Test guest checkout without account'
+}
+# The predefined requirements are all steps of the Amazon purchase flow; utils.page_model snapshots this page for them
+PREDEFINED_START_URL = 'https://www.amazon.com/'
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
@@ -13,6 +28,12 @@ class Config:
     CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL') or 'redis://localhost:6379'
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379'
+    SUITE_MAX_ITEMS = int(os.environ.get('SUITE_MAX_ITEMS') or 500)
+    SUITE_MAX_CONCURRENCY = int(os.environ.get('SUITE_MAX_CONCURRENCY') or 4)
+    # Number of reverse proxies in front of the app whose X-Forwarded-* headers are trusted
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT') or 0)
+    # Ask the fast model tier for commentary on each run's stats, in the background
+    STATS_COMMENTARY = (os.environ.get('STATS_COMMENTARY') or 'false').lower() == 'true'
 
 class DevelopmentConfig(Config):
     DEBUG = True
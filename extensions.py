@@ -1,6 +1,16 @@
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
+from flask_login import current_user
+import redis
+import os
 
-limiter = Limiter(key_func=get_remote_address)
+def rate_limit_key():
+    """Limit signed-in users individually, everyone else by client address."""
+    if current_user and current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    return get_remote_address()
+
+limiter = Limiter(key_func=rate_limit_key)
 cache = Cache(config={'CACHE_TYPE': 'simple'})
+redis_client = redis.Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379/0'), decode_responses=True)
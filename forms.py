@@ -1,7 +1,8 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
-from wtforms import StringField, PasswordField, TextAreaField, SelectField, SubmitField
-from wtforms.validators import DataRequired, Length, EqualTo, Regexp
+from wtforms import StringField, PasswordField, TextAreaField, SelectField, SelectMultipleField, SubmitField, HiddenField
+from wtforms.validators import DataRequired, Length, EqualTo, Regexp, Optional
+from config import PREDEFINED_REQUIREMENTS
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=2, max=150)])
@@ -21,18 +22,20 @@ class GenerateForm(FlaskForm):
         ('firefox', 'Firefox'),
         ('webkit', 'Safari/WebKit')
     ], default='chromium', validators=[DataRequired()])
-    predefined = SelectField('Predefined Requirements', choices=[
-        ('', 'Select a predefined requirement...'),
-        ('search', 'Search for a product on Amazon'),
-        ('login', 'Login to Amazon account'),
-        ('cart', 'Add item to cart'),
-        ('checkout', 'Complete checkout process'),
-        ('full_flow', 'Complete Amazon Purchase Flow (Login -> Search -> Add to Cart -> Checkout)'),
-        ('failed_login', 'Test failed login attempt'),
-        ('out_of_stock', 'Test out of stock item handling'),
-        ('invalid_payment', 'Test invalid payment method'),
-        ('guest_checkout', 'Test guest checkout without account')
-    ])
+    matrix_browsers = SelectMultipleField('Also Run On (Cross-Browser Matrix)', choices=[
+        ('chromium', 'Chrome/Chromium'),
+        ('firefox', 'Firefox'),
+        ('webkit', 'Safari/WebKit')
+    ], validators=[Optional()], description="The script is generated once and executed on every selected browser")
+    candidates = SelectField('Speculative Candidates', choices=[
+        (1, 'Off (one script, debug on failure)'),
+        (2, '2 candidates'),
+        (3, '3 candidates'),
+        (4, '4 candidates')
+    ], coerce=int, default=1, validators=[Optional()], description="Generate several scripts at once and keep the first that passes")
+    # Set by the page so a running synchronous generation can be cancelled
+    job_id = HiddenField(validators=[Optional(), Regexp(r'^[A-Za-z0-9-]{1,64}$')])
+    predefined = SelectField('Predefined Requirements', choices=[('', 'Select a predefined requirement...')] + list(PREDEFINED_REQUIREMENTS.items()))
     requirement = TextAreaField('Testing Requirement', validators=[
         DataRequired(),
         Length(min=10, max=1000, message="Requirement must be between 10 and 1000 characters."),
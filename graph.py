@@ -1,43 +1,133 @@
+import os
 from langgraph.graph import StateGraph
 from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class TestGenerationState(BaseModel):
     requirement: Optional[str] = None
     browser: Optional[str] = None
+    browsers: Optional[List[str]] = None
+    # "sync" (default) or "async" scripts, see utils.async_runner
+    execution_mode: Optional[str] = None
     playwright_script: Optional[str] = None
     execution_result: Optional[str] = None
     analysis: Optional[str] = None
     test_stats: Optional[dict] = None
     test_stats_report: Optional[str] = None
+    # Cross-browser matrix fields
+    matrix_results: Optional[Dict[str, Any]] = None
+    matrix_report: Optional[str] = None
+    # Candidate scripts generated and raced per job, see agents.speculative_executor
+    speculative_candidates: Optional[int] = None
+    speculation: Optional[Dict[str, Any]] = None
+    # Summary of the target pages crawled before generation, see utils.page_model
+    page_model: Optional[str] = None
+    # Pre-flight findings from agents.script_validator
+    validation_issues: Optional[List[Dict[str, Any]]] = None
+    # Redis channel the runner streams live output to, see utils.log_stream
+    log_channel: Optional[str] = None
+    # Job id checked by the runner for cancellation, see utils.cancellation
+    cancel_key: Optional[str] = None
+    # Failure screenshots/traces stored by utils.artifacts
+    artifact_run_id: Optional[str] = None
     # Code generation fields
     extracted_code: Optional[Dict[str, Any]] = None
     generated_code: Optional[Dict[str, Any]] = None
     integration_instructions: Optional[str] = None
+    # Local server running the project with the generated code applied, see utils.app_runner
+    app_url: Optional[str] = None
+    app_status: Optional[str] = None
+    app_lease: Optional[str] = None
     framework: Optional[str] = None
 
+def generation_context(state):
+    """Executor-provided guidance appended to the requirement for LLM script nodes."""
+    from utils.async_runner import ASYNC_PROMPT_GUIDE
+    from utils.launch_policy import LAUNCH_PROMPT_GUIDE
+    from utils.locator_store import prompt_context
+    from utils.readiness import READINESS_PROMPT_GUIDE
+    from utils.script_runner import STATS_PROMPT_GUIDE
+    from utils.sharding import SHARDING_PROMPT_GUIDE
+
+    page_model = [f"Target page model (build selectors from these elements):\n{state.page_model}"] if state.page_model else []
+    # Code generation runs the generated feature locally, see utils.app_runner
+    app = [f"The application under test is running at {state.app_url}; navigate to it "
+           "(never a production URL) to test the generated feature."] if state.app_url else []
+    if (state.execution_mode or os.environ.get("PW_EXECUTION_MODE")) == "async":
+        return [ASYNC_PROMPT_GUIDE] + page_model + app
+    # Known-good selectors for the sites the requirement (or the script being debugged) visits
+    locators = prompt_context(state.requirement, state.playwright_script)
+    return [STATS_PROMPT_GUIDE, LAUNCH_PROMPT_GUIDE, READINESS_PROMPT_GUIDE, SHARDING_PROMPT_GUIDE,
+            locators] + page_model + app
+
+def with_generation_context(node):
+    """Wrap a script generator/debugger node so its prompt sees the generation context."""
+    def run(state):
+        requirement = "\n\n".join([state.requirement or ""] + generation_context(state))
+        return node(state.model_copy(update={"requirement": requirement}))
+    return run
+
 def build_graph():
+    from agents.model_router import routed
+    from agents.page_modeler import snapshot_pages
     from agents.playwright_script_generator import generate_playwright_script
-    from agents.script_executor import execute_script
+    from agents.runner_executor import execute_script
     from agents.script_debugger import debug_script
+    from agents.script_validator import validate_script
+    from agents.speculative_executor import requested_candidates, speculative_node
     from agents.stats_aggregator import aggregate_stats
 
     builder = StateGraph(state_schema=TestGenerationState)
 
-    builder.add_node("script", RunnableLambda(generate_playwright_script))
+    builder.add_node("page_model", RunnableLambda(snapshot_pages))
+    builder.add_node("script", RunnableLambda(routed("script", with_generation_context(generate_playwright_script))))
+    builder.add_node("speculate", RunnableLambda(routed("script", speculative_node(with_generation_context(generate_playwright_script)))))
+    builder.add_node("validate", RunnableLambda(validate_script))
     builder.add_node("execute", RunnableLambda(execute_script))
-    builder.add_node("debug", RunnableLambda(debug_script))
+    builder.add_node("debug", RunnableLambda(routed("debug", with_generation_context(debug_script))))
     builder.add_node("reexecute", RunnableLambda(execute_script))
     builder.add_node("stats_aggregator", RunnableLambda(aggregate_stats))
     builder.add_node("done", lambda state: state)
 
-    builder.set_entry_point("script")
-    builder.add_edge("script", "execute")
+    builder.set_entry_point("page_model")
+
+    def speculative(state):
+        return requested_candidates(state) > 1
+
+    # Speculative mode generates, validates and executes its candidates in one node
+    builder.add_conditional_edges(
+        "page_model",
+        speculative,
+        {
+            True: "speculate",
+            False: "script"
+        }
+    )
+    builder.add_edge("script", "validate")
 
     def needs_debugging(state):
         return state.execution_result and "[FAIL]" in state.execution_result
 
+    builder.add_conditional_edges(
+        "speculate",
+        needs_debugging,
+        {
+            True: "debug",
+            False: "stats_aggregator"
+        }
+    )
+
+    # Scripts that fail the static checks skip the browser launch
+    builder.add_conditional_edges(
+        "validate",
+        needs_debugging,
+        {
+            True: "debug",
+            False: "execute"
+        }
+    )
+
     builder.add_conditional_edges(
         "execute",
         needs_debugging,
@@ -57,29 +147,53 @@ def build_graph():
 
 def build_code_generation_graph():
     """Build graph for code generation workflow."""
+    from agents.app_launcher import launch_app, release_app
     from agents.code_generator import generate_code
+    from agents.diff_code_generator import OUTPUT_FORMAT, generate_code_diff, integration_guide_node
     from agents.integration_guide import generate_integration_guide
+    from agents.model_router import routed
     from agents.playwright_script_generator import generate_playwright_script
-    from agents.script_executor import execute_script
+    from agents.runner_executor import execute_script
+    from agents.script_validator import validate_script
     from agents.stats_aggregator import aggregate_stats
 
     builder = StateGraph(state_schema=TestGenerationState)
 
     # Code generation nodes
-    builder.add_node("code_generator", RunnableLambda(generate_code))
-    builder.add_node("integration_guide", RunnableLambda(generate_integration_guide))
+    # Diff output is applied locally and its integration guide needs no model call
+    generator = generate_code_diff if OUTPUT_FORMAT == "diff" else generate_code
+    builder.add_node("code_generator", RunnableLambda(routed("code_generator", generator)))
+    builder.add_node("integration_guide", RunnableLambda(routed("integration_guide", integration_guide_node(generate_integration_guide))))
+    builder.add_node("app_runner", RunnableLambda(launch_app))
+    builder.add_node("app_release", RunnableLambda(release_app))
 
     # Test generation nodes (for generated code)
-    builder.add_node("script", RunnableLambda(generate_playwright_script))
+    builder.add_node("script", RunnableLambda(routed("script", with_generation_context(generate_playwright_script))))
+    builder.add_node("validate", RunnableLambda(validate_script))
     builder.add_node("execute", RunnableLambda(execute_script))
     builder.add_node("stats_aggregator", RunnableLambda(aggregate_stats))
     builder.add_node("done", lambda state: state)
 
     builder.set_entry_point("code_generator")
     builder.add_edge("code_generator", "integration_guide")
-    builder.add_edge("integration_guide", "script")
-    builder.add_edge("script", "execute")
-    builder.add_edge("execute", "stats_aggregator")
+    builder.add_edge("integration_guide", "app_runner")
+    builder.add_edge("app_runner", "script")
+    builder.add_edge("script", "validate")
+
+    def passed_validation(state):
+        return not any(issue["severity"] == "error" for issue in state.validation_issues or [])
+
+    builder.add_conditional_edges(
+        "validate",
+        passed_validation,
+        {
+            True: "execute",
+            False: "app_release"
+        }
+    )
+    # The app server stays leased to this job until its test has run
+    builder.add_edge("execute", "app_release")
+    builder.add_edge("app_release", "stats_aggregator")
     builder.add_edge("stats_aggregator", "done")
 
     builder.set_finish_point("done")
@@ -23,6 +23,22 @@ class ScriptHistory(db.Model):
     requirement = db.Column(db.Text, nullable=False)
     script = db.Column(db.Text, nullable=False)
     result = db.Column(db.Text, nullable=False)
+    artifact_run_id = db.Column(db.String(32), nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
     user = db.relationship('User', backref=db.backref('scripts', lazy=True))
+
+# Columns added after the first release: (table, column, DDL type). db.create_all()
+# only creates missing tables, so existing databases get these through upgrade_schema().
+ADDED_COLUMNS = [
+    ('script_history', 'artifact_run_id', 'VARCHAR(32)'),
+]
+
+def upgrade_schema():
+    """Add columns that newer versions of the models define to existing tables."""
+    inspector = db.inspect(db.engine)
+    tables = inspector.get_table_names()
+    with db.engine.begin() as conn:
+        for table, column, ddl_type in ADDED_COLUMNS:
+            if table in tables and column not in {c['name'] for c in inspector.get_columns(table)}:
+                conn.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
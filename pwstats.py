@@ -0,0 +1,193 @@
+"""
+Stats runtime for generated Playwright scripts.
+
+Replaces the stats dict, track_* helpers and STATS_JSON printing every script
+used to carry itself:
+
+    from pwstats import stats, track_assertion, track_action_time, step, locate
+
+Page loads are timed automatically for every page the script opens (and its
+popups), every URL its pages navigate to or fetch is recorded, and
+the stats are printed between the STATS_JSON markers when the script exits,
+including when it dies with an uncaught exception. Meant for sync scripts;
+async scripts keep a module-level `stats` dict (see utils.async_runner).
+"""
+
+import atexit
+import json
+import os
+import sys
+import time
+
+STATS_START = 'STATS_JSON_START'
+STATS_END = 'STATS_JSON_END'
+STEP_MARKER = 'STEP_EVENT'
+# How long locate() waits for the first candidate, then for each alternate
+LOCATE_TIMEOUT_MS = int(os.environ.get('PW_LOCATE_TIMEOUT_MS') or 5000)
+ALTERNATE_TIMEOUT_MS = 1000
+
+stats = {
+    'execution_time': 0.0,
+    'assertions_passed': 0,
+    'assertions_failed': 0,
+    'total_assertions': 0,
+    'step_coverage': [],
+    'performance': {
+        'page_loads': [],
+        'action_times': []
+    },
+    'accessibility_violations': 0,
+    'locator_retries': 0,
+    'locators': [],
+    # Main-frame navigations (redirect hops and client-side ones too) and fetch/XHR calls, see utils.impact_analysis
+    'visited_urls': [],
+    'errors': []
+}
+
+_started = time.time()
+_reported = False
+_watched_pages = set()
+
+def _emit(event):
+    print(f'{STEP_MARKER} {json.dumps(event)}', flush=True)
+
+def track_assertion(assertion_func, *args, **kwargs):
+    """Run an assertion (e.g. expect(locator).to_be_visible) and count the outcome."""
+    stats['total_assertions'] += 1
+    try:
+        assertion_func(*args, **kwargs)
+        stats['assertions_passed'] += 1
+        return True
+    except AssertionError as e:
+        stats['assertions_failed'] += 1
+        stats['errors'].append(f"Assertion Failed: {e}")
+    except Exception as e:
+        stats['assertions_failed'] += 1
+        stats['errors'].append(f"Unexpected Error during assertion: {e}")
+    return False
+
+def track_action_time(action_func, *args, **kwargs):
+    """Run an action (e.g. locator.click) and record how long it took."""
+    start = time.time()
+    try:
+        return action_func(*args, **kwargs)
+    finally:
+        stats['performance']['action_times'].append(time.time() - start)
+
+def step(name):
+    """Mark a test step as covered."""
+    stats['step_coverage'].append(name)
+    _emit({'action': 'step', 'target': name, 'status': 'ok'})
+
+def error(message):
+    """Record a failure that is not an assertion."""
+    stats['errors'].append(message)
+
+def locate(page, name, *selectors):
+    """
+    Locator for the element called `name` on `page`: selectors known to work on
+    this page (see utils.locator_store) are tried first, then `selectors` in order.
+    Returns the first one that becomes visible, or the first candidate if none does.
+    """
+    from utils.locator_store import candidates
+
+    tried = list(dict.fromkeys(candidates(page.url, name) + list(selectors)))
+    if not tried:
+        raise ValueError(f"locate() needs at least one selector for '{name}'")
+    for i, selector in enumerate(tried):
+        locator = page.locator(selector)
+        try:
+            locator.first.wait_for(state='visible', timeout=LOCATE_TIMEOUT_MS if i == 0 else ALTERNATE_TIMEOUT_MS)
+        except Exception:
+            stats['locator_retries'] += 1
+            stats['locators'].append({'url': page.url, 'name': name, 'selector': selector, 'ok': False})
+            continue
+        stats['locators'].append({'url': page.url, 'name': name, 'selector': selector, 'ok': True})
+        if i:
+            _emit({'action': 'locate', 'target': name, 'status': 'fallback', 'selector': selector})
+        return locator
+    # Not an error by itself: the script may be checking that the element is absent
+    print(f"Locator '{name}' not visible; tried: {', '.join(tried)}", file=sys.stderr, flush=True)
+    return page.locator(tried[0])
+
+def record_url(url):
+    """Add an http(s) URL the run reached to stats['visited_urls'] once, without its fragment."""
+    url = url.split('#', 1)[0]
+    if url.startswith(('http:', 'https:')) and url not in stats['visited_urls']:
+        stats['visited_urls'].append(url)
+
+def watch_page(page):
+    """
+    Time every main-frame navigation of `page` from its request to the load event
+    and record the URLs it navigates to or fetches. Popups are watched too.
+    """
+    if id(page) in _watched_pages:
+        return page
+    _watched_pages.add(id(page))
+    pending = {}
+
+    def on_request(request):
+        if request.is_navigation_request() and request.frame == page.main_frame:
+            pending['started'] = time.time()
+            pending['url'] = request.url
+            record_url(request.url)
+        elif request.resource_type in ('fetch', 'xhr'):
+            record_url(request.url)
+
+    def on_navigated(frame):
+        # Also fires for history.pushState() and other same-document navigations
+        if frame == page.main_frame:
+            record_url(frame.url)
+
+    def on_load(_):
+        started = pending.pop('started', None)
+        if started is not None:
+            elapsed = time.time() - started
+            stats['performance']['page_loads'].append(elapsed)
+            _emit({'action': 'page_load', 'target': pending.pop('url', page.url), 'status': 'ok',
+                   'duration_ms': round(elapsed * 1000)})
+
+    page.on('request', on_request)
+    page.on('load', on_load)
+    page.on('framenavigated', on_navigated)
+    page.on('popup', watch_page)
+    return page
+
+def _hook_new_page():
+    # Every page the script opens gets load timing without any code in the script
+    try:
+        from playwright.sync_api._generated import Browser, BrowserContext
+    except ImportError:
+        return
+
+    for cls in (Browser, BrowserContext):
+        original = cls.new_page
+
+        def new_page(self, *args, _original=original, **kwargs):
+            return watch_page(_original(self, *args, **kwargs))
+        cls.new_page = new_page
+
+def report():
+    """Print the stats between the markers the executor reads. Runs once, at exit at the latest."""
+    global _reported
+    if _reported:
+        return
+    _reported = True
+    stats['execution_time'] = time.time() - _started
+    print(STATS_START)
+    print(json.dumps(stats, indent=4))
+    print(STATS_END, flush=True)
+
+def mark_reported():
+    """For runners that print the stats themselves (e.g. utils.sharding)."""
+    global _reported
+    _reported = True
+
+def _excepthook(exc_type, exc, tb):
+    stats['errors'].append(f"Test execution failed: {exc_type.__name__}: {exc}")
+    _original_excepthook(exc_type, exc, tb)
+
+_original_excepthook = sys.excepthook
+sys.excepthook = _excepthook
+atexit.register(report)
+_hook_new_page()
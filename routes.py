@@ -1,17 +1,34 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, abort, jsonify, current_app
 from flask_login import login_required, current_user
 from extensions import limiter, cache
 from models import db, ScriptHistory
 from graph import build_graph, build_code_generation_graph
 from forms import GenerateForm, SearchForm, CodeGenerateForm
 from utils.zip_handler import ZipHandler
+from utils.artifacts import load_manifests, open_artifact
+from utils.cancellation import run_graph, register_job, owns_job, request_cancel, JobCancelled, cancelled_result
+from utils.impact_analysis import record_result, reusable_result
+from agents.stats_aggregator import stats_commentary
 import io
 import threading
 import os
 import tempfile
+import uuid
 
 main = Blueprint('main', __name__)
 
+def _enrich_history(app, history_id, stats, execution_result):
+    """Append LLM commentary on a run's stats to its history entry, off the request path."""
+    with app.app_context():
+        try:
+            text = stats_commentary(stats, execution_result)
+            history = ScriptHistory.query.get(history_id)
+            if history and text:
+                history.result += f"\n\nCommentary:\n{text}"
+                db.session.commit()
+        except Exception as e:
+            app.logger.warning(f"Stats commentary failed for history {history_id}: {e}")
+
 @main.route('/')
 def home():
     return render_template('home.html')
@@ -28,42 +45,73 @@ def generate():
     if form.validate_on_submit():
         requirement = form.requirement.data.strip()
         browser = form.browser.data
+        browsers = list(dict.fromkeys([browser] + (form.matrix_browsers.data or [])))
         if not requirement:
             flash('Please enter a valid requirement.', 'danger')
             return redirect(url_for('main.generate'))
 
         try:
-            # Run graph execution synchronously
+            # Run graph execution synchronously; the page may cancel it through /jobs/<job_id>/cancel
+            job_id = form.job_id.data or uuid.uuid4().hex
+            if not register_job(job_id, current_user.id):
+                # The page picked an id another user's job already has; that job stays theirs
+                job_id = uuid.uuid4().hex
+                register_job(job_id, current_user.id)
             graph = build_graph()
-            state = graph.invoke({"requirement": requirement, "browser": browser})
+            try:
+                state = run_graph(graph, {"requirement": requirement, "browser": browser, "browsers": browsers,
+                                          "speculative_candidates": form.candidates.data, "cancel_key": job_id}, job_id=job_id)
+            except JobCancelled as e:
+                state = dict(e.state, execution_result=cancelled_result(e))
+                flash('Generation was cancelled; partial results were saved to history.', 'warning')
 
             playwright_script = state.get("playwright_script", "N/A")
             execution_result = state.get("execution_result", "No result.")
             analysis = state.get("analysis", "")
             test_stats_report = state.get("test_stats_report", "")
+            matrix_results = state.get("matrix_results")
+            matrix_report = state.get("matrix_report", "")
+            if matrix_report:
+                test_stats_report = f"{test_stats_report}\n\n{matrix_report}" if test_stats_report else matrix_report
 
             # Save to history
             history = ScriptHistory(
                 user_id=current_user.id,
                 requirement=requirement,
                 script=playwright_script,
-                result=execution_result + ("\n\nAnalysis:\n" + analysis if analysis else "") + ("\n\nStats:\n" + test_stats_report if test_stats_report else "")
+                result=execution_result + ("\n\nAnalysis:\n" + analysis if analysis else "") + ("\n\nStats:\n" + test_stats_report if test_stats_report else ""),
+                artifact_run_id=state.get("artifact_run_id")
             )
             db.session.add(history)
             db.session.commit()
 
+            if current_app.config.get('STATS_COMMENTARY') and state.get("test_stats"):
+                threading.Thread(target=_enrich_history, daemon=True,
+                                 args=(current_app._get_current_object(), history.id, state.get("test_stats"), execution_result)).start()
+
             return render_template('generate.html',
                                  form=form,
                                  playwright_script=playwright_script,
                                  execution_result=execution_result,
                                  analysis=analysis,
-                                 test_stats_report=test_stats_report)
+                                 test_stats_report=test_stats_report,
+                                 matrix_results=matrix_results)
         except Exception as e:
             flash(f'An error occurred: {str(e)}', 'danger')
             return redirect(url_for('main.generate'))
 
     return render_template('generate.html', form=form)
 
+@main.route('/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    if current_user.role != 'developer':
+        return jsonify({'success': False, 'error': 'Access denied.', 'code': 'FORBIDDEN'}), 403
+    if not owns_job(job_id, current_user.id):
+        return jsonify({'success': False, 'error': 'Job not found.', 'code': 'NOT_FOUND'}), 404
+    request_cancel(job_id)
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'cancelling'}), 202
+
 @main.route('/history', methods=['GET', 'POST'])
 @login_required
 def history():
@@ -85,7 +133,20 @@ def history():
         )
 
     scripts = query.order_by(ScriptHistory.timestamp.desc()).all()
-    return render_template('history.html', scripts=scripts, search_form=search_form, search_query=search_query)
+
+    # Failure screenshots and traces kept for each run
+    artifacts = {}
+    manifests = load_manifests(script.artifact_run_id for script in scripts if script.artifact_run_id)
+    for script in scripts:
+        manifest = manifests.get(script.artifact_run_id)
+        if manifest:
+            artifacts[script.id] = [
+                {'name': entry['name'], 'size': entry['size'],
+                 'url': url_for('main.download_artifact', run_id=script.artifact_run_id, name=entry['name'])}
+                for entry in manifest['files']
+            ]
+
+    return render_template('history.html', scripts=scripts, search_form=search_form, search_query=search_query, artifacts=artifacts)
 
 @main.route('/download/<int:script_id>')
 @login_required
@@ -107,6 +168,26 @@ def download_script(script_id):
         mimetype='text/x-python'
     )
 
+@main.route('/artifacts/<run_id>/<path:name>')
+@login_required
+def download_artifact(run_id, name):
+    if current_user.role not in ['developer', 'qa']:
+        flash('Access denied.', 'danger')
+        return redirect(url_for('main.home'))
+
+    artifact = open_artifact(run_id, name)
+    if artifact is None:
+        abort(404)
+    data, content_type = artifact
+
+    # Screenshots open inline; traces and logs download
+    return send_file(
+        io.BytesIO(data),
+        as_attachment=not content_type.startswith('image/'),
+        download_name=name,
+        mimetype=content_type
+    )
+
 @main.route('/rerun/<int:script_id>')
 @login_required
 @limiter.limit("5 per minute")
@@ -130,7 +211,8 @@ def rerun_script(script_id):
             user_id=current_user.id,
             requirement=script.requirement,
             script=new_playwright_script,
-            result=new_execution_result + ("\n\nAnalysis:\n" + new_analysis if new_analysis else "")
+            result=new_execution_result + ("\n\nAnalysis:\n" + new_analysis if new_analysis else ""),
+            artifact_run_id=state.get("artifact_run_id")
         )
         db.session.add(new_history)
         db.session.commit()
@@ -187,14 +269,18 @@ def generate_code():
             # Clean up temp file
             os.unlink(temp_zip_path)
 
-            # Run code generation graph
-            graph = build_code_generation_graph()
-            state = graph.invoke({
-                "requirement": requirement,
-                "browser": browser,
-                "extracted_code": extracted_code,
-                "framework": framework
-            })
+            # A re-upload whose changes cannot affect the tested routes reuses the last passing result
+            state = reusable_result(current_user.id, requirement, browser, extracted_code)
+            if state is None:
+                # Run code generation graph
+                graph = build_code_generation_graph()
+                state = graph.invoke({
+                    "requirement": requirement,
+                    "browser": browser,
+                    "extracted_code": extracted_code,
+                    "framework": framework
+                })
+                record_result(current_user.id, requirement, browser, extracted_code, state)
 
             generated_code = state.get("generated_code", {})
             integration_instructions = state.get("integration_instructions", "")
@@ -206,12 +292,15 @@ def generate_code():
             history_result = f"Generated Code:\n{str(generated_code)}\n\nIntegration Instructions:\n{integration_instructions}\n\nTest Script:\n{playwright_script}\n\nExecution Result:\n{execution_result}"
             if test_stats_report:
                 history_result += f"\n\nStats:\n{test_stats_report}"
+            if state.get("app_status"):
+                history_result += f"\n\nApp Under Test:\n{state['app_status']}"
 
             history = ScriptHistory(
                 user_id=current_user.id,
                 requirement=f"[CODE GEN] {requirement}",
                 script=str(generated_code),
-                result=history_result
+                result=history_result,
+                artifact_run_id=state.get("artifact_run_id")
             )
             db.session.add(history)
             db.session.commit()
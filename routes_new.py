@@ -1,15 +1,25 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, abort, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from extensions import limiter, cache
 from models import db, ScriptHistory
 from graph import build_graph, build_code_generation_graph
 from forms import GenerateForm, SearchForm, CodeGenerateForm
 from utils.zip_handler import ZipHandler
-from tasks import process_code_generation
+from utils.artifacts import load_manifests, open_artifact
+from tasks import process_code_generation, process_test_generation, run_suite_chunk, aggregate_suite, SUITE_CHUNK_THREADS
+from utils.single_flight import single_flight_key, submit_single_flight
+from utils.suite import (parse_suite_items, chunk_size_for, history_requirement, save_suite, load_suite, load_suite_items,
+                         collect_items, SuiteValidationError)
+from utils.log_stream import channel_for, follow
+from utils.cancellation import owns_job, detach_job, request_cancel
+from utils import fair_queue
+from datetime import datetime
 import io
+import json
 import threading
 import os
 import tempfile
+import uuid
 
 main = Blueprint('main', __name__)
 
@@ -29,36 +39,21 @@ def generate():
     if form.validate_on_submit():
         requirement = form.requirement.data.strip()
         browser = form.browser.data
+        browsers = list(dict.fromkeys([browser] + (form.matrix_browsers.data or [])))
         if not requirement:
             flash('Please enter a valid requirement.', 'danger')
             return redirect(url_for('main.generate'))
 
         try:
-            # Run graph execution synchronously
-            graph = build_graph()
-            state = graph.invoke({"requirement": requirement, "browser": browser})
-
-            playwright_script = state.get("playwright_script", "N/A")
-            execution_result = state.get("execution_result", "No result.")
-            analysis = state.get("analysis", "")
-            test_stats_report = state.get("test_stats_report", "")
-
-            # Save to history
-            history = ScriptHistory(
-                user_id=current_user.id,
-                requirement=requirement,
-                script=playwright_script,
-                result=execution_result + ("\n\nAnalysis:\n" + analysis if analysis else "") + ("\n\nStats:\n" + test_stats_report if test_stats_report else "")
-            )
-            db.session.add(history)
-            db.session.commit()
-
-            return render_template('generate.html',
-                                 form=form,
-                                 playwright_script=playwright_script,
-                                 execution_result=execution_result,
-                                 analysis=analysis,
-                                 test_stats_report=test_stats_report)
+            # Identical in-flight submissions share one background task
+            candidates = form.candidates.data or 1
+            key = single_flight_key('test' if candidates == 1 else f'test-k{candidates}', ','.join(browsers), requirement)
+            task_id, attached = submit_single_flight(process_test_generation, key, [requirement, browser, current_user.id, browsers, candidates],
+                                                     user=current_user)
+            if attached:
+                flash('An identical test is already running. Showing its progress.', 'info')
+
+            return redirect(url_for('main.task_status', task_id=task_id))
         except Exception as e:
             flash(f'An error occurred: {str(e)}', 'danger')
             return redirect(url_for('main.generate'))
@@ -86,7 +81,20 @@ def history():
         )
 
     scripts = query.order_by(ScriptHistory.timestamp.desc()).all()
-    return render_template('history.html', scripts=scripts, search_form=search_form, search_query=search_query)
+
+    # Failure screenshots and traces kept for each run
+    artifacts = {}
+    manifests = load_manifests(script.artifact_run_id for script in scripts if script.artifact_run_id)
+    for script in scripts:
+        manifest = manifests.get(script.artifact_run_id)
+        if manifest:
+            artifacts[script.id] = [
+                {'name': entry['name'], 'size': entry['size'],
+                 'url': url_for('main.download_artifact', run_id=script.artifact_run_id, name=entry['name'])}
+                for entry in manifest['files']
+            ]
+
+    return render_template('history.html', scripts=scripts, search_form=search_form, search_query=search_query, artifacts=artifacts)
 
 @main.route('/download/<int:script_id>')
 @login_required
@@ -108,6 +116,26 @@ def download_script(script_id):
         mimetype='text/x-python'
     )
 
+@main.route('/artifacts/<run_id>/<path:name>')
+@login_required
+def download_artifact(run_id, name):
+    if current_user.role not in ['developer', 'qa']:
+        flash('Access denied.', 'danger')
+        return redirect(url_for('main.home'))
+
+    artifact = open_artifact(run_id, name)
+    if artifact is None:
+        abort(404)
+    data, content_type = artifact
+
+    # Screenshots open inline; traces and logs download
+    return send_file(
+        io.BytesIO(data),
+        as_attachment=not content_type.startswith('image/'),
+        download_name=name,
+        mimetype=content_type
+    )
+
 @main.route('/rerun/<int:script_id>')
 @login_required
 @limiter.limit("5 per minute")
@@ -131,7 +159,8 @@ def rerun_script(script_id):
             user_id=current_user.id,
             requirement=script.requirement,
             script=new_playwright_script,
-            result=new_execution_result + ("\n\nAnalysis:\n" + new_analysis if new_analysis else "")
+            result=new_execution_result + ("\n\nAnalysis:\n" + new_analysis if new_analysis else ""),
+            artifact_run_id=state.get("artifact_run_id")
         )
         db.session.add(new_history)
         db.session.commit()
@@ -179,11 +208,17 @@ def generate_code():
                 zip_file.save(temp_zip.name)
                 temp_zip_path = temp_zip.name
 
-            # Start background task
-            task = process_code_generation.delay(requirement, browser, temp_zip_path, current_user.id)
+            # Start background task, or attach to an identical one already in flight
+            with open(temp_zip_path, 'rb') as f:
+                key = single_flight_key('code', browser, requirement, f.read())
+            task_id, attached = submit_single_flight(process_code_generation, key, [requirement, browser, temp_zip_path, current_user.id],
+                                                     user=current_user)
+            if attached:
+                os.unlink(temp_zip_path)
+                flash('An identical code generation job is already running. Showing its progress.', 'info')
 
             # Redirect to status page
-            return redirect(url_for('main.task_status', task_id=task.id))
+            return redirect(url_for('main.task_status', task_id=task_id))
 
         except Exception as e:
             flash(f'An error occurred: {str(e)}', 'danger')
@@ -202,11 +237,13 @@ def task_status(task_id):
     task = process_code_generation.AsyncResult(task_id)
 
     if task.state == 'PENDING':
+        position = fair_queue.queue_position(task_id)
         response = {
             'state': task.state,
             'current': 0,
             'total': 100,
-            'status': 'Task is pending...'
+            'status': f'Queued, position {position}...' if position else 'Task is pending...',
+            'queue_position': position
         }
     elif task.state == 'PROGRESS':
         response = {
@@ -246,6 +283,14 @@ def task_result(task_id):
 
     if task.state == 'SUCCESS':
         result = task.result
+        if 'generated_code' not in result:
+            return render_template('generate.html',
+                                 form=GenerateForm(),
+                                 playwright_script=result.get('playwright_script', 'N/A'),
+                                 execution_result=result.get('execution_result', 'No result.'),
+                                 analysis=result.get('analysis', ''),
+                                 test_stats_report=result.get('test_stats_report', ''),
+                                 matrix_results=result.get('matrix_results'))
         return render_template('generate_code.html',
                              form=CodeGenerateForm(),
                              generated_code=result.get('generated_code', {}),
@@ -256,3 +301,132 @@ def task_result(task_id):
     else:
         flash('Task not completed yet or failed.', 'warning')
         return redirect(url_for('main.generate_code'))
+
+@main.route('/task/<task_id>/cancel', methods=['POST'])
+@login_required
+def cancel_task(task_id):
+    """
+    Cancel a background job. Queued tasks are revoked; running ones stop after the
+    current graph node, their script process tree is killed and partial results are saved.
+    A job shared by identical submissions keeps running until its last submitter cancels.
+    """
+    if current_user.role != 'developer':
+        return jsonify({'success': False, 'error': 'Access denied.', 'code': 'FORBIDDEN'}), 403
+    if not owns_job(task_id, current_user.id):
+        return jsonify({'success': False, 'error': 'Job not found.', 'code': 'NOT_FOUND'}), 404
+
+    if detach_job(task_id, current_user.id):
+        if request.is_json or request.accept_mimetypes.best == 'application/json':
+            return jsonify({'success': True, 'task_id': task_id, 'status': 'detached'}), 202
+        flash('You are no longer following this job; it keeps running for the others who submitted it.', 'info')
+        return redirect(url_for('main.home'))
+
+    request_cancel(task_id)
+    removed = fair_queue.remove(task_id)
+    # Not terminate=True: killing the worker process would lose the partial results
+    result = process_code_generation.AsyncResult(task_id)
+    result.revoke()
+    if not removed and result.state == 'PENDING':
+        # Dispatched but not started: a revoked task never runs, so it would never free its running slot
+        fair_queue.job_finished(task_id)
+
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        return jsonify({'success': True, 'task_id': task_id, 'status': 'cancelling'}), 202
+    flash('Cancelling the job. Partial results will be saved to history.', 'info')
+    return redirect(url_for('main.task_status', task_id=task_id))
+
+@main.route('/task/<task_id>/stream')
+@login_required
+def task_stream(task_id):
+    """Server-sent events with the live output and step events of a running task."""
+    if current_user.role != 'developer':
+        return jsonify({'success': False, 'error': 'Access denied.', 'code': 'FORBIDDEN'}), 403
+
+    def events():
+        for event in follow(channel_for(task_id)):
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@main.route('/api/suites', methods=['POST'])
+@login_required
+@limiter.limit("10 per hour")
+def submit_suite():
+    if current_user.role not in ['developer', 'qa']:
+        return jsonify({'success': False, 'error': 'Access denied.', 'code': 'FORBIDDEN'}), 403
+
+    payload = request.get_json(silent=True) or {}
+    max_items = current_app.config['SUITE_MAX_ITEMS']
+
+    try:
+        if payload.get('history_ids'):
+            # Rerun the requirements of the user's own previously saved scripts
+            scripts = ScriptHistory.query.filter(ScriptHistory.id.in_(payload['history_ids']),
+                                                 ScriptHistory.user_id == current_user.id).all()
+            if not scripts:
+                raise SuiteValidationError('No scripts found for the given history_ids.')
+            browsers = payload.get('browsers') or ['chromium']
+            requirements = list(dict.fromkeys(history_requirement(s.requirement) for s in scripts))
+            items = parse_suite_items({'requirements': requirements, 'browsers': browsers}, max_items=max_items)
+        elif 'suite_csv' in request.files:
+            csv_text = request.files['suite_csv'].read().decode('utf-8-sig')
+            items = parse_suite_items({'browsers': request.form.getlist('browsers')}, csv_text=csv_text, max_items=max_items)
+        else:
+            items = parse_suite_items(payload, max_items=max_items)
+    except SuiteValidationError as e:
+        return jsonify({'success': False, 'error': str(e), 'code': 'VALIDATION_ERROR'}), 400
+
+    # Each chunk waits in the submitter's fair queue like any other job and runs its
+    # items side by side, so their async scripts share execution batches; chunks are
+    # small enough for all their items to finish within one task's time limit. A chunk
+    # holds one fair-queue slot per item, so it never holds more than the user's quota
+    size = chunk_size_for(len(items), current_app.config['SUITE_MAX_CONCURRENCY'],
+                          min(SUITE_CHUNK_THREADS, fair_queue.ROLE_QUOTAS.get(current_user.role, 1)))
+    suite_id = str(uuid.uuid4())
+    chunks = [str(uuid.uuid4()) for _ in range(0, len(items), size)]
+    save_suite(suite_id, {'user_id': current_user.id, 'submitted_by': current_user.username,
+                          'submitted_at': datetime.utcnow().isoformat(), 'chunks': chunks,
+                          'chunk_size': size, 'items': items})
+    for index, task_id in enumerate(chunks):
+        start = index * size
+        chunk = items[start:start + size]
+        fair_queue.enqueue(run_suite_chunk, [chunk, current_user.id, suite_id, start], {},
+                           task_id, current_user.id, current_user.role, slots=len(chunk))
+
+    return jsonify({
+        'success': True,
+        'suite_id': suite_id,
+        'items': len(items),
+        'status_url': url_for('main.suite_status', suite_id=suite_id)
+    }), 202
+
+@main.route('/api/suites/<suite_id>')
+@login_required
+def suite_status(suite_id):
+    if current_user.role not in ['developer', 'qa']:
+        return jsonify({'success': False, 'error': 'Access denied.', 'code': 'FORBIDDEN'}), 403
+
+    suite = load_suite(suite_id)
+    if not suite or suite['user_id'] != current_user.id:
+        return jsonify({'success': False, 'error': 'Suite not found.', 'code': 'NOT_FOUND'}), 404
+
+    # Items are stored as they finish; a chunk that died (e.g. hard time limit) reports its unfinished items as errors
+    stored = load_suite_items(suite_id)
+    failed = {}
+    if len(stored) < len(suite['items']):
+        for index, task_id in enumerate(suite['chunks']):
+            result = run_suite_chunk.AsyncResult(task_id)
+            if result.state in ('FAILURE', 'REVOKED'):
+                failed[index] = str(result.info)
+    items = collect_items(suite, stored, failed)
+    if len(items) == len(suite['items']):
+        report = aggregate_suite(items, suite['submitted_by'], suite['submitted_at'])
+        return jsonify({'success': True, 'state': 'SUCCESS', **report})
+    # Chunks still waiting in the fair queue report where the first of them stands
+    position = next((p for p in map(fair_queue.queue_position, suite['chunks']) if p is not None), None)
+    return jsonify({'success': True, 'state': 'PROGRESS' if items or position is None else 'PENDING',
+                    'items_done': len(items), 'items': len(suite['items']), 'queue_position': position})
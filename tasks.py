@@ -1,14 +1,90 @@
 from celery_app import celery
-from graph import build_code_generation_graph
+from graph import build_graph, build_code_generation_graph
 from utils.zip_handler import ZipHandler
+from utils.single_flight import release_single_flight
+from utils.log_stream import channel_for, publish_end
+from utils.cancellation import run_graph, JobCancelled, cancelled_result
+from utils import fair_queue
+from utils.suite import build_suite_report, save_suite_item
+from utils.impact_analysis import record_result, reusable_result
+from utils.app_runner import release as release_app
+from agents.stats_aggregator import stats_commentary
 from models import db, ScriptHistory
 from flask_login import current_user
 import tempfile
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Most suite items in one chunk; they all run at the same time in a worker
+SUITE_CHUNK_THREADS = int(os.environ.get('SUITE_CHUNK_THREADS') or 8)
+
+@celery.task(bind=True)
+def process_test_generation(self, requirement, browser, user_id, browsers=None, candidates=None, single_flight_key=None):
+    """
+    Background task for generating and executing a test script.
+    Identical submissions attach to this task through the single-flight key.
+    """
+    try:
+        self.update_state(state='PROGRESS', meta={'progress': 10, 'message': 'Generating test script...'})
+
+        graph = build_graph()
+        try:
+            state = run_graph(graph, {"requirement": requirement, "browser": browser, "browsers": browsers,
+                                      "speculative_candidates": candidates,
+                                      "log_channel": channel_for(self.request.id), "cancel_key": self.request.id},
+                              job_id=self.request.id)
+        except JobCancelled as e:
+            # Keep whatever was produced before the cancel
+            state = dict(e.state, execution_result=cancelled_result(e))
+
+        self.update_state(state='PROGRESS', meta={'progress': 90, 'message': 'Saving results...'})
+
+        playwright_script = state.get("playwright_script", "N/A")
+        execution_result = state.get("execution_result", "No result.")
+        analysis = state.get("analysis", "")
+        test_stats_report = state.get("test_stats_report", "")
+        matrix_report = state.get("matrix_report", "")
+        if matrix_report:
+            test_stats_report = f"{test_stats_report}\n\n{matrix_report}" if test_stats_report else matrix_report
+
+        # Save to history
+        with celery.flask_app.app_context():
+            history = ScriptHistory(
+                user_id=user_id,
+                requirement=requirement,
+                script=playwright_script,
+                result=execution_result + ("\n\nAnalysis:\n" + analysis if analysis else "") + ("\n\nStats:\n" + test_stats_report if test_stats_report else ""),
+                artifact_run_id=state.get("artifact_run_id")
+            )
+            db.session.add(history)
+            db.session.commit()
+
+        # Commentary is appended to the history entry later; the result never waits for it
+        if celery.flask_app.config.get('STATS_COMMENTARY') and state.get("test_stats"):
+            enrich_stats_report.delay(history.id, state.get("test_stats"), execution_result)
+
+        self.update_state(state='PROGRESS', meta={'progress': 100, 'message': 'Complete!'})
+
+        return {
+            'playwright_script': playwright_script,
+            'execution_result': execution_result,
+            'analysis': analysis,
+            'test_stats_report': test_stats_report,
+            'matrix_results': state.get("matrix_results")
+        }
+
+    except Exception as e:
+        self.update_state(state='FAILURE', meta={'error': str(e)})
+        raise
+    finally:
+        release_single_flight(single_flight_key, self.request.id)
+        publish_end(channel_for(self.request.id), 'finished')
+        fair_queue.job_finished(self.request.id)
 
 @celery.task(bind=True)
-def process_code_generation(self, requirement, browser, zip_path, user_id):
+def process_code_generation(self, requirement, browser, zip_path, user_id, single_flight_key=None):
     """
     Background task for processing code generation requests.
     Updates task state for progress tracking.
@@ -26,16 +102,29 @@ def process_code_generation(self, requirement, browser, zip_path, user_id):
         # Clean up temp file
         os.unlink(zip_path)
 
-        self.update_state(state='PROGRESS', meta={'progress': 30, 'message': 'Analyzing code and generating features...'})
+        # A re-upload whose changes cannot affect the tested routes reuses the last passing result
+        state = reusable_result(user_id, requirement, browser, extracted_code)
+        if state is None:
+            self.update_state(state='PROGRESS', meta={'progress': 30, 'message': 'Analyzing code and generating features...'})
 
-        # Run code generation graph
-        graph = build_code_generation_graph()
-        state = graph.invoke({
-            "requirement": requirement,
-            "browser": browser,
-            "extracted_code": extracted_code,
-            "framework": framework
-        })
+            # Run code generation graph
+            graph = build_code_generation_graph()
+            try:
+                state = run_graph(graph, {
+                    "requirement": requirement,
+                    "browser": browser,
+                    "extracted_code": extracted_code,
+                    "framework": framework,
+                    "log_channel": channel_for(self.request.id),
+                    "cancel_key": self.request.id
+                }, job_id=self.request.id)
+            except JobCancelled as e:
+                # Cancelled between app_runner and app_release: free the app server now
+                if e.state.get("app_lease"):
+                    release_app(e.state["app_lease"])
+                state = dict(e.state, execution_result=cancelled_result(e))
+            else:
+                record_result(user_id, requirement, browser, extracted_code, state)
 
         self.update_state(state='PROGRESS', meta={'progress': 80, 'message': 'Running tests...'})
 
@@ -50,12 +139,15 @@ def process_code_generation(self, requirement, browser, zip_path, user_id):
             history_result = f"Generated Code:\n{str(generated_code)}\n\nIntegration Instructions:\n{integration_instructions}\n\nTest Script:\n{playwright_script}\n\nExecution Result:\n{execution_result}"
             if test_stats_report:
                 history_result += f"\n\nStats:\n{test_stats_report}"
+            if state.get("app_status"):
+                history_result += f"\n\nApp Under Test:\n{state['app_status']}"
 
             history = ScriptHistory(
                 user_id=user_id,
                 requirement=f"[CODE GEN] {requirement}",
                 script=str(generated_code),
-                result=history_result
+                result=history_result,
+                artifact_run_id=state.get("artifact_run_id")
             )
             db.session.add(history)
             db.session.commit()
@@ -73,3 +165,86 @@ def process_code_generation(self, requirement, browser, zip_path, user_id):
     except Exception as e:
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise
+    finally:
+        release_single_flight(single_flight_key, self.request.id)
+        publish_end(channel_for(self.request.id), 'finished')
+        fair_queue.job_finished(self.request.id)
+
+@celery.task(bind=True)
+def run_suite_chunk(self, items, user_id, suite_id, offset):
+    """
+    Run a chunk of suite items side by side, so their async scripts reach the
+    executor together and share execution batches (see utils.async_batcher).
+    Each item's result is stored under its index in the suite (`offset` is the
+    chunk's first) as soon as it finishes.
+    """
+    def run(index, item):
+        result = _run_suite_item(item[0], item[1], user_id)
+        save_suite_item(suite_id, offset + index, result)
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(items))) as pool:
+            return list(pool.map(run, range(len(items)), items))
+    finally:
+        # Suite chunks are dispatched by the fair queue, see routes_new.submit_suite
+        fair_queue.job_finished(self.request.id)
+
+def _run_suite_item(requirement, browser, user_id):
+    """
+    Run one batch suite item through the test graph.
+    Failures are reported in the item result so one bad item never breaks the suite.
+    """
+    started = time.time()
+    item = {'requirement': requirement, 'browser': browser}
+    try:
+        graph = build_graph()
+        state = graph.invoke({"requirement": requirement, "browser": browser})
+
+        playwright_script = state.get("playwright_script", "N/A")
+        execution_result = state.get("execution_result", "No result.")
+        test_stats_report = state.get("test_stats_report", "")
+
+        with celery.flask_app.app_context():
+            history = ScriptHistory(
+                user_id=user_id,
+                requirement=f"[SUITE] {requirement}",
+                script=playwright_script,
+                result=execution_result + ("\n\nStats:\n" + test_stats_report if test_stats_report else ""),
+                artifact_run_id=state.get("artifact_run_id")
+            )
+            db.session.add(history)
+            db.session.commit()
+            item['history_id'] = history.id
+
+        item.update({
+            'passed': bool(execution_result) and "[FAIL]" not in execution_result,
+            'execution_result': execution_result,
+            'test_stats': state.get("test_stats") or {}
+        })
+    except Exception as e:
+        item.update({'passed': False, 'error': str(e)})
+
+    item['duration'] = round(time.time() - started, 2)
+    return item
+
+@celery.task(ignore_result=True)
+def enrich_stats_report(history_id, stats, execution_result):
+    """Append LLM commentary on a run's stats to its history entry."""
+    text = stats_commentary(stats, execution_result)
+    if not text:
+        return
+    with celery.flask_app.app_context():
+        history = ScriptHistory.query.get(history_id)
+        if history:
+            history.result += f"\n\nCommentary:\n{text}"
+            db.session.commit()
+
+def aggregate_suite(items, submitted_by, submitted_at):
+    """The report of a suite whose item results are all in."""
+    return {
+        'submitted_by': submitted_by,
+        'submitted_at': submitted_at,
+        'items': items,
+        'report': build_suite_report(items)
+    }
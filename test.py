@@ -1,61 +1,19 @@
-import time
-import json
-from playwright.sync_api import sync_playwright, expect, Page, Locator
-
-# Initialize stats dictionary
-stats = {
-    'execution_time': 0.0,
-    'assertions_passed': 0,
-    'assertions_failed': 0,
-    'total_assertions': 0,
-    'step_coverage': [],
-    'performance': {
-        'page_loads': [],  # List of floats (time in seconds)
-        'action_times': [] # List of floats (time in seconds)
-    },
-    'accessibility_violations': 0, # Not directly tested in this script, but included for completeness
-    'locator_retries': 0,         # Not directly tested in this script, but included for completeness
-    'errors': []                  # List of strings
-}
-
-def track_assertion(assertion_func, *args, **kwargs):
-    """Helper to wrap assertions and track stats."""
-    stats['total_assertions'] += 1
-    try:
-        assertion_func(*args, **kwargs)
-        stats['assertions_passed'] += 1
-    except AssertionError as e:
-        stats['assertions_failed'] += 1
-        stats['errors'].append(f"Assertion Failed: {e}")
-    except Exception as e:
-        stats['assertions_failed'] += 1
-        stats['errors'].append(f"Unexpected Error during assertion: {e}")
-
-def track_action_time(action_func, *args, **kwargs):
-    """Helper to measure and track action execution time."""
-    start = time.time()
-    result = action_func(*args, **kwargs)
-    end = time.time()
-    stats['performance']['action_times'].append(end - start)
-    return result
+from playwright.sync_api import sync_playwright, expect
+from pwstats import track_assertion, track_action_time, step, error
+from utils.launch_policy import launch_browser
+from utils.readiness import goto_ready
 
 def run_test():
-    global stats # Declare global to modify the dictionary
-
-    start_time = time.time()
-
     with sync_playwright() as p:
-        # Launch browser in non-headless mode
-        browser = p.chromium.launch(headless=False)
+        # Launch settings (headless, args, viewport) come from the executor's policy
+        browser = launch_browser(p)
         page = browser.new_page()
 
         try:
             # --- Step 1: Navigate to saucedemo.com ---
-            step_start_time = time.time()
-            page.goto("https://www.saucedemo.com/")
-            page.wait_for_load_state('networkidle') # Wait for the page to be fully loaded
-            stats['performance']['page_loads'].append(time.time() - step_start_time)
-            stats['step_coverage'].append('Navigate to Login Page')
+            # Ready as soon as the login form is visible, no network-idle wait; load time is recorded by pwstats
+            goto_ready(page, "https://www.saucedemo.com/", ready=page.get_by_placeholder("Username"))
+            step('Navigate to Login Page')
 
             # --- Step 2: Enter username and password ---
             # Locate username input using get_by_placeholder
@@ -73,7 +31,7 @@ def run_test():
             login_button = page.get_by_role("button", name="Login").filter(has_text="Login")
             track_assertion(expect(login_button).to_be_visible)
             track_action_time(login_button.click)
-            stats['step_coverage'].append('Login')
+            step('Login')
 
             # --- Step 3: Verify products page after login ---
             # Wait for an element unique to the products page to be visible
@@ -88,23 +46,15 @@ def run_test():
 
             # Verify the URL changed to the inventory page
             track_assertion(expect(page).to_have_url("https://www.saucedemo.com/inventory.html"))
-            stats['step_coverage'].append('Verify Products Page')
+            step('Verify Products Page')
 
         except Exception as e:
-            stats['errors'].append(f"Test execution failed: {e}")
-            # Optionally, take a screenshot on error
-            # page.screenshot(path="error_screenshot.png")
+            error(f"Test execution failed: {e}")
         finally:
             # Close the browser
             browser.close()
 
-    # Calculate total execution time
-    stats['execution_time'] = time.time() - start_time
-
-    # Print stats as JSON
-    print("STATS_JSON_START")
-    print(json.dumps(stats, indent=4))
-    print("STATS_JSON_END")
+    # Stats are printed between the STATS_JSON markers by pwstats when the script exits
 
 if __name__ == "__main__":
-    run_test()
\ No newline at end of file
+    run_test()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Request-level tests for the background-job routes served by app_new.
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'routes.db')}")
+
+import json
+import pytest
+import routes_new
+import tasks
+from app_new import app
+from models import db, User
+
+class _Task:
+    def __init__(self, state='PENDING', info=None):
+        self.state = state
+        self.info = info
+        self.revoked = False
+
+    def revoke(self):
+        self.revoked = True
+
+@pytest.fixture
+def client():
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        user = User.query.filter_by(username='dev').first()
+        if user is None:
+            user = User(username='dev', role='developer')
+            user.set_password('secret')
+            db.session.add(user)
+            db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    client.user_id = user_id
+    return client
+
+def test_background_routes_are_registered():
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert {'/task/<task_id>', '/task/<task_id>/stream', '/task/<task_id>/cancel', '/api/suites'} <= rules
+
+def test_generate_submits_through_single_flight(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(routes_new, 'submit_single_flight',
+                        lambda task, key, args, user=None: submitted.append((task, args, user.id)) or ('task-1', False))
+    response = client.post('/generate', data={'requirement': 'Login to Amazon account', 'browser': 'chromium',
+                                              'candidates': '1', 'predefined': ''})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/task/task-1')
+    assert submitted[0][0] is tasks.process_test_generation
+    assert submitted[0][2] == client.user_id
+
+def test_task_status_reports_queue_position(client, monkeypatch):
+    monkeypatch.setattr(tasks.process_code_generation, 'AsyncResult', lambda task_id: _Task())
+    monkeypatch.setattr(routes_new.fair_queue, 'queue_position', lambda task_id: 2)
+    monkeypatch.setattr(routes_new, 'render_template', lambda name, **context: json.dumps(context['task_response']))
+    response = client.get('/task/task-1')
+    assert response.status_code == 200
+    assert response.get_json(force=True)['status'] == 'Queued, position 2...'
+
+def test_cancel_and_stream(client, monkeypatch):
+    cancelled, finished, others, task = [], [], [1], _Task(state='STARTED')
+    monkeypatch.setattr(routes_new, 'owns_job', lambda task_id, user_id: (task_id, user_id) == ('task-1', client.user_id))
+    monkeypatch.setattr(routes_new, 'detach_job', lambda task_id, user_id: others.pop() if others else 0)
+    monkeypatch.setattr(routes_new, 'request_cancel', cancelled.append)
+    monkeypatch.setattr(routes_new.fair_queue, 'remove', lambda task_id: False)
+    monkeypatch.setattr(routes_new.fair_queue, 'job_finished', finished.append)
+    monkeypatch.setattr(routes_new.process_code_generation, 'AsyncResult', lambda task_id: task)
+
+    # A job other submitters are attached to keeps running for them
+    response = client.post('/task/task-1/cancel', json={})
+    assert response.status_code == 202 and response.get_json()['status'] == 'detached'
+    assert not cancelled and not task.revoked
+
+    response = client.post('/task/task-1/cancel', json={})
+    assert response.status_code == 202
+    assert cancelled == ['task-1'] and task.revoked and not finished
+
+    # A dispatched job that never started gives its fair-queue slot back
+    task.state = 'PENDING'
+    client.post('/task/task-1/cancel', json={})
+    assert finished == ['task-1']
+
+    # Another user's job cannot be cancelled
+    response = client.post('/task/task-2/cancel', json={})
+    assert response.status_code == 404 and response.get_json()['code'] == 'NOT_FOUND'
+    assert 'task-2' not in cancelled
+
+    monkeypatch.setattr(routes_new, 'follow', lambda channel: iter([{'type': 'log', 'line': 'hello'}]))
+    response = client.get('/task/task-1/stream')
+    assert response.mimetype == 'text/event-stream'
+    assert 'event: log' in response.get_data(as_text=True)
+
+def test_suite_submission(client, monkeypatch):
+    queued, suites, stored = [], {}, {}
+    monkeypatch.setattr(routes_new.fair_queue, 'enqueue',
+                        lambda task, args, kwargs, task_id, user_id, role, slots=1: queued.append((task, args, task_id, user_id)))
+    monkeypatch.setattr(routes_new, 'save_suite', suites.__setitem__)
+    monkeypatch.setattr(routes_new, 'load_suite', suites.get)
+    monkeypatch.setattr(routes_new, 'load_suite_items', lambda suite_id: stored)
+    response = client.post('/api/suites', json={'requirements': ['Login to saucedemo as standard_user'],
+                                                'browsers': ['chromium', 'firefox']})
+    assert response.status_code == 202
+    suite_id = response.get_json()['suite_id']
+    assert response.get_json() == dict(response.get_json(), success=True, items=2)
+    # Every chunk waits in the submitter's fair queue
+    assert {task for task, *_ in queued} == {tasks.run_suite_chunk}
+    assert all(user_id == client.user_id for *_, user_id in queued)
+    assert sum(len(args[0]) for _, args, _, _ in queued) == 2
+
+    states = {task_id: _Task() for _, _, task_id, _ in queued}
+    monkeypatch.setattr(tasks.run_suite_chunk, 'AsyncResult', states.__getitem__)
+    monkeypatch.setattr(routes_new.fair_queue, 'queue_position', lambda task_id: 3)
+    assert client.get(f'/api/suites/{suite_id}').get_json()['queue_position'] == 3
+
+    # Items are reported from their stored results, in submission order
+    for _, args, _, _ in queued:
+        for index, (requirement, browser) in enumerate(args[0]):
+            stored[args[3] + index] = {'requirement': requirement, 'browser': browser, 'passed': True, 'duration': 1.0}
+    report = client.get(f'/api/suites/{suite_id}').get_json()
+    assert report['state'] == 'SUCCESS' and report['report']['passed'] == 2
+    assert [item['browser'] for item in report['items']] == ['chromium', 'firefox']
+    assert client.get('/api/suites/unknown').status_code == 404
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the warm app runner used by code generation.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import requests
+from utils import app_runner
+
+PROJECT = {
+    'app.py': "from flask import Flask\napp = Flask(__name__)\nfrom routes import *\n",
+    'routes.py': "from flask import render_template\nfrom app import app\n",
+    'templates/base.html': "<html>{% block content %}{% endblock %}</html>"
+}
+
+def _generated(text, css='h1 {}'):
+    return {
+        'routes_code': "@app.route('/contact')\ndef contact():\n    return render_template('contact.html')",
+        'template_code': {'contact.html': f"<h1>{text}</h1>"},
+        'css_code': {'contact.css': css}
+    }
+
+def test_generated_code_is_applied_to_the_project():
+    files = app_runner.apply_generated_code(PROJECT, _generated('Contact'))
+    assert files['routes.py'].startswith(PROJECT['routes.py'])
+    assert "@app.route('/contact')" in files['routes.py']
+    assert files['templates/contact.html'] == "<h1>Contact</h1>"
+    assert files['static/css/contact.css'] == 'h1 {}'
+    assert app_runner.server_command(files, 'Flask', 5001)[3:5] == ['--app', 'app.py']
+
+def test_diff_output_overrides_whole_files():
+    generated = {'patch': '...', 'files': {'routes.py': 'patched', 'templates/base.html': None}, 'routes_code': 'ignored'}
+    files = app_runner.apply_generated_code(PROJECT, generated)
+    assert files == {'app.py': PROJECT['app.py'], 'routes.py': 'patched'}
+
+def test_only_code_and_template_changes_restart():
+    assert not app_runner.needs_restart(['static/css/contact.css', 'static/js/contact.js'])
+    assert app_runner.needs_restart(['static/css/contact.css', 'templates/contact.html'])
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_runner, 'RUNS_DIR', str(tmp_path))
+    yield app_runner
+    app_runner.stop_all()
+
+def test_files_outside_the_checkout_are_refused(runner, tmp_path):
+    instance = runner.AppInstance('key', 'project', 'flask')
+    for path in ('../escaped.py', '/tmp/escaped.py', 'static/../../escaped.py'):
+        with pytest.raises(runner.AppStartError, match='outside its directory'):
+            instance.sync({'app.py': 'app', path: 'x'})
+    # Nothing is written when any path is refused
+    assert not os.path.exists(instance.workdir) and not (tmp_path.parent / 'escaped.py').exists()
+    instance.sync({'app.py': 'app', 'templates/./index.html': 'hi'})
+    assert (tmp_path / os.path.basename(instance.workdir) / 'templates' / 'index.html').read_text() == 'hi'
+
+def test_app_gets_a_minimal_environment(monkeypatch):
+    monkeypatch.setenv('GOOGLE_API_KEY', 'secret')
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://worker')
+    monkeypatch.setenv('PYTHONPATH', '/opt/lib')
+    env = app_runner.app_env(5001)
+    assert 'GOOGLE_API_KEY' not in env and 'DATABASE_URL' not in env
+    assert env['PORT'] == '5001' and env['PYTHONPATH'] == '/opt/lib' and env['PATH'] == os.environ['PATH']
+
+def test_warm_instance_is_hot_swapped(runner):
+    url, info = runner.serve(PROJECT, _generated('Contact us'), 'flask')
+    assert info['mode'] == 'cold'
+    assert requests.get(f'{url}contact', timeout=5).text == '<h1>Contact us</h1>'
+    runner.release(info['lease'])
+
+    # Static assets are swapped under the running server
+    same_url, info = runner.serve(PROJECT, _generated('Contact us', css='h1 { color: red }'), 'flask')
+    assert same_url == url
+    assert info == dict(info, mode='hot-swap', restarted=False, changed=['static/css/contact.css'])
+    assert requests.get(f'{url}static/css/contact.css', timeout=5).text == 'h1 { color: red }'
+    runner.release(info['lease'])
+
+    # Templates are cached by the app, so they restart it on the same port
+    same_url, info = runner.serve(PROJECT, _generated('Write to us', css='h1 { color: red }'), 'flask')
+    assert same_url == url and info['restarted']
+    assert requests.get(f'{url}contact', timeout=5).text == '<h1>Write to us</h1>'
+
+    # The same code is served by the same instance, even while it is leased
+    _, info = runner.serve(PROJECT, _generated('Write to us', css='h1 { color: red }'), 'flask')
+    assert info['mode'] == 'reuse'
+
+def test_leased_instance_is_not_swapped_or_evicted(runner, monkeypatch):
+    monkeypatch.setattr(runner, 'MAX_INSTANCES', 1)
+    url, first = runner.serve(PROJECT, _generated('Contact us'), 'flask')
+
+    # Another job on the same project gets a server of its own while the first one is testing
+    other_url, info = runner.serve(PROJECT, _generated('Write to us'), 'flask')
+    assert other_url != url and info['mode'] == 'cold'
+    assert requests.get(f'{url}contact', timeout=5).text == '<h1>Contact us</h1>'
+    assert requests.get(f'{other_url}contact', timeout=5).text == '<h1>Write to us</h1>'
+
+    runner.release(first['lease'])
+    runner.release(info['lease'])
+    _, info = runner.serve(PROJECT, _generated('Contact us', css='h1 { color: red }'), 'flask')
+    assert info['mode'] == 'hot-swap'
+
+def test_startup_failure_is_reported(runner):
+    broken = dict(PROJECT, **{'app.py': "raise SystemExit('missing SECRET_KEY')\n"})
+    with pytest.raises(app_runner.AppStartError, match='SECRET_KEY'):
+        runner.serve(broken, _generated('Contact'), 'flask')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the failure artifact store.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+from utils import artifacts
+
+def _make_run_dir(tmp_path, name, files):
+    run_dir = tmp_path / name
+    run_dir.mkdir()
+    for filename, data in files.items():
+        (run_dir / filename).write_bytes(data)
+    return str(run_dir)
+
+def test_collect_and_open(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, 'ARTIFACTS_ROOT', str(tmp_path / 'store'))
+    run_dir = _make_run_dir(tmp_path, 'run1', {
+        'failure.png': b'\x89PNG' + b'0' * 1000,
+        'test_script.py': b'print("not an artifact")'
+    })
+
+    run_id = artifacts.new_run_id()
+    assert artifacts.collect_run(run_id, run_dir, prefix='chromium') == 1
+
+    manifest = artifacts.load_manifest(run_id)
+    entry = manifest['files'][0]
+    assert entry['name'] == 'chromium-failure.png'
+    assert entry['compressed_size'] < entry['size']
+    assert artifacts.open_artifact(run_id, 'chromium-failure.png') == (b'\x89PNG' + b'0' * 1000, 'image/png')
+    assert artifacts.open_artifact(run_id, 'missing.png') is None
+    assert artifacts.load_manifest('../etc') is None
+
+    # A second attempt in the same run keeps both copies
+    artifacts.collect_run(run_id, run_dir, prefix='chromium')
+    names = [e['name'] for e in artifacts.load_manifest(run_id)['files']]
+    assert names == ['chromium-failure.png', 'chromium-failure-2.png']
+    assert list(artifacts.load_manifests([run_id, artifacts.new_run_id(), '../etc'])) == [run_id]
+
+def test_retention_drops_old_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, 'ARTIFACTS_ROOT', str(tmp_path / 'store'))
+    old_id, new_id = artifacts.new_run_id(), artifacts.new_run_id()
+    artifacts.collect_run(old_id, _make_run_dir(tmp_path, 'old', {'old.log': b'old output'}))
+    artifacts.collect_run(new_id, _make_run_dir(tmp_path, 'new', {'new.log': b'new output'}))
+
+    manifest_path = os.path.join(artifacts.ARTIFACTS_ROOT, 'runs', old_id, 'manifest.json')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['created_at'] = time.time() - 30 * 86400
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+    artifacts.enforce_retention(max_age_days=7)
+    assert artifacts.load_manifest(old_id) is None
+    assert artifacts.load_manifest(new_id) is not None
+
+def test_existing_databases_gain_the_artifact_column(tmp_path):
+    import sqlite3
+    from flask import Flask
+    from models import db, upgrade_schema
+
+    path = tmp_path / 'old.db'
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE script_history (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, requirement TEXT NOT NULL, '
+                 'script TEXT NOT NULL, result TEXT NOT NULL, timestamp DATETIME)')
+    conn.commit()
+    conn.close()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        upgrade_schema()
+        upgrade_schema()
+        columns = {c['name'] for c in db.inspect(db.engine).get_columns('script_history')}
+    assert 'artifact_run_id' in columns
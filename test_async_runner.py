@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for batched async script execution.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import async_batcher, async_runner
+
+def _fake_sandbox(batches):
+    def run_sandboxed(cmd, cwd, env, timeout, limits=None, on_line=None, should_stop=None):
+        with open(cmd[-1], encoding='utf-8') as f:
+            manifest = json.load(f)
+        batches.append(manifest)
+        for index, engine in enumerate(manifest['engines']):
+            result = {'index': index, 'error': None, 'timed_out': False, 'duration': 0.1, 'stdout': f'{engine}\n',
+                      'stats': {'assertions_passed': 1, 'assertions_failed': 0, 'errors': []}}
+            on_line('stdout', f'{async_runner.RESULT_MARKER} {json.dumps(result)}\n')
+        return {'returncode': 0, 'timed_out': False, 'termination': None, 'stdout': '', 'stderr': '',
+                'resource_usage': {'wall_seconds': 1.0, 'cpu_seconds': 0.5}}
+    return run_sandboxed
+
+def test_one_batch_runs_every_engine(monkeypatch):
+    import utils.sandbox
+    batches = []
+    monkeypatch.setattr(utils.sandbox, 'run_sandboxed', _fake_sandbox(batches))
+    jobs = [{'script': 'async def run(context):\n    pass\n', 'browser': browser} for browser in ('chromium', 'firefox')]
+    runs = async_runner.run_async_jobs(jobs, options={'network': {'mode': 'off'}, 'artifacts': False})
+    assert len(batches) == 1 and batches[0]['engines'] == ['chromium', 'firefox']
+    assert [(run['browser'], run['passed'], run['stdout']) for run in runs] == [('chromium', True, 'chromium\n'),
+                                                                             ('firefox', True, 'firefox\n')]
+    assert runs[0]['resource_usage']['batch_size'] == 2
+
+def test_concurrent_runs_share_a_batch(monkeypatch):
+    batches = []
+    started = threading.Barrier(3)
+
+    def run_async_jobs(jobs, timeout=None, options=None):
+        batches.append([job['browser'] for job in jobs])
+        return [{'browser': job['browser'], 'passed': True} for job in jobs]
+    monkeypatch.setattr(async_batcher, 'run_async_jobs', run_async_jobs)
+    monkeypatch.setattr(async_batcher, 'WINDOW', 5)
+    monkeypatch.setattr(async_batcher, 'DEFAULT_CONCURRENCY', 3)
+
+    def submit(browser):
+        started.wait()
+        return async_batcher.run('async def run(context):\n    pass\n', browser=browser, options={'artifact_prefix': browser})
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        runs = list(pool.map(submit, ['chromium', 'firefox', 'webkit']))
+    assert [run['browser'] for run in runs] == ['chromium', 'firefox', 'webkit']
+    assert len(batches) == 1 and sorted(batches[0]) == ['chromium', 'firefox', 'webkit']
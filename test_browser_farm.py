@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tests for browser farm scheduling.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+from utils import browser_farm
+from utils.launch_policy import connect_options, LAUNCH_OPTIONS_HEADER
+
+def _node(node_id, load, capacity, healthy=True):
+    return {'id': node_id, 'ws_endpoint': f'ws://{node_id}/', 'capacity': capacity, 'load': load, 'healthy': healthy}
+
+def test_parse_capacity():
+    assert browser_farm.parse_capacity('chromium=4, firefox=2') == {'chromium': 4, 'firefox': 2}
+    assert browser_farm.parse_capacity('webkit') == {'webkit': 1}
+
+def test_least_loaded_node_wins():
+    nodes = [_node('a:3100', 2, {'chromium': 4}), _node('b:3100', 1, {'chromium': 4}), _node('c:3100', 1, {'chromium': 2})]
+    assert browser_farm.pick_node(nodes, 'chromium')['id'] == 'b:3100'
+
+def test_full_unhealthy_and_other_engine_nodes_are_skipped():
+    nodes = [_node('a:3100', 2, {'chromium': 2}), _node('b:3100', 0, {'chromium': 4}, healthy=False),
+             _node('c:3100', 0, {'firefox': 2})]
+    assert browser_farm.pick_node(nodes, 'chromium') is None
+    assert browser_farm.pick_node(nodes, 'firefox')['id'] == 'c:3100'
+
+def test_farm_off_means_local_launch():
+    assert browser_farm.lease_for_run('chromium', 300) is None
+
+def test_launch_options_travel_in_connect_header():
+    options = connect_options({'headless': True, 'args': ['--disable-gpu'], 'chromium_sandbox': False, 'slow_mo': 50,
+                               'ignore_default_args': ['--mute-audio'], 'firefox_user_prefs': {'media.autoplay.default': 5}})
+    assert json.loads(options['headers'][LAUNCH_OPTIONS_HEADER]) == {
+        'headless': True, 'args': ['--disable-gpu'], 'chromiumSandbox': False, 'slowMo': 50,
+        'ignoreDefaultArgs': ['--mute-audio'], 'firefoxUserPrefs': {'media.autoplay.default': 5}}
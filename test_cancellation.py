@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for job cancellation flags and ownership.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import cancellation
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def sadd(self, key, value):
+        members = self.data.setdefault(key, set())
+        added = str(value) not in members
+        members.add(str(value))
+        return int(added)
+
+    def srem(self, key, value):
+        members = self.data.get(key, set())
+        removed = str(value) in members
+        members.discard(str(value))
+        return int(removed)
+
+    def scard(self, key):
+        return len(self.data.get(key, ()))
+
+    def sismember(self, key, value):
+        return str(value) in self.data.get(key, ())
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+def test_only_the_owner_may_cancel(monkeypatch):
+    monkeypatch.setattr(cancellation, 'redis_client', _FakeRedis())
+    assert cancellation.register_job('job-1', 7)
+    assert cancellation.owns_job('job-1', 7)
+    assert not cancellation.owns_job('job-1', 8)
+    assert not cancellation.register_job('job-1', 8)
+    assert not cancellation.owns_job('job-2', 7)
+
+def test_coalesced_submitters_detach_one_by_one(monkeypatch):
+    monkeypatch.setattr(cancellation, 'redis_client', _FakeRedis())
+    cancellation.register_job('job-1', 7)
+    cancellation.attach_job('job-1', 8)
+    assert cancellation.owns_job('job-1', 8)
+    assert cancellation.detach_job('job-1', 7) == 1
+    assert not cancellation.owns_job('job-1', 7) and cancellation.owns_job('job-1', 8)
+    assert cancellation.detach_job('job-1', 8) == 0
+
+def test_a_reused_id_starts_uncancelled(monkeypatch):
+    monkeypatch.setattr(cancellation, 'redis_client', _FakeRedis())
+    cancellation.register_job('job-1', 7)
+    cancellation.request_cancel('job-1')
+    assert cancellation.is_cancelled(cancellation.child_key('job-1', 'candidate-0'))
+
+    assert cancellation.register_job('job-1', 7)
+    assert not cancellation.is_cancelled('job-1')
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for test impact analysis on re-uploaded projects.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from utils import impact_analysis
+
+PROJECT = {
+    'app.py': "from flask import Flask\napp = Flask(__name__)\nimport routes\n",
+    'models.py': "class User:\n    pass\n",
+    'routes.py': (
+        "from flask import render_template\nfrom app import app\nfrom models import User\n\n"
+        "@app.route('/')\ndef index():\n    return render_template('index.html')\n\n"
+        "@app.route('/users/<int:user_id>')\ndef user(user_id):\n    return render_template('user.html')\n"
+    ),
+    'templates/base.html': "<link href=\"{{ url_for('static', filename='css/site.css') }}\">{% block content %}{% endblock %}",
+    'templates/index.html': "{% extends 'base.html' %}",
+    'templates/user.html': "{% extends 'base.html' %}<script src=\"/static/js/user.js\"></script>",
+    'static/css/site.css': "body {}",
+    'static/js/user.js': "",
+    'README.md': "My app"
+}
+
+APP_URL = 'http://127.0.0.1:5000/'
+# The script opened /users/7 and an external page; /users/7 redirected to /users/7/ on its own
+VISITED = ['http://localhost:5000/users/7', 'http://127.0.0.1:5000/users/7/', 'https://www.google.com/']
+
+STATE = {'generated_code': {'routes_code': ''}, 'app_url': APP_URL, 'test_stats': {'visited_urls': VISITED},
+         'execution_result': '[PASS] Test execution succeeded.', 'test_stats_report': 'report'}
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(impact_analysis, 'STORE_PATH', str(tmp_path / 'impact.db'))
+    impact_analysis.record_result(1, 'Check the user page', 'chromium', PROJECT, STATE)
+    return impact_analysis
+
+def test_dependency_map_follows_templates_and_static():
+    routes = impact_analysis.dependency_map(PROJECT)
+    assert routes['/users/<int:user_id>']['templates'] == ['templates/base.html', 'templates/user.html']
+    assert routes['/users/<int:user_id>']['files'] == ['app.py', 'models.py', 'routes.py', 'static/css/site.css',
+                                                       'static/js/user.js', 'templates/base.html', 'templates/user.html']
+    assert 'static/js/user.js' not in routes['/']['files']
+    assert impact_analysis.visited_paths(VISITED, APP_URL) == ['/users/7', '/users/7/']
+    assert impact_analysis.tested_routes(['/users/7', '/users/7/'], routes) == ['/users/<int:user_id>']
+
+    # Routes the generated code adds are the feature under test, even when the script only visits '/'
+    patched = dict(PROJECT, **{'routes.py': PROJECT['routes.py'] + "\n@app.route('/contact')\ndef contact():\n    return 'hi'\n"})
+    tested = impact_analysis.tested_routes(['/'], impact_analysis.dependency_map(patched), routes)
+    assert tested == ['/', '/contact']
+
+    # A path no route accounts for (e.g. a blueprint the map missed) leaves nothing attributed
+    assert impact_analysis.tested_routes(['/users/7', '/admin/login'], routes) == []
+
+def test_unaffecting_change_reuses_the_result(store):
+    changed = dict(PROJECT, **{'README.md': "My app, v2", 'templates/index.html': "{% extends 'base.html' %}<p>Hi</p>"})
+    state = store.reusable_result(1, 'Check the  user page', 'chromium', changed)
+    assert state['impact_reused']
+    assert state['execution_result'].startswith("♻️ Reused the previous result: 2 changed files (README.md, templates/index.html)")
+    assert state['test_stats_report'] == 'report'
+
+@pytest.mark.parametrize('path', ['templates/user.html', 'static/css/site.css', 'models.py', 'config.py',
+                                  'requirements.txt', '.env', 'static/img/unreferenced.png'])
+def test_affecting_change_reruns(store, path):
+    changed = dict(PROJECT, **{path: "changed"})
+    assert store.reusable_result(1, 'Check the user page', 'chromium', changed) is None
+
+@pytest.mark.parametrize('stats', [{'visited_urls': VISITED + ['http://127.0.0.1:5000/admin/login']}, {}])
+def test_unattributed_runs_rerun_on_any_change(store, stats):
+    store.record_result(1, 'Check the user page', 'chromium', PROJECT, dict(STATE, test_stats=stats))
+    assert store.reusable_result(1, 'Check the user page', 'chromium', PROJECT) is not None
+    changed = dict(PROJECT, **{'README.md': "My app, v2"})
+    assert store.reusable_result(1, 'Check the user page', 'chromium', changed) is None
+
+def test_results_are_per_user_requirement_and_browser(store):
+    assert store.reusable_result(1, 'Check the user page', 'chromium', PROJECT) is not None
+    assert store.reusable_result(2, 'Check the user page', 'chromium', PROJECT) is None
+    assert store.reusable_result(1, 'Check the home page', 'chromium', PROJECT) is None
+    assert store.reusable_result(1, 'Check the user page', 'firefox', PROJECT) is None
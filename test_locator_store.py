@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-site locator store.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from utils import locator_store
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(locator_store, 'STORE_PATH', str(tmp_path / 'locators.db'))
+    return locator_store
+
+def test_page_key_ignores_query_and_ids():
+    assert locator_store.page_key('https://shop.example.com/item/42?ref=x#top') == ('https://shop.example.com', '/item/:id')
+    assert locator_store.page_key('https://shop.example.com') == ('https://shop.example.com', '/')
+    assert locator_store.page_key('about:blank') == (None, None)
+
+def test_only_passing_runs_make_selectors_known_good(store):
+    url = 'https://shop.example.com/search?q=shoes'
+    store.record_run([{'url': url, 'name': 'Search button', 'selector': '#search', 'ok': True}], passed=False)
+    assert store.candidates(url, 'search button') == []
+
+    store.record_run([{'url': url, 'name': 'Search button', 'selector': '#search', 'ok': True}], passed=True)
+    assert store.candidates('https://shop.example.com/search', 'search  Button') == ['#search']
+
+def test_failing_selectors_drop_out(store):
+    url = 'https://shop.example.com/search'
+    entries = [{'url': url, 'name': 'search button', 'selector': '.btn-search', 'ok': True},
+               {'url': url, 'name': 'search button', 'selector': "role=button[name='Search']", 'ok': True}]
+    store.record_run(entries, passed=True)
+    store.record_run(entries[1:], passed=True)
+    assert store.candidates(url, 'search button') == ["role=button[name='Search']", '.btn-search']
+
+    store.record_run([dict(entries[0], ok=False)] * 2, passed=False)
+    assert store.candidates(url, 'search button') == ["role=button[name='Search']"]
+
+def test_prompt_context_lists_selectors_for_mentioned_sites(store):
+    store.record_run([{'url': 'https://shop.example.com/cart', 'name': 'checkout button', 'selector': '#checkout', 'ok': True},
+                      {'url': 'https://other.example.org/', 'name': 'menu', 'selector': '#menu', 'ok': True}], passed=True)
+    context = store.prompt_context('Test checkout on https://shop.example.com/', None)
+    assert '"checkout button" -> #checkout' in context
+    assert '#menu' not in context
+    assert store.prompt_context('Test https://unknown.example.net') == store.LOCATOR_PROMPT_GUIDE
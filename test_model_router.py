@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for model tier routing.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from collections import defaultdict
+from graph import TestGenerationState as State
+from agents import model_router
+
+class _FakeRedis:
+    """The hash and list commands the usage counters use; a pipeline applies its commands at once."""
+
+    def __init__(self):
+        self.hashes = defaultdict(dict)
+        self.lists = defaultdict(list)
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+    def hincrby(self, key, field, amount):
+        self.hashes[key][field] = str(int(self.hashes[key].get(field, 0)) + amount)
+
+    def hincrbyfloat(self, key, field, amount):
+        self.hashes[key][field] = str(float(self.hashes[key].get(field, 0)) + amount)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def lpush(self, key, value):
+        self.lists[key].insert(0, str(value))
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists[key][start:end + 1]
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:None if end == -1 else end + 1]
+
+def test_tiers_follow_agent_and_requirement(monkeypatch):
+    assert model_router.choose_tier("stats_commentary", State()) == "fast"
+    assert model_router.choose_tier("code_generator", State(requirement="Add a page")) == "strong"
+    assert model_router.choose_tier("debug", State()) == "strong"
+    assert model_router.choose_tier("script", State(requirement="Login to Amazon account")) == "fast"
+    assert model_router.choose_tier("script", State(requirement="  test guest checkout WITHOUT account ")) == "fast"
+
+    long_requirement = "Open the store, search for running shoes, filter by size 42 and brand, " * 3
+    assert model_router.choose_tier("script", State(requirement=long_requirement)) == "standard"
+
+def test_failed_runs_escalate():
+    failed = State(requirement="Login to Amazon account", execution_result="[FAIL] Timeout")
+    assert model_router.choose_tier("script", failed) == "strong"
+    assert model_router.choose_tier("stats_commentary", failed) == "fast"
+
+def test_routed_nodes_expose_their_tier():
+    seen = []
+    node = model_router.routed("debug", lambda state: seen.append(model_router.current_route()) or {})
+    node(State())
+    assert seen == [("debug", "strong")]
+    assert model_router.current_route() is None
+
+def test_cost_per_tier(monkeypatch):
+    monkeypatch.setattr(model_router, 'redis_client', _FakeRedis())
+    cost = model_router.record_usage("strong", "debug", 1200, 1_000_000, 100_000)
+    assert round(cost, 2) == 2.25
+
+    strong = model_router.usage_summary()["strong"]
+    assert (strong["calls"], strong["cost_usd"], strong["latency_p50_ms"]) == (1, 2.25, 1200)
+    assert strong["agents"] == {"debug": 1}
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for executor-level request routing rules.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from types import SimpleNamespace
+from utils.network_rules import default_rules, install_network_rules, is_blocked, is_cacheable, route_pattern
+
+def _request(url, resource_type='stylesheet', method='GET'):
+    return SimpleNamespace(url=url, resource_type=resource_type, method=method)
+
+def test_response_cache_is_off_by_default(monkeypatch):
+    monkeypatch.delenv('PW_NETWORK_MODE', raising=False)
+    rules = default_rules()
+    assert rules['mode'] == 'off'
+    assert not is_cacheable(_request('https://www.saucedemo.com/static/css/main.css'), rules)
+
+def test_cache_domains_limit_caching(monkeypatch):
+    monkeypatch.setenv('PW_NETWORK_MODE', 'replay')
+    monkeypatch.setenv('PW_RESPONSE_CACHE_DOMAINS', 'jsdelivr.net')
+    rules = default_rules()
+    assert is_cacheable(_request('https://cdn.jsdelivr.net/npm/bootstrap.min.css'), rules)
+    assert not is_cacheable(_request('https://www.saucedemo.com/static/css/main.css'), rules)
+    assert not is_cacheable(_request('https://cdn.jsdelivr.net/npm/bootstrap.min.css', method='POST'), rules)
+    assert not is_cacheable(_request('https://cdn.jsdelivr.net/data.json', resource_type='fetch'), rules)
+
+def test_app_under_test_is_never_cached(monkeypatch):
+    monkeypatch.setenv('PW_NETWORK_MODE', 'replay')
+    monkeypatch.delenv('PW_RESPONSE_CACHE_DOMAINS', raising=False)
+    monkeypatch.setattr('utils.app_runner.ADVERTISE_HOST', '10.0.0.5')
+    rules = default_rules()
+    assert is_cacheable(_request('https://www.saucedemo.com/static/css/main.css'), rules)
+    for url in ('http://127.0.0.1:5001/static/css/contact.css', 'http://localhost:8000/app.js',
+                'http://[::1]:5001/logo.png', 'http://10.0.0.5:5001/static/css/contact.css'):
+        assert not is_cacheable(_request(url), rules)
+
+def test_blocking_rules():
+    rules = default_rules()
+    assert is_blocked('https://www.google-analytics.com/collect', 'script', rules)
+    assert is_blocked('https://example.com/intro.mp4', 'media', rules)
+    assert not is_blocked('https://example.com/app.js', 'script', rules)
+
+def test_requests_are_only_intercepted_when_a_rule_needs_them():
+    rules = default_rules()
+    assert route_pattern(rules) == '**/*'
+    assert route_pattern(dict(rules, block_resource_types=[], mode='replay')) == '**/*'
+
+    # Domain blocking alone only routes the blocked domains
+    pattern = route_pattern(dict(rules, block_resource_types=[], block_domains=['doubleclick.net']))
+    assert pattern.match('https://doubleclick.net/ad') and pattern.match('https://stats.g.doubleclick.net:443?x=1')
+    assert not pattern.match('https://notdoubleclick.net/ad')
+    assert not pattern.match('https://example.com/?ref=doubleclick.net')
+
+    routes = []
+    context = SimpleNamespace(route=lambda pattern, handler: routes.append(pattern))
+    install_network_rules(context, dict(rules, block_resource_types=[], block_domains=[]), {})
+    assert routes == []
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the page model snapshot cache.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from utils import page_model
+
+SNAPSHOT = {
+    'url': 'https://shop.example.com/',
+    'title': 'Shop',
+    'etag': '"abc"',
+    'last_modified': None,
+    'accessibility': {'role': 'WebArea', 'name': 'Shop', 'children': [
+        {'role': 'navigation', 'name': '', 'children': [{'role': 'link', 'name': 'Cart'}, {'role': 'link', 'name': ''}]},
+        {'role': 'heading', 'name': 'Deals', 'level': 1},
+        {'role': 'generic', 'name': '', 'children': [{'role': 'searchbox', 'name': 'Search products'}]}
+    ]},
+    'elements': [{'tag': 'input', 'text': '', 'attrs': {'id': 'search', 'placeholder': 'Search products'}},
+                 {'tag': 'button', 'text': 'Go', 'attrs': {}}]
+}
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_model, 'CACHE_DIR', str(tmp_path))
+    crawls = []
+
+    def crawl(url, cancel_key=None):
+        crawls.append(url)
+        return dict(SNAPSHOT)
+    monkeypatch.setattr(page_model, '_crawl_sandboxed', crawl)
+    return crawls
+
+def test_extract_urls():
+    text = 'Open https://shop.example.com/, search, then check https://shop.example.com/cart. Also https://shop.example.com/'
+    assert page_model.extract_urls(text) == ['https://shop.example.com/', 'https://shop.example.com/cart']
+    assert page_model.extract_urls('Test login functionality on SauceDemo website') == ['https://www.saucedemo.com/']
+    # Predefined requirements that name no site start from their flow's page
+    assert page_model.extract_urls('Add item to cart') == ['https://www.amazon.com/']
+    assert page_model.extract_urls('Fill in the contact form') == []
+
+def test_summary_is_compact():
+    summary = page_model.summarize(SNAPSHOT)
+    assert '- navigation\n  - link "Cart"' in summary
+    assert '- heading "Deals" (h1)' in summary
+    assert '- searchbox "Search products"' in summary
+    assert 'generic' not in summary
+    assert '- <input id="search" placeholder="Search products">' in summary
+    assert '- <button> "Go"' in summary
+
+def test_fresh_entries_skip_the_crawl(cache):
+    url = 'https://shop.example.com/'
+    first = page_model.summary_for(url, ttl=60, now=1000)
+    assert page_model.summary_for(url, ttl=60, now=1030) == first
+    assert cache == [url]
+
+def test_expired_entries_revalidate_with_etag(cache, monkeypatch):
+    url = 'https://shop.example.com/'
+    page_model.summary_for(url, ttl=60, now=1000)
+    monkeypatch.setattr(page_model, '_not_modified', lambda url, entry: entry['etag'] == '"abc"')
+    page_model.summary_for(url, ttl=60, now=2000)
+    assert cache == [url]
+    assert page_model.load(url)['fetched_at'] == 2000
+
+    monkeypatch.setattr(page_model, '_not_modified', lambda url, entry: False)
+    page_model.summary_for(url, ttl=60, now=3000)
+    assert cache == [url, url]
+
+def test_stale_summary_used_when_crawl_fails(cache, monkeypatch):
+    url = 'https://shop.example.com/'
+    summary = page_model.summary_for(url, ttl=60, now=1000)
+    monkeypatch.setattr(page_model, '_not_modified', lambda url, entry: False)
+    monkeypatch.setattr(page_model, '_crawl_sandboxed', lambda url, cancel_key=None: None)
+    assert page_model.summary_for(url, ttl=60, now=2000) == summary
+    assert page_model.summary_for('https://other.example.com/', ttl=60) is None
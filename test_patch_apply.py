@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the unified diff applier and the diff-based code generation output.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from utils.patch_apply import PatchError, apply_patch
+from agents.diff_code_generator import integration_guide_from_changes, to_generated_code
+
+ROUTES = "from flask import Blueprint, render_template\n\nmain = Blueprint('main', __name__)\n\n@main.route('/')\ndef index():\n    return render_template('index.html')\n"
+
+PATCH = """```diff
+--- a/routes.py
++++ b/routes.py
+@@ -5,3 +5,7 @@
+ @main.route('/')
+ def index():
+     return render_template('index.html')
++
++@main.route('/contact')
++def contact():
++    return render_template('contact.html')
+--- /dev/null
++++ b/templates/contact.html
+@@ -0,0 +1,2 @@
++{% extends 'base.html' %}
++{% block content %}<h1>Contact</h1>{% endblock %}
+```"""
+
+def test_patch_creates_and_modifies_files():
+    files, changes = apply_patch({'routes.py': ROUTES}, PATCH)
+    assert files['routes.py'] == ROUTES + "\n@main.route('/contact')\ndef contact():\n    return render_template('contact.html')\n"
+    assert files['templates/contact.html'].startswith("{% extends 'base.html' %}")
+    assert [(c['path'], c['action']) for c in changes] == [('routes.py', 'modify'), ('templates/contact.html', 'create')]
+    assert changes[0]['hunks'][0]['line'] == 5
+
+def test_misplaced_hunks_are_found_by_context():
+    # Wrong line numbers and header counts, as models often write them
+    moved = PATCH.replace('@@ -5,3 +5,7 @@', '@@ -40,2 +40,9 @@')
+    files, _ = apply_patch({'routes.py': "# header\n\n" + ROUTES}, moved)
+    assert files['routes.py'].endswith("return render_template('contact.html')\n")
+
+def test_mismatched_context_is_reported():
+    wrong = PATCH.replace(" def index():", " def home():")
+    with pytest.raises(PatchError) as error:
+        apply_patch({'routes.py': ROUTES}, wrong)
+    assert 'routes.py: hunk 1' in str(error.value)
+    with pytest.raises(PatchError, match='not in the project'):
+        apply_patch({}, PATCH)
+
+@pytest.mark.parametrize('header', ['a/../../etc/passwd', '/etc/passwd', 'b/templates/../../app.py', 'C:\\app.py'])
+def test_paths_outside_the_project_are_refused(header):
+    escaping = PATCH.replace('+++ b/templates/contact.html', f'+++ {header}')
+    with pytest.raises(PatchError, match='Unsafe file path'):
+        apply_patch({'routes.py': ROUTES}, escaping)
+
+def test_generated_code_and_integration_guide_from_the_diff():
+    files, changes = apply_patch({'routes.py': ROUTES}, PATCH)
+    generated = to_generated_code(files, changes, PATCH)
+    assert generated['routes_code'].startswith("@main.route('/contact')")
+    assert list(generated['template_code']) == ['contact.html']
+    assert set(generated['files']) == {'routes.py', 'templates/contact.html'}
+
+    guide = integration_guide_from_changes(changes)
+    assert "1. In `routes.py` at line 5 (near `@main.route('/')`), add:" in guide
+    assert "2. Create `templates/contact.html`" in guide
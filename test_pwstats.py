@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for the pwstats runtime used by generated scripts.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import subprocess
+from utils.script_runner import parse_stats, PROJECT_ROOT
+
+def _run(script):
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    return subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, timeout=60)
+
+def test_stats_printed_at_exit():
+    proc = _run(
+        "from pwstats import track_assertion, track_action_time, step\n"
+        "def fails():\n"
+        "    raise AssertionError('boom')\n"
+        "track_assertion(lambda: None)\n"
+        "track_assertion(fails)\n"
+        "track_action_time(lambda x: x, 1)\n"
+        "step('Login')\n"
+    )
+    stats = parse_stats(proc.stdout)
+    assert stats['total_assertions'] == 2
+    assert stats['assertions_passed'] == 1
+    assert stats['errors'] == ['Assertion Failed: boom']
+    assert len(stats['performance']['action_times']) == 1
+    assert stats['step_coverage'] == ['Login']
+    assert 'STEP_EVENT' in proc.stdout
+
+def test_visited_urls_are_recorded_once():
+    proc = _run(
+        "from pwstats import record_url\n"
+        "record_url('http://127.0.0.1:5001/contact#form')\n"
+        "record_url('http://127.0.0.1:5001/contact')\n"
+        "record_url('about:blank')\n"
+        "record_url('http://127.0.0.1:5001/api/messages')\n"
+    )
+    assert parse_stats(proc.stdout)['visited_urls'] == ['http://127.0.0.1:5001/contact', 'http://127.0.0.1:5001/api/messages']
+
+def test_uncaught_exception_is_recorded():
+    proc = _run("import pwstats\nraise RuntimeError('page crashed')\n")
+    assert proc.returncode == 1
+    stats = parse_stats(proc.stdout)
+    assert stats['errors'] == ['Test execution failed: RuntimeError: page crashed']
+
+def test_stats_printed_once():
+    proc = _run("import pwstats\npwstats.report()\n")
+    assert proc.stdout.count('STATS_JSON_START') == 1
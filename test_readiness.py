@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for the learned page readiness budgets.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from utils import readiness
+
+ORIGIN = 'https://shop.example.com'
+
+@pytest.fixture
+def timings(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, 'TIMINGS_PATH', str(tmp_path / 'readiness_timings.db'))
+    return readiness
+
+def test_concurrent_samples_are_all_kept(timings):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda ms: timings.record_timing(ORIGIN, ms), [1000] * 16))
+    assert timings._samples(ORIGIN) == [1000] * 16
+    assert timings.learned_budget_ms(ORIGIN) == 2000
+
+    for ms in range(30):
+        timings.record_timing(ORIGIN, 3000 + ms)
+    assert len(timings._samples(ORIGIN)) == timings.MAX_SAMPLES
+    assert timings.learned_budget_ms('https://other.example.com') == timings.DEFAULT_BUDGET_MS
+
+def test_waits_that_run_out_are_not_recorded(timings):
+    def settle_after(seconds):
+        return lambda script, args: time.sleep(seconds)
+    page = SimpleNamespace(url=f'{ORIGIN}/cart', evaluate=settle_after(0.06))
+    timings.wait_for_ready(page, timeout_ms=50)
+    assert timings._samples(ORIGIN) == []
+
+    page.evaluate = settle_after(0)
+    timings.wait_for_ready(page, timeout_ms=50)
+    assert len(timings._samples(ORIGIN)) == 1
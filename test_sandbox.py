@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the resource-limited script sandbox.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import pytest
+from utils.sandbox import run_sandboxed, combine_usage
+
+pytestmark = pytest.mark.skipif(not os.path.isdir('/proc'), reason='sandbox needs /proc')
+
+def test_leaked_detached_children_are_killed(tmp_path):
+    marker = f'sleep-{time.time()}'
+    script = (
+        "import subprocess, sys\n"
+        f"subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)', '{marker}'], start_new_session=True)\n"
+        "print('started')\n"
+    )
+    result = run_sandboxed([sys.executable, '-c', script], str(tmp_path), dict(os.environ), timeout=30)
+    assert result['returncode'] == 0
+    assert result['stdout'].strip() == 'started'
+    assert result['termination'] is None
+
+    time.sleep(0.2)
+    leaked = [pid for pid in os.listdir('/proc') if pid.isdigit() and _cmdline_has(pid, marker)]
+    assert leaked == []
+
+def test_timeout_and_memory_limit(tmp_path):
+    result = run_sandboxed([sys.executable, '-c', 'while True: pass'], str(tmp_path), dict(os.environ), timeout=1)
+    assert result['timed_out']
+    assert result['resource_usage']['cpu_seconds'] > 0
+
+    hog = "import time\nx = bytearray(300 * 1024 * 1024)\nx[::4096] = b'1' * len(x[::4096])\ntime.sleep(10)\n"
+    result = run_sandboxed([sys.executable, '-c', hog], str(tmp_path), dict(os.environ), timeout=30,
+                           limits={'memory_mb': 100})
+    assert not result['timed_out']
+    assert 'memory' in result['termination']
+    assert result['resource_usage']['termination'] == result['termination']
+
+def test_output_is_streamed_with_a_bounded_tail(tmp_path):
+    lines = []
+    script = "import sys\nfor i in range(50): print(i)\nprint('oops', file=sys.stderr)\n"
+    result = run_sandboxed([sys.executable, '-c', script], str(tmp_path), dict(os.environ), timeout=30,
+                           on_line=lambda stream, line: lines.append((stream, line)), tail_lines=5)
+    assert [line for stream, line in lines if stream == 'stdout'] == [f'{i}\n' for i in range(50)]
+    assert ('stderr', 'oops\n') in lines
+    assert result['stdout'] == ''.join(f'{i}\n' for i in range(45, 50))
+    log = (tmp_path / 'output.log').read_text()
+    assert '0\n' in log and '[stderr] oops' in log
+
+def test_step_events_stay_out_of_the_output_tail(tmp_path):
+    from utils.script_runner import marker_collector
+    forwarded = []
+    collect, _ = marker_collector(lambda stream, line: forwarded.append(line))
+    script = "print('STEP_EVENT {\"action\": \"goto\"}')\nprint('logged in')\n"
+    result = run_sandboxed([sys.executable, '-c', script], str(tmp_path), dict(os.environ), timeout=30, on_line=collect)
+    assert result['stdout'] == 'logged in\n'
+    assert forwarded[0].startswith('STEP_EVENT')
+    assert 'STEP_EVENT' in (tmp_path / 'output.log').read_text()
+
+def test_should_stop_kills_the_run(tmp_path):
+    started = time.time()
+    result = run_sandboxed([sys.executable, '-c', 'import time; time.sleep(30)'], str(tmp_path), dict(os.environ),
+                           timeout=30, should_stop=lambda: time.time() - started > 0.5)
+    assert result['termination'] == 'Execution cancelled.'
+    assert time.time() - started < 5
+
+def test_limits_apply_from_the_first_instruction(tmp_path):
+    script = "import os, resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE)[0], os.getpgid(0) == os.getpid())\n"
+    result = run_sandboxed([sys.executable, '-c', script], str(tmp_path), dict(os.environ), timeout=30,
+                           limits={'max_open_files': 77})
+    assert result['stdout'].split() == ['77', 'True']
+
+def test_combine_usage():
+    usage = {'enforcement': 'rlimit', 'wall_seconds': 1.0, 'cpu_seconds': 0.5, 'peak_memory_mb': 100.0,
+             'peak_processes': 3, 'peak_open_files': 20, 'limits': {}, 'termination': None}
+    combined = combine_usage([usage, dict(usage, cpu_seconds=1.5, peak_memory_mb=300.0), None])
+    assert combined['cpu_seconds'] == 2.0
+    assert combined['peak_memory_mb'] == 300.0
+    assert combine_usage([None]) is None
+
+def _cmdline_has(pid, marker):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return marker.encode() in f.read()
+    except OSError:
+        return False
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-flight script validator.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from types import SimpleNamespace
+from agents.script_validator import check_script, validate_script
+
+GOOD_SCRIPT = '''
+import json
+from playwright.sync_api import sync_playwright
+
+stats = {"errors": []}
+
+with sync_playwright() as p:
+    browser = p.chromium.launch()
+    page = browser.new_page()
+    page.goto("https://example.com")
+    page.get_by_role("button", name="Login").click()
+    browser.close()
+
+print("STATS_JSON_START")
+print(json.dumps(stats))
+print("STATS_JSON_END")
+'''
+
+def _messages(script, severity='error'):
+    return [issue['message'] for issue in check_script(script) if issue['severity'] == severity]
+
+def test_clean_script_passes():
+    assert check_script(GOOD_SCRIPT) == []
+    assert 'execution_result' not in validate_script(SimpleNamespace(playwright_script=GOOD_SCRIPT))
+
+def test_syntax_and_import_errors():
+    assert _messages('def broken(:\n')[0].startswith('SyntaxError')
+    assert any("'subprocess'" in m for m in _messages('import subprocess\n' + GOOD_SCRIPT))
+
+def test_api_misuse():
+    assert any('marker' in m for m in _messages(GOOD_SCRIPT.replace('print("STATS_JSON_END")', '')))
+    mixed = 'from playwright.async_api import async_playwright\n' + GOOD_SCRIPT
+    assert any('mixes' in m for m in _messages(mixed))
+
+def test_headless_false_is_a_warning():
+    # The executor's launch policy forces headless, so this no longer blocks execution
+    script = GOOD_SCRIPT.replace('launch()', 'launch(headless=False)')
+    assert _messages(script) == []
+    assert any('headless=False' in m for m in _messages(script, 'warning'))
+
+def test_locator_lint_is_a_warning():
+    script = GOOD_SCRIPT.replace('page.get_by_role("button", name="Login").click()',
+                                 'page.locator("/html/body/div[2]/button").click()')
+    assert _messages(script) == []
+    assert any('absolute XPath' in m for m in _messages(script, 'warning'))
+
+def test_pwstats_scripts_need_no_markers():
+    script = (
+        "from playwright.sync_api import sync_playwright\n"
+        "from pwstats import track_assertion, step\n"
+        "with sync_playwright() as p:\n"
+        "    p.chromium.launch().new_page().goto('https://example.com')\n"
+        "    step('Open')\n"
+    )
+    assert check_script(script) == []
+
+def test_failed_validation_routes_to_debug():
+    result = validate_script(SimpleNamespace(playwright_script='import socket\n' + GOOD_SCRIPT))
+    assert result['execution_result'].startswith('[FAIL]')
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for sharded script detection and stats merging.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.sharding import is_shardable, shard_names, merge_shard_stats, SHARDING_PROMPT_GUIDE
+
+SHARDED_SCRIPT = '''
+def setup(page):
+    page.goto("https://www.saucedemo.com/")
+
+def shard_search(page):
+    pass
+
+def shard_cart(page):
+    pass
+'''
+
+def test_shard_detection():
+    assert is_shardable(SHARDED_SCRIPT)
+    assert shard_names(SHARDED_SCRIPT) == ['shard_search', 'shard_cart']
+    assert not is_shardable('def run_test():\n    pass\n')
+    assert not is_shardable('def setup(page):\n    pass\n')
+    assert not is_shardable('def broken(:\n')
+
+def test_merge_shard_stats():
+    setup = {'execution_time': 2.0, 'assertions_passed': 2, 'total_assertions': 2,
+             'step_coverage': ['Login'], 'performance': {'page_loads': [1.0], 'action_times': [0.1]},
+             'visited_urls': ['https://www.saucedemo.com/', 'https://www.saucedemo.com/inventory.html']}
+    shards = {
+        'shard_search': {'execution_time': 3.0, 'assertions_passed': 1, 'total_assertions': 1,
+                         'step_coverage': ['Search'], 'errors': [],
+                         'visited_urls': ['https://www.saucedemo.com/inventory.html', 'https://www.saucedemo.com/item']},
+        'shard_cart': {'execution_time': 5.0, 'assertions_passed': 1, 'assertions_failed': 1,
+                       'total_assertions': 2, 'step_coverage': ['Add to Cart'], 'errors': ['Cart badge missing']}
+    }
+    merged = merge_shard_stats(setup, shards)
+    assert merged['execution_time'] == 7.0
+    assert merged['total_assertions'] == 5
+    assert merged['assertions_failed'] == 1
+    assert merged['step_coverage'] == ['Login', 'Search', 'Add to Cart']
+    assert merged['visited_urls'] == ['https://www.saucedemo.com/', 'https://www.saucedemo.com/inventory.html',
+                                      'https://www.saucedemo.com/item']
+    assert merged['errors'] == ['[shard_cart] Cart badge missing']
+    assert merged['shards']['shard_search']['passed']
+    assert not merged['shards']['shard_cart']['passed']
+
+def test_script_prompts_offer_sharding():
+    from graph import TestGenerationState, generation_context
+    assert SHARDING_PROMPT_GUIDE in generation_context(TestGenerationState(requirement='Login and check the cart'))
+    assert SHARDING_PROMPT_GUIDE not in generation_context(TestGenerationState(requirement='x', execution_mode='async'))
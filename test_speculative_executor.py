@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for speculative candidate generation.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import pytest
+from graph import TestGenerationState as State
+from agents import speculative_executor
+
+SCRIPT = "from playwright.sync_api import sync_playwright\nimport pwstats\nwith sync_playwright() as p:\n    p.chromium.launch().new_page().goto({!r})\n"
+
+def _run(passed, duration, assertions_passed=0):
+    return {'browser': 'chromium', 'returncode': 0 if passed else 1, 'timed_out': False, 'termination': None,
+            'stdout': '', 'stderr': '', 'stats': {'assertions_passed': assertions_passed}, 'resource_usage': {},
+            'duration': duration, 'artifact_run_id': None, 'passed': passed}
+
+class _Cancels(list):
+    """Cancelled keys, with an event set by the first cancel."""
+
+    def __init__(self):
+        super().__init__()
+        self.event = threading.Event()
+
+@pytest.fixture
+def speculation(monkeypatch):
+    cancelled = _Cancels()
+
+    def request_cancel(key):
+        cancelled.append(key)
+        cancelled.event.set()
+    monkeypatch.setattr(speculative_executor, 'reserve_candidates', lambda requested: requested)
+    monkeypatch.setattr(speculative_executor, 'request_cancel', request_cancel)
+    monkeypatch.setattr(speculative_executor, 'is_cancelled', lambda key: key in cancelled)
+    monkeypatch.setattr(speculative_executor, '_record_metrics', lambda metrics: None)
+    monkeypatch.setattr(speculative_executor, 'run_matrix', lambda *args: pytest.fail('no matrix browsers'))
+    return cancelled
+
+def _generate(state):
+    # Each candidate visits a page named after its variant hint, so runs can tell them apart
+    variant = 'plain' if 'Variant' not in state.requirement else state.requirement.split('prefer ')[1].split()[0]
+    return {"playwright_script": SCRIPT.format(f"https://example.com/{variant}")}
+
+def _racing_runs(cancelled):
+    """Fake runs ordered with events: plain fails, then role- passes while id, runs until it is cancelled."""
+    plain_done = threading.Event()
+
+    def run_on_browser(script, browser, artifact_run_id, log_channel=None, cancel_key=None, artifact_prefix=None, batch=True):
+        if "/plain'" in script:
+            plain_done.set()
+            return _run(False, 0.05, 2)
+        if "/role-'" in script:
+            assert plain_done.wait(5)
+            return _run(True, 0.1, 3)
+        assert cancelled.event.wait(5)
+        return _run(True, 2.0, 3)
+    return run_on_browser
+
+def test_first_passing_candidate_wins(speculation, monkeypatch):
+    monkeypatch.setattr(speculative_executor, 'run_on_browser', _racing_runs(speculation))
+
+    node = speculative_executor.speculative_node(_generate)
+    update = node(State(requirement="Search", browser="chromium", speculative_candidates=3, cancel_key="job1"))
+    assert "/role-'" in update["playwright_script"]
+    assert update["execution_result"].startswith("⚡ Speculative: candidate 2/3 passed first")
+    assert "[PASS]" in update["execution_result"]
+    assert update["speculation"]["winner"] == 1
+    assert "job1/candidate-2" in speculation and "job1/candidate-1" not in speculation
+    assert "matrix_results" not in update
+
+def test_winner_runs_on_the_other_matrix_browsers(speculation, monkeypatch):
+    matrix = []
+    monkeypatch.setattr(speculative_executor, 'run_on_browser', _racing_runs(speculation))
+    monkeypatch.setattr(speculative_executor, 'run_matrix',
+                        lambda script, browsers, *args: matrix.append((script, browsers)) or {b: _run(b != 'webkit', 0.2) for b in browsers})
+
+    node = speculative_executor.speculative_node(_generate)
+    update = node(State(requirement="Search", browser="chromium", browsers=["chromium", "firefox", "webkit"],
+                        speculative_candidates=3, cancel_key="job1"))
+    assert matrix == [(update["playwright_script"], ["firefox", "webkit"])]
+    assert "/role-'" in update["playwright_script"]
+    assert list(update["matrix_results"]) == ["chromium", "firefox", "webkit"]
+    assert update["matrix_results"]["chromium"]["passed"] and not update["matrix_results"]["webkit"]["passed"]
+    # A failure on another engine sends the winner to the debugger like any matrix failure
+    assert "[FAIL] Failed on webkit." in update["execution_result"]
+    assert update["speculation"]["winner"] == 1
+
+def test_most_useful_failure_goes_to_the_debugger(speculation, monkeypatch):
+    def run_on_browser(script, browser, artifact_run_id, log_channel=None, cancel_key=None, artifact_prefix=None, batch=True):
+        return _run(False, 0.01, 2 if "/id,'" in script else 0)
+    monkeypatch.setattr(speculative_executor, 'run_on_browser', run_on_browser)
+
+    node = speculative_executor.speculative_node(_generate)
+    update = node(State(requirement="Search", speculative_candidates=3))
+    assert "/id,'" in update["playwright_script"]
+    assert "[FAIL]" in update["execution_result"]
+    assert update["speculation"]["winner"] is None
+    assert update["speculation"]["executed"] == 3
+
+def test_candidate_count_is_capped():
+    assert speculative_executor.requested_candidates(State(speculative_candidates=10)) == speculative_executor.MAX_CANDIDATES
+    assert speculative_executor.requested_candidates(State()) == 1
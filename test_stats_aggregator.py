@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the local stats report.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.stats_aggregator import format_report, group_errors, summarize_stats
+
+STATS = {
+    'execution_time': 12.345,
+    'assertions_passed': 3,
+    'assertions_failed': 1,
+    'total_assertions': 4,
+    'step_coverage': ['Login', 'Search'],
+    'performance': {'page_loads': [1.2, 4.5, 0.8], 'action_times': [0.2, 0.3]},
+    'accessibility_violations': 2,
+    'locator_retries': 1,
+    'errors': [
+        'Assertion Failed: Timeout 5000ms exceeded waiting for #cart',
+        'Assertion Failed: Timeout 7000ms exceeded waiting for #cart',
+        'Test execution failed: RuntimeError: page crashed'
+    ]
+}
+
+def test_summary_numbers():
+    summary = summarize_stats(STATS)
+    assert summary['pass_rate'] == 75.0
+    assert summary['page_loads']['max'] == 4.5
+    assert summary['page_loads']['p50'] == 1.2
+    assert summary['action_times']['count'] == 2
+
+def test_errors_grouped_by_signature():
+    assert group_errors(STATS['errors']) == [
+        (2, 'Assertion Failed: Timeout 5000ms exceeded waiting for #cart'),
+        (1, 'Test execution failed: RuntimeError: page crashed')
+    ]
+
+def test_report():
+    report = format_report(STATS)
+    assert report.startswith("📊 Test Statistics Report:\n- Execution Time: 12.35s")
+    assert "- Assertions: 3/4 passed (75.0% pass rate, 1 failed)" in report
+    assert "- Step Coverage: 2 steps (Login, Search)" in report
+    assert "- Page Loads: 3 (avg 2.17s" in report and "⚠️ p90 over 3s" in report
+    assert "⚠️" not in report.split("- Actions:")[1].splitlines()[0]
+    assert "- Errors: 3 (2 distinct)\n  - [2x] Assertion Failed" in report
+
+def test_report_without_stats():
+    assert "No statistics" in format_report(None)
+    assert "- Assertions: none recorded" in format_report({'execution_time': 1.0})
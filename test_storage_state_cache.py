@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the authenticated storage-state cache.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+from utils import script_runner, storage_state_cache
+
+def test_script_identity():
+    script = 'BASE_URL = "https://www.saucedemo.com/inventory.html"\nTEST_ACCOUNT = "standard_user"\nSTORED_SESSION = True\n'
+    assert storage_state_cache.script_identity(script) == ('https://www.saucedemo.com', 'standard_user', None)
+
+    script = 'USERNAME = "admin"\nSTORED_SESSION = True\nLOGIN_URL = "https://example.com/"\ndef setup(page):\n    page.goto("https://example.com/login")\n'
+    assert storage_state_cache.script_identity(script) == ('https://example.com', 'admin', 'https://example.com/')
+
+    # Only scripts that opt in and name their account use the cache
+    assert storage_state_cache.script_identity('BASE_URL = "https://www.saucedemo.com/"\nUSERNAME = "locked_out_user"\n') is None
+    assert storage_state_cache.script_identity('BASE_URL = "https://www.saucedemo.com/"\nSTORED_SESSION = True\n') is None
+
+def test_login_pages():
+    assert storage_state_cache.is_login_page('https://example.com/accounts/login?next=/cart')
+    assert storage_state_cache.is_login_page('https://example.com/signin.html')
+    assert not storage_state_cache.is_login_page('https://example.com/blog/logins-explained')
+    assert storage_state_cache.is_login_page('https://www.saucedemo.com/', 'https://www.saucedemo.com')
+    assert not storage_state_cache.is_login_page('https://www.saucedemo.com/inventory.html', 'https://www.saucedemo.com/')
+
+def test_entries_expire_with_ttl_or_cookies():
+    now = time.time()
+    entry = {'origin': 'https://www.saucedemo.com', 'saved_at': now - 10,
+             'state': {'cookies': [{'domain': 'www.saucedemo.com', 'expires': now + 600}]}}
+    assert not storage_state_cache.is_expired(entry, now=now, ttl=60)
+    assert storage_state_cache.is_expired(entry, now=now, ttl=5)
+
+    entry['state']['cookies'].append({'domain': '.saucedemo.com', 'expires': now - 1})
+    assert storage_state_cache.is_expired(entry, now=now, ttl=60)
+
+def test_save_load_invalidate(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_state_cache, 'CACHE_DIR', str(tmp_path))
+    state = {'cookies': [{'name': 'session-username', 'domain': 'www.saucedemo.com', 'expires': -1}], 'origins': []}
+
+    storage_state_cache.save('https://www.saucedemo.com', 'standard_user', state)
+    assert storage_state_cache.load('https://www.saucedemo.com', 'standard_user') == state
+    assert storage_state_cache.load('https://www.saucedemo.com', 'problem_user') is None
+
+    storage_state_cache.invalidate('https://www.saucedemo.com', 'standard_user')
+    assert storage_state_cache.load('https://www.saucedemo.com', 'standard_user') is None
+
+def test_opted_in_runs_use_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_state_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(script_runner.artifacts, 'collect_run', lambda *args, **kwargs: 0)
+    state = {'cookies': [{'name': 'session-username', 'domain': 'www.saucedemo.com', 'expires': -1}], 'origins': []}
+    runs, outcomes = [], iter([(True, None), (True, None), (False, 'landed on the login page'), (True, None),
+                               (False, None)])
+
+    def fake_sandbox(cmd, cwd, env, timeout, limits=None, on_line=None, should_stop=None):
+        options = json.loads(env['PW_RUNNER_OPTIONS'])
+        storage = options.get('storage_state')
+        loaded = storage and storage['load'] and json.load(open(storage['load'], encoding='utf-8'))
+        runs.append(loaded)
+        assert bool(options.get('session_check')) == bool(loaded)
+        passed, rejected = next(outcomes)
+        if passed and storage:
+            with open(storage['save'], 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        for line in ['STATS_JSON_START', json.dumps({'errors': [] if passed else ['failed']}), 'STATS_JSON_END']:
+            on_line('stdout', line)
+        if rejected:
+            on_line('stdout', f"{script_runner.METRICS_MARKER} {json.dumps({'session_expired': rejected})}")
+        return {'returncode': 0, 'timed_out': False, 'termination': None, 'stdout': '', 'stderr': '',
+                'resource_usage': None}
+    monkeypatch.setattr(script_runner, 'run_sandboxed', fake_sandbox)
+
+    script = 'BASE_URL = "https://www.saucedemo.com/"\nTEST_ACCOUNT = "standard_user"\nSTORED_SESSION = True\n'
+    first = script_runner.run_script(script, browser='chromium')
+    assert first['passed'] and first['stats']['storage_state_cache'] == 'miss'
+    assert storage_state_cache.load('https://www.saucedemo.com', 'standard_user') == state
+
+    second = script_runner.run_script(script, browser='chromium')
+    assert second['passed'] and second['stats']['storage_state_cache'] == 'hit'
+    assert runs[:2] == [None, state]
+
+    # A run whose cached session the site rejected drops it and retries without it
+    third = script_runner.run_script(script, browser='chromium')
+    assert runs[2:] == [state, None]
+    assert third['passed'] and third['stats']['storage_state_cache'] == 'miss'
+
+    # Any other failure is the script's own and is not retried
+    fourth = script_runner.run_script(script, browser='chromium')
+    assert not fourth['passed'] and runs[4:] == [state]
+
+def test_scripts_that_do_not_opt_in_start_signed_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_state_cache, 'CACHE_DIR', str(tmp_path))
+    storage_state_cache.save('https://www.saucedemo.com', 'standard_user', {'cookies': [], 'origins': []})
+    seen = []
+
+    def fake_sandbox(cmd, cwd, env, timeout, limits=None, on_line=None, should_stop=None):
+        seen.append(json.loads(env['PW_RUNNER_OPTIONS']))
+        return {'returncode': 0, 'timed_out': False, 'termination': None, 'stdout': '', 'stderr': '',
+                'resource_usage': None}
+    monkeypatch.setattr(script_runner, 'run_sandboxed', fake_sandbox)
+
+    script_runner.run_script('BASE_URL = "https://www.saucedemo.com/"\nUSERNAME = "standard_user"\n', browser='chromium')
+    assert 'storage_state' not in seen[0] and 'session_check' not in seen[0]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for batch suite parsing and report aggregation.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from utils.suite import parse_suite_items, chunk_size_for, collect_items, build_suite_report, history_requirement, SuiteValidationError
+
+def test_json_requirements_expand_across_browsers():
+    items = parse_suite_items({
+        'requirements': ['Login to saucedemo as standard_user', 'Add the backpack to the cart'],
+        'browsers': ['chromium', 'firefox']
+    })
+    assert len(items) == 4
+    assert ('Add the backpack to the cart', 'firefox') in items
+
+def test_csv_rows_may_override_browser():
+    csv_text = "requirement,browser\nLogin to saucedemo as standard_user,webkit\nAdd the backpack to the cart,\n"
+    items = parse_suite_items({'browsers': ['chromium']}, csv_text=csv_text)
+    assert items == [
+        ('Login to saucedemo as standard_user', 'webkit'),
+        ('Add the backpack to the cart', 'chromium')
+    ]
+
+def test_invalid_submissions_are_rejected():
+    with pytest.raises(SuiteValidationError):
+        parse_suite_items({'requirements': []})
+    with pytest.raises(SuiteValidationError):
+        parse_suite_items({'requirements': ['too short']})
+    with pytest.raises(SuiteValidationError):
+        parse_suite_items({'requirements': ['Login to saucedemo'], 'browsers': ['opera']})
+    with pytest.raises(SuiteValidationError):
+        parse_suite_items({'requirements': ['Login to saucedemo'] * 3}, max_items=2)
+
+def test_history_entries_rerun_without_their_tags():
+    requirements = [history_requirement(r) for r in ('[SUITE] Login to saucedemo as standard_user',
+                                                     '[CODE GEN] [SUITE] Add a contact page',
+                                                     'Add the backpack to the cart')]
+    assert requirements == ['Login to saucedemo as standard_user', 'Add a contact page', 'Add the backpack to the cart']
+    assert len(parse_suite_items({'requirements': requirements})) == 3
+
+def test_chunk_size_bounds_concurrency():
+    assert chunk_size_for(10, 4, 8) == 3
+    assert chunk_size_for(3, 4, 8) == 1
+    # Large suites get many small chunks rather than a few that outlive the task time limit
+    assert chunk_size_for(500, 4, 8) == 8
+
+def test_dead_chunk_keeps_its_finished_items():
+    suite = {'items': [['a', 'chromium'], ['b', 'chromium'], ['c', 'chromium'], ['d', 'chromium']], 'chunk_size': 2}
+    stored = {0: {'requirement': 'a', 'browser': 'chromium', 'passed': True, 'duration': 3.0}}
+    assert collect_items(suite, stored, {}) == [stored[0]]
+
+    items = collect_items(suite, stored, {0: 'TimeLimitExceeded(600)'})
+    assert [item['requirement'] for item in items] == ['a', 'b']
+    assert items[0]['passed'] and items[1]['error'] == 'The suite chunk failed: TimeLimitExceeded(600)'
+
+def test_build_suite_report():
+    report = build_suite_report([
+        {'requirement': 'a', 'browser': 'chromium', 'passed': True, 'duration': 2.0},
+        {'requirement': 'a', 'browser': 'firefox', 'passed': False, 'duration': 5.0, 'execution_result': '[FAIL] timeout'},
+        {'requirement': 'b', 'browser': 'chromium', 'passed': False, 'duration': 1.0, 'error': 'boom'}
+    ])
+    assert report['total'] == 3
+    assert (report['passed'], report['failed'], report['errored']) == (1, 1, 1)
+    assert report['pass_rate'] == 33.3
+    assert report['by_browser']['chromium'] == {'total': 2, 'passed': 1}
+    assert report['slowest'][0]['browser'] == 'firefox'
+    assert len(report['failures']) == 2
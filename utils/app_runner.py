@@ -0,0 +1,326 @@
+"""
+Warm app servers for testing generated code.
+
+The code generation graph applies `generated_code` to the uploaded project,
+starts it under the sandbox on a free local port and health-checks it, so the
+Playwright script runs against the real feature instead of guessing at it.
+Instances stay warm per worker process, keyed by the hashes of the uploaded
+project and of the files with the generated code applied. A job leases its
+instance until its test has run; an idle instance of the same project is
+reused for the next iteration, rewriting only the files whose content changed
+and restarting the server only when code or templates did (static assets are
+served from disk as they are). Leased instances are never swapped or stopped.
+Idle instances are stopped after PW_APP_RUNNER_IDLE_SECONDS and at most
+PW_APP_RUNNER_MAX_INSTANCES idle ones stay warm at once.
+
+The server runs untrusted code, so it gets a minimal environment: none of the
+worker's settings (API keys, database and Redis URLs) are passed on.
+"""
+
+import atexit
+import hashlib
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import requests
+from utils.sandbox import run_sandboxed
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS_DIR = os.environ.get('PW_APP_RUNNER_DIR') or os.path.join(PROJECT_ROOT, 'instance', 'app_runs')
+MAX_INSTANCES = int(os.environ.get('PW_APP_RUNNER_MAX_INSTANCES') or 2)
+IDLE_SECONDS = int(os.environ.get('PW_APP_RUNNER_IDLE_SECONDS') or 900)
+START_TIMEOUT = int(os.environ.get('PW_APP_RUNNER_START_TIMEOUT') or 30)
+# A lease not released by then (the job crashed or was cancelled) no longer pins its instance
+LEASE_SECONDS = int(os.environ.get('PW_APP_RUNNER_LEASE_SECONDS') or 1800)
+# Host the browser uses to reach the app (e.g. this worker's address when browsers run on a farm)
+ADVERTISE_HOST = os.environ.get('PW_APP_RUNNER_HOST') or '127.0.0.1'
+BIND_HOST = os.environ.get('PW_APP_RUNNER_BIND') or '127.0.0.1'
+# A warm server is recycled after this long even when it is in use
+MAX_LIFETIME = 4 * 3600
+HEALTH_TIMEOUT = 2
+# Worker environment variables the app server inherits (PYTHON* settings are passed on too)
+ENV_KEYS = ('PATH', 'HOME', 'LANG')
+# Changes to these can be picked up without restarting the server
+STATIC_EXTENSIONS = ('.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.woff', '.woff2', '.map')
+
+class AppStartError(Exception):
+    """The project could not be started or never answered its health check."""
+
+def project_hash(extracted_code):
+    """Stable hash of an uploaded project's files (before any generated code is applied)."""
+    digest = hashlib.sha256()
+    for path in sorted(extracted_code or {}):
+        digest.update(path.encode('utf-8') + b'\0' + str(extracted_code[path]).encode('utf-8') + b'\0')
+    return digest.hexdigest()[:16]
+
+def _find(files, names):
+    """First project path whose basename is one of `names`, shallowest first."""
+    matches = [path for path in files if os.path.basename(path) in names]
+    return min(matches, key=lambda path: (path.count('/'), path)) if matches else None
+
+def _asset_dir(files, kind):
+    """Where the project keeps templates / css / js, or the conventional Flask location."""
+    if kind == 'templates':
+        dirs = [os.path.dirname(p) for p in files if '/templates/' in f'/{p}' and p.endswith('.html')]
+        return min(dirs, key=len) if dirs else 'templates'
+    dirs = [os.path.dirname(p) for p in files if p.endswith(f'.{kind}') and '/static/' in f'/{p}']
+    return min(dirs, key=len) if dirs else f'static/{kind}'
+
+def _append(base, addition):
+    return f"{base.rstrip()}\n\n{addition.strip()}\n" if base.strip() else f"{addition.strip()}\n"
+
+def apply_generated_code(extracted_code, generated_code):
+    """
+    Project files with the generated feature applied. Whole-file output is merged:
+    routes, models and forms code is appended to the matching module and
+    templates, CSS and JS are added as files.
+    """
+    files = {path: str(content) for path, content in (extracted_code or {}).items()}
+    generated = generated_code or {}
+    if isinstance(generated.get('files'), dict):
+        # Diff output (agents.diff_code_generator) carries the exact content of every touched file
+        for path, content in generated['files'].items():
+            if content is None:
+                files.pop(path, None)
+            else:
+                files[path] = content
+        return files
+    for key, names, default in (('routes_code', ('routes.py', 'views.py'), 'routes.py'),
+                                ('models_code', ('models.py',), 'models.py'),
+                                ('forms_code', ('forms.py',), 'forms.py')):
+        if isinstance(generated.get(key), str) and generated[key].strip():
+            target = _find(files, names) or default
+            files[target] = _append(files.get(target, ''), generated[key])
+    for key, kind in (('template_code', 'templates'), ('css_code', 'css'), ('js_code', 'js')):
+        if isinstance(generated.get(key), dict):
+            directory = _asset_dir(files, kind)
+            for name, content in generated[key].items():
+                files[f'{directory}/{os.path.basename(name)}'] = str(content)
+    return files
+
+def server_command(files, framework, port):
+    """Command that serves the project on `port`, chosen from the framework and its entry point."""
+    framework = (framework or '').lower()
+    if 'django' in framework or ('manage.py' in files and 'flask' not in framework):
+        return [sys.executable, _find(files, ('manage.py',)), 'runserver', f'{BIND_HOST}:{port}', '--noreload']
+    if 'fastapi' in framework:
+        entry = next((p for p in sorted(files, key=lambda p: (p.count('/'), p))
+                      if p.endswith('.py') and 'FastAPI(' in files[p]), 'main.py')
+        return [sys.executable, '-m', 'uvicorn', f"{entry[:-3].replace('/', '.')}:app", '--host', BIND_HOST, '--port', str(port)]
+    entry = (_find(files, ('app.py', 'wsgi.py', 'run.py', 'main.py'))
+             or next((p for p in sorted(files) if p.endswith('.py') and 'Flask(' in files[p]), 'app.py'))
+    return [sys.executable, '-m', 'flask', '--app', entry, 'run', '--host', BIND_HOST, '--port', str(port),
+            '--no-reload', '--no-debugger']
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((BIND_HOST, 0))
+        return s.getsockname()[1]
+
+def is_healthy(url):
+    """Any non-5xx answer means the app is up (apps without an index page answer 404)."""
+    try:
+        return requests.get(url, timeout=HEALTH_TIMEOUT, allow_redirects=False).status_code < 500
+    except requests.RequestException:
+        return False
+
+def app_env(port):
+    """Environment of an app server: PATH, HOME, LANG and PYTHON* settings only, plus its PORT."""
+    env = {key: value for key, value in os.environ.items() if key in ENV_KEYS or key.startswith('PYTHON')}
+    return dict(env, PYTHONUNBUFFERED='1', PYTHONDONTWRITEBYTECODE='1', PORT=str(port))
+
+def needs_restart(changed):
+    """A running server picks up static assets from disk; anything else needs a restart."""
+    return any(not path.endswith(STATIC_EXTENSIONS) for path in changed)
+
+class AppInstance:
+    """One project checked out on disk and the sandboxed server serving it."""
+
+    def __init__(self, key, project, framework):
+        self.key = key
+        self.project = project
+        self.framework = framework
+        # The key changes when an idle instance is reused for new code, so the checkout gets a name of its own
+        self.workdir = os.path.join(RUNS_DIR, uuid.uuid4().hex[:16])
+        self.files = {}
+        self.port = None
+        self.last_used = time.time()
+        self.starts = 0
+        self.leases = {}
+        self.lock = threading.Lock()
+        self._stop = None
+        self._thread = None
+        self._result = None
+
+    @property
+    def url(self):
+        return f'http://{ADVERTISE_HOST}:{self.port}/'
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_use(self, now):
+        """True while a job holds an unexpired lease on this instance."""
+        for lease in [lease for lease, expires in self.leases.items() if expires < now]:
+            del self.leases[lease]
+        return bool(self.leases)
+
+    def _target(self, path):
+        # Paths come from uploads and model output: they must stay inside the checkout
+        normalized = os.path.normpath(path.replace('\\', '/'))
+        root = os.path.realpath(self.workdir)
+        target = os.path.realpath(os.path.join(root, normalized))
+        if (os.path.isabs(normalized) or normalized.split(os.sep)[0] in ('..', '.')
+                or os.path.commonpath([root, target]) != root):
+            raise AppStartError(f'The project has a file outside its directory: {path!r}')
+        return target
+
+    def sync(self, files):
+        """Write files whose content changed and remove files no longer present; returns the changed paths."""
+        changed = [path for path, content in files.items() if self.files.get(path) != content]
+        removed = [path for path in self.files if path not in files]
+        # Every path is checked before anything is written or removed
+        targets = {path: self._target(path) for path in changed + removed}
+        for path in changed:
+            os.makedirs(os.path.dirname(targets[path]), exist_ok=True)
+            with open(targets[path], 'w', encoding='utf-8') as f:
+                f.write(files[path])
+        for path in removed:
+            try:
+                os.remove(targets[path])
+            except OSError:
+                pass
+        self.files = dict(files)
+        return changed + removed
+
+    def start(self):
+        self.port = self.port or free_port()
+        self._stop = threading.Event()
+        self._result = None
+        stop = self._stop
+        cmd = server_command(self.files, self.framework, self.port)
+        env = app_env(self.port)
+
+        def serve():
+            self._result = run_sandboxed(cmd, self.workdir, env, timeout=MAX_LIFETIME,
+                                         limits={'cpu_seconds': MAX_LIFETIME}, should_stop=stop.is_set)
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        self.starts += 1
+
+        deadline = time.time() + START_TIMEOUT
+        while time.time() < deadline:
+            if is_healthy(self.url):
+                return
+            if not self._thread.is_alive():
+                output = ((self._result or {}).get('stderr') or (self._result or {}).get('stdout') or '').strip()
+                raise AppStartError(f"The app exited during startup:\n{output[-2000:]}")
+            time.sleep(0.25)
+        self.stop()
+        raise AppStartError(f'The app did not answer on {self.url} within {START_TIMEOUT}s.')
+
+    def stop(self):
+        if self._stop:
+            self._stop.set()
+        if self._thread:
+            # The sandbox notices the stop within a second and kills the server's whole process tree
+            self._thread.join(timeout=10)
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+_instances = OrderedDict()
+_lock = threading.Lock()
+
+def _evict(now):
+    """Stop idle instances unused for too long, then the least recently used idle ones beyond MAX_INSTANCES."""
+    for key in [k for k, instance in _instances.items() if not instance.in_use(now) and now - instance.last_used > IDLE_SECONDS]:
+        _instances.pop(key).close()
+    idle = [k for k, instance in _instances.items() if not instance.in_use(now)]
+    while idle and len(idle) >= MAX_INSTANCES:
+        _instances.pop(idle.pop(0)).close()
+
+def _lease(extracted_code, files, framework):
+    """The instance for these files, leased: the one already serving them, an idle one of the project, or a new one."""
+    project = project_hash(extracted_code)
+    key = f'{project}-{project_hash(files)}'
+    lease, now = uuid.uuid4().hex, time.time()
+    with _lock:
+        instance = _instances.pop(key, None)
+        if instance is None:
+            idle = next((k for k, i in _instances.items() if i.project == project and not i.in_use(now)), None)
+            if idle:
+                instance = _instances.pop(idle)
+                instance.key = key
+            else:
+                _evict(now)
+                instance = AppInstance(key, project, framework)
+        _instances[key] = instance
+        instance.last_used = now
+        instance.leases[lease] = now + LEASE_SECONDS
+    return instance, lease
+
+def release(lease):
+    """Let the instance holding `lease` be reused for other code or stopped. Unknown leases are ignored."""
+    with _lock:
+        for instance in _instances.values():
+            if instance.leases.pop(lease, None) is not None:
+                instance.last_used = time.time()
+                return
+
+def serve(extracted_code, generated_code, framework=None):
+    """
+    URL of a healthy server running the project with `generated_code` applied.
+    Reuses a warm instance when there is one. Returns (url, info) where info
+    reports whether this was a cold start, a hot swap or a reuse, what changed
+    and the `lease` to release() once the test has run.
+    """
+    files = apply_generated_code(extracted_code, generated_code)
+    instance, lease = _lease(extracted_code, files, framework)
+
+    # Jobs leasing the same instance wait for each other; the first one brings it up
+    with instance.lock:
+        cold = not instance.running
+        restarted = False
+        started = time.time()
+        try:
+            if cold:
+                shutil.rmtree(instance.workdir, ignore_errors=True)
+                instance.files = {}
+            changed = instance.sync(files)
+            if cold:
+                instance.start()
+            elif needs_restart(changed):
+                instance.stop()
+                instance.start()
+                restarted = True
+        except Exception:
+            with _lock:
+                instance.leases.pop(lease, None)
+                # A job waiting on the same instance retries the start itself
+                shared = instance.in_use(time.time())
+                if not shared and _instances.get(instance.key) is instance:
+                    del _instances[instance.key]
+            if shared:
+                instance.stop()
+            else:
+                instance.close()
+            raise
+        mode = 'cold' if cold else 'hot-swap' if changed else 'reuse'
+        return instance.url, {'mode': mode, 'restarted': restarted, 'changed': [] if cold else changed,
+                              'seconds': round(time.time() - started, 2), 'lease': lease}
+
+def stop_all():
+    with _lock:
+        while _instances:
+            _instances.popitem()[1].close()
+
+atexit.register(stop_all)
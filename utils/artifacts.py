@@ -0,0 +1,174 @@
+"""
+Failure artifacts for executed scripts.
+
+Every run executes in its own directory, so screenshots written by generated
+scripts no longer land in (and overwrite each other in) the working directory.
+When a run fails, the files it produced - including the Playwright trace the
+bootstrap captures - are gzip-compressed into a content-addressed store and
+listed in a per-run manifest. Passing runs keep nothing. Retention is bounded
+by age and total store size.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import threading
+import time
+import uuid
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACTS_ROOT = os.environ.get('ARTIFACTS_DIR') or os.path.join(PROJECT_ROOT, 'instance', 'artifacts')
+MAX_AGE_DAYS = float(os.environ.get('ARTIFACT_MAX_AGE_DAYS') or 7)
+MAX_BYTES = int(os.environ.get('ARTIFACT_MAX_BYTES') or 500 * 1024 * 1024)
+ARTIFACT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.zip', '.webm', '.har', '.html', '.log')
+
+_manifest_lock = threading.Lock()
+
+def _runs_dir():
+    return os.path.join(ARTIFACTS_ROOT, 'runs')
+
+def _store_dir():
+    return os.path.join(ARTIFACTS_ROOT, 'store')
+
+def _manifest_path(run_id):
+    return os.path.join(_runs_dir(), run_id, 'manifest.json')
+
+def _blob_path(digest):
+    return os.path.join(_store_dir(), digest[:2], f'{digest}.gz')
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+def load_manifest(run_id):
+    """Manifest for a run, or None when the run stored nothing."""
+    if not run_id or not run_id.isalnum():
+        return None
+    try:
+        with open(_manifest_path(run_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_manifests(run_ids):
+    """run_id -> manifest for the runs that stored artifacts, listing the store once instead of probing each run."""
+    try:
+        stored = set(os.listdir(_runs_dir()))
+    except OSError:
+        return {}
+    manifests = {}
+    for run_id in set(run_ids) & stored:
+        manifest = load_manifest(run_id)
+        if manifest:
+            manifests[run_id] = manifest
+    return manifests
+
+def _store_blob(data):
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return digest, os.path.getsize(path)
+
+def collect_run(run_id, run_dir, prefix=''):
+    """
+    Compress the artifact files a failed run left in `run_dir` into the store
+    and add them to the run's manifest. Returns the number of files stored.
+    """
+    files = []
+    for name in sorted(os.listdir(run_dir)):
+        path = os.path.join(run_dir, name)
+        if not os.path.isfile(path) or not name.lower().endswith(ARTIFACT_EXTENSIONS):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest, compressed_size = _store_blob(data)
+        files.append({
+            'name': f'{prefix}-{name}' if prefix else name,
+            'sha256': digest,
+            'size': len(data),
+            'compressed_size': compressed_size,
+            'content_type': mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        })
+    if not files:
+        return 0
+
+    with _manifest_lock:
+        manifest = load_manifest(run_id) or {'run_id': run_id, 'created_at': time.time(), 'files': []}
+        taken = {entry['name'] for entry in manifest['files']}
+        for entry in files:
+            # Later attempts of the same run (e.g. reexecute) keep their own copies
+            base, n = entry['name'], 2
+            while entry['name'] in taken:
+                root, ext = os.path.splitext(base)
+                entry['name'] = f'{root}-{n}{ext}'
+                n += 1
+            taken.add(entry['name'])
+            manifest['files'].append(entry)
+
+        os.makedirs(os.path.dirname(_manifest_path(run_id)), exist_ok=True)
+        tmp_path = f'{_manifest_path(run_id)}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, _manifest_path(run_id))
+
+    enforce_retention()
+    return len(files)
+
+def open_artifact(run_id, name):
+    """Return (data, content_type) for one artifact of a run, or None."""
+    manifest = load_manifest(run_id)
+    if not manifest:
+        return None
+    for entry in manifest['files']:
+        if entry['name'] == name:
+            try:
+                with gzip.open(_blob_path(entry['sha256']), 'rb') as f:
+                    return f.read(), entry['content_type']
+            except OSError:
+                return None
+    return None
+
+def enforce_retention(max_age_days=MAX_AGE_DAYS, max_bytes=MAX_BYTES):
+    """Drop runs past their age limit, then the oldest runs until the store fits, then orphaned blobs."""
+    runs_dir = _runs_dir()
+    if not os.path.isdir(runs_dir):
+        return
+    now = time.time()
+    manifests = [m for m in (load_manifest(run_id) for run_id in os.listdir(runs_dir)) if m]
+    manifests.sort(key=lambda m: m['created_at'])
+
+    keep = [m for m in manifests if now - m['created_at'] <= max_age_days * 86400]
+    blob_sizes = {}
+    for manifest in keep:
+        for entry in manifest['files']:
+            blob_sizes[entry['sha256']] = entry['compressed_size']
+    while keep and sum(blob_sizes.values()) > max_bytes:
+        dropped = keep.pop(0)
+        still_used = {entry['sha256'] for m in keep for entry in m['files']}
+        for entry in dropped['files']:
+            if entry['sha256'] not in still_used:
+                blob_sizes.pop(entry['sha256'], None)
+
+    kept_ids = {m['run_id'] for m in keep}
+    for manifest in manifests:
+        if manifest['run_id'] not in kept_ids:
+            shutil.rmtree(os.path.join(runs_dir, manifest['run_id']), ignore_errors=True)
+
+    store_dir = _store_dir()
+    if os.path.isdir(store_dir):
+        for shard in os.listdir(store_dir):
+            for blob in os.listdir(os.path.join(store_dir, shard)):
+                path = os.path.join(store_dir, shard, blob)
+                # Skip fresh blobs whose manifest may still be being written
+                try:
+                    if blob.endswith('.gz') and blob[:-3] not in blob_sizes and now - os.path.getmtime(path) > 300:
+                        os.unlink(path)
+                except OSError:
+                    pass
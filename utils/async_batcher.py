@@ -0,0 +1,51 @@
+"""
+Shared execution batches for async scripts.
+
+Graph runs execute one script at a time, but a worker often has several in
+flight at once, e.g. the items of a suite chunk. Async runs submitted within
+PW_ASYNC_BATCH_WINDOW seconds of each other are handed to
+utils.async_runner.run_async_jobs together, so they share one subprocess,
+event loop and browser per engine instead of starting one each.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from utils.async_runner import DEFAULT_CONCURRENCY, JOB_OPTIONS, run_async_jobs
+
+WINDOW = float(os.environ.get('PW_ASYNC_BATCH_WINDOW') or 0.25)
+POLL_INTERVAL = 0.02
+
+_lock = threading.Lock()
+# Batch-level options (as JSON) -> [(job, future)] waiting for the batch to start
+_pending = {}
+
+def run(script, browser=None, options=None, timeout=None):
+    """Run one async script, batched with the runs other threads submit meanwhile. Returns its run dict."""
+    options = dict(options or {})
+    job = dict({key: options.pop(key, None) for key in JOB_OPTIONS}, script=script, browser=browser)
+    key = json.dumps([options, timeout], sort_keys=True, default=str)
+    future = Future()
+    with _lock:
+        batch = _pending.setdefault(key, [])
+        batch.append((job, future))
+        leader = len(batch) == 1
+
+    if leader:
+        # The first run of a batch waits for company, up to a full batch
+        deadline = time.time() + WINDOW
+        while time.time() < deadline and len(_pending[key]) < DEFAULT_CONCURRENCY:
+            time.sleep(POLL_INTERVAL)
+        with _lock:
+            batch = _pending.pop(key)
+        try:
+            runs = run_async_jobs([job for job, _ in batch], timeout=timeout, options=options)
+        except Exception as e:
+            for _, waiting in batch:
+                waiting.set_exception(e)
+        else:
+            for (_, waiting), batch_run in zip(batch, runs):
+                waiting.set_result(batch_run)
+    return future.result()
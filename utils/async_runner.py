@@ -0,0 +1,355 @@
+"""
+Async execution path for high-concurrency workers.
+
+Async scripts define `async def run(context)` and a module-level `stats`
+dict. Instead of one process and one browser per test, a batch of them runs
+in a single subprocess and event loop: one browser per engine in the batch,
+one context per script, with up to PW_ASYNC_CONCURRENCY scripts in flight at
+once. A batch may mix engines and jobs (see run_async_jobs), so a matrix run
+or several suite items share one process.
+
+Usage (inside the sandboxed subprocess): python -m utils.async_runner <manifest_path>
+"""
+
+import ast
+import asyncio
+import contextvars
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from utils.script_ast import parse_script
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONCURRENCY = int(os.environ.get('PW_ASYNC_CONCURRENCY') or 16)
+RESULT_MARKER = 'ASYNC_RESULT_JSON'
+ENTRY_POINT = 'run'
+# Per-job options of run_async_jobs; everything else in `options` applies to the whole batch
+JOB_OPTIONS = ('artifact_run_id', 'artifact_prefix', 'log_channel', 'cancel_key')
+
+ASYNC_PROMPT_GUIDE = """Async script rules:
+- Use only `playwright.async_api`; do not launch a browser or call async_playwright() yourself.
+- Define a module-level `stats` dict and `async def run(context):` - the executor passes a ready BrowserContext and prints the stats.
+- Open pages with `page = await context.new_page()` and await every Playwright call.
+- Use `from utils.readiness import goto_ready_async, wait_for_ready_async` for navigation and readiness waits."""
+
+_current_output = contextvars.ContextVar('current_output', default=None)
+
+class _TaskStdout:
+    """Routes print() output to the buffer of the script whose task is running."""
+
+    def write(self, text):
+        return (_current_output.get() or sys.__stdout__).write(text)
+
+    def flush(self):
+        sys.__stdout__.flush()
+
+def is_async_script(script):
+    """True when the script defines a top-level `async def run(context)`."""
+    try:
+        tree = parse_script(script)
+    except SyntaxError:
+        return False
+    return any(isinstance(node, ast.AsyncFunctionDef) and node.name == ENTRY_POINT for node in tree.body)
+
+def _empty_stats():
+    return {
+        'execution_time': 0.0,
+        'assertions_passed': 0,
+        'assertions_failed': 0,
+        'total_assertions': 0,
+        'step_coverage': [],
+        'performance': {'page_loads': [], 'action_times': []},
+        'accessibility_violations': 0,
+        'locator_retries': 0,
+        'visited_urls': [],
+        'errors': []
+    }
+
+def _record_visits(context, visited):
+    """Record the URLs the context's pages navigate to or fetch into `visited`, as pwstats.watch_page does."""
+    def record(url):
+        url = url.split('#', 1)[0]
+        if url.startswith(('http:', 'https:')) and url not in visited:
+            visited.append(url)
+
+    def on_request(request):
+        if (request.is_navigation_request() and request.frame.parent_frame is None) or request.resource_type in ('fetch', 'xhr'):
+            record(request.url)
+
+    def on_navigated(frame):
+        if frame.parent_frame is None:
+            record(frame.url)
+
+    context.on('request', on_request)
+    context.on('page', lambda page: page.on('framenavigated', on_navigated))
+
+async def _run_one(index, script_path, browser, options, semaphore, metrics):
+    from utils.launch_policy import context_options
+
+    output = io.StringIO()
+    _current_output.set(output)
+    artifacts_dir = os.path.join(os.path.dirname(script_path), f'artifacts_{index}')
+    os.makedirs(artifacts_dir, exist_ok=True)
+    result = {'index': index, 'error': None, 'timed_out': False}
+
+    async with semaphore:
+        started = time.time()
+        module = {'__name__': '__async_script__', '__file__': script_path}
+        context = None
+        try:
+            with open(script_path, encoding='utf-8') as f:
+                exec(compile(f.read(), script_path, 'exec'), module)
+            if not isinstance(module.get('stats'), dict):
+                module['stats'] = _empty_stats()
+
+            context = await browser.new_context(**context_options())
+            _record_visits(context, module['stats'].setdefault('visited_urls', []))
+            if options.get('network'):
+                from utils.network_rules import install_network_rules_async
+                await install_network_rules_async(context, options['network'], metrics.setdefault('network', {}))
+            if options.get('artifacts'):
+                await context.tracing.start(screenshots=True, snapshots=True)
+
+            await asyncio.wait_for(module[ENTRY_POINT](context), timeout=options.get('timeout'))
+        except asyncio.TimeoutError:
+            result['timed_out'] = True
+            result['error'] = f"Execution timed out after {options.get('timeout')}s."
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+
+        stats = module.get('stats') if isinstance(module.get('stats'), dict) else _empty_stats()
+        if result['error']:
+            stats.setdefault('errors', []).append(f"Test execution failed: {result['error']}")
+        if not stats.get('execution_time'):
+            stats['execution_time'] = time.time() - started
+        failed = bool(result['error'] or stats.get('assertions_failed') or stats.get('errors'))
+
+        if context is not None:
+            try:
+                if options.get('artifacts'):
+                    if failed:
+                        for i, page in enumerate(context.pages, 1):
+                            await page.screenshot(path=os.path.join(artifacts_dir, f'failure-page{i}.png'), full_page=True)
+                        await context.tracing.stop(path=os.path.join(artifacts_dir, 'trace.zip'))
+                    else:
+                        await context.tracing.stop()
+                await context.close()
+            except Exception as e:
+                print(f'Could not close context {index}: {e}', file=sys.stderr)
+
+        result.update(stats=stats, stdout=output.getvalue(), duration=round(time.time() - started, 2))
+    print(f'{RESULT_MARKER} {json.dumps(result)}', file=sys.__stdout__, flush=True)
+
+async def run_batch(manifest):
+    """Run every script of a batch concurrently, sharing one browser per engine."""
+    from playwright.async_api import async_playwright
+    from utils.launch_policy import launch_options, connect_options
+
+    engines = manifest.get('engines') or [manifest.get('engine') or 'chromium'] * len(manifest['scripts'])
+    options = manifest.get('options', {})
+    endpoints = manifest.get('connect') or {}
+    semaphore = asyncio.Semaphore(max(1, manifest.get('concurrency') or DEFAULT_CONCURRENCY))
+    metrics = {}
+
+    sys.stdout = _TaskStdout()
+    async with async_playwright() as p:
+        browsers = {}
+        try:
+            for engine in dict.fromkeys(engines):
+                endpoint = endpoints.get(engine) or options.get('connect')
+                if endpoint:
+                    # The engine's browser runs on a browser farm node, see utils.browser_farm
+                    browsers[engine] = await getattr(p, engine).connect(endpoint, **connect_options(launch_options(engine)))
+                else:
+                    browsers[engine] = await getattr(p, engine).launch(**launch_options(engine))
+            await asyncio.gather(*(
+                _run_one(index, path, browsers[engine], options, semaphore, metrics)
+                for index, (path, engine) in enumerate(zip(manifest['scripts'], engines))
+            ))
+        finally:
+            for browser in browsers.values():
+                await browser.close()
+    if metrics:
+        print(f'RUNNER_METRICS_JSON {json.dumps(metrics)}', file=sys.__stdout__, flush=True)
+
+def parse_results(stdout):
+    """Per-script results printed by the batch process, keyed by index."""
+    results = {}
+    for line in stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            try:
+                result = json.loads(line[len(RESULT_MARKER):])
+            except ValueError:
+                continue
+            results[result['index']] = result
+    return results
+
+def run_async_scripts(scripts, browser=None, timeout=None, options=None, concurrency=None):
+    """
+    Execute async scripts on one engine in one sandboxed subprocess and event loop.
+    Returns one run dict per script, shaped like utils.script_runner.run_script's.
+    """
+    options = dict(options or {})
+    job = {key: options.pop(key, None) for key in JOB_OPTIONS}
+    prefix = job['artifact_prefix'] or ''
+    jobs = [dict(job, script=script, browser=browser,
+                 artifact_prefix='-'.join(p for p in [prefix, str(index) if len(scripts) > 1 else ''] if p))
+            for index, script in enumerate(scripts)]
+    return run_async_jobs(jobs, timeout=timeout, options=options, concurrency=concurrency)
+
+def run_async_jobs(jobs, timeout=None, options=None, concurrency=None):
+    """
+    Execute a batch of async script jobs in one sandboxed subprocess and event loop.
+    Each job is a dict with `script` and `browser` plus its own JOB_OPTIONS
+    (artifact run id and prefix, log channel, cancel key), so one batch can
+    carry a whole browser matrix or several suite items. Returns one run dict
+    per job, in order.
+    """
+    from utils import artifacts
+    from utils.browser_farm import lease_for_run, release
+    from utils.network_rules import default_rules
+    from utils.cancellation import is_cancelled
+    from utils.sandbox import run_sandboxed
+    from utils.script_runner import DEFAULT_TIMEOUT, METRICS_MARKER, parse_runner_metrics
+
+    options = dict(options or {})
+    timeout = timeout or DEFAULT_TIMEOUT
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    options.setdefault('network', default_rules())
+    options.setdefault('artifacts', True)
+    options['timeout'] = timeout
+    engines = [job.get('browser') or 'chromium' for job in jobs]
+    # Every script may take the full timeout, but only `concurrency` run at once
+    rounds = math.ceil(len(jobs) / concurrency)
+
+    # One browser per engine serves the whole batch, so each engine takes one farm slot
+    leases = {}
+    try:
+        if not options.get('connect'):
+            for engine in dict.fromkeys(engines):
+                lease = lease_for_run(engine, timeout * rounds)
+                if lease:
+                    leases[engine] = lease
+    except Exception:
+        for lease in leases.values():
+            release(lease)
+        raise
+
+    run_dir = tempfile.mkdtemp(prefix='pwasync_')
+    paths = []
+    for index, job in enumerate(jobs):
+        path = os.path.join(run_dir, f'test_script_{index}.py')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(job['script'])
+        paths.append(path)
+    manifest_path = os.path.join(run_dir, 'manifest.json')
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'scripts': paths, 'engines': engines, 'concurrency': concurrency, 'options': options,
+                   'connect': {engine: lease['ws_endpoint'] for engine, lease in leases.items()}}, f)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in [PROJECT_ROOT, env.get('PYTHONPATH')] if p)
+    batch_timeout = timeout * rounds + 30
+
+    # Result lines are kept as they stream past; the sandbox only returns the output's tail
+    result_lines = []
+    publishers = {}
+    from utils.log_stream import line_publisher
+    for index, job in enumerate(jobs):
+        if job.get('log_channel'):
+            publishers[index] = line_publisher(job['log_channel'], engines[index])
+    shared = len(jobs) > 1
+
+    def on_line(stream, line):
+        if stream == 'stdout' and (line.startswith(RESULT_MARKER) or line.startswith(METRICS_MARKER)):
+            result_lines.append(line)
+            if shared and line.startswith(RESULT_MARKER):
+                # A job's output reaches its own channel when the job reports
+                for index, result in parse_results(line).items():
+                    for output_line in result['stdout'].splitlines(keepends=True):
+                        if index in publishers:
+                            publishers[index]('stdout', output_line)
+                return
+        # Batch-level output goes to every subscribed job
+        for publish in publishers.values():
+            publish(stream, line)
+
+    # The batch stops only when every job in it was cancelled
+    cancel_keys = [job.get('cancel_key') for job in jobs]
+    should_stop = None
+    if all(cancel_keys):
+        should_stop = lambda: all(is_cancelled(key) for key in cancel_keys)
+
+    try:
+        batch = run_sandboxed([sys.executable, '-m', 'utils.async_runner', manifest_path],
+                              cwd=run_dir, env=env, timeout=batch_timeout, limits=options.get('limits'),
+                              on_line=on_line, should_stop=should_stop)
+        results = parse_results(''.join(result_lines))
+        metrics = parse_runner_metrics(''.join(result_lines))
+        usage = dict(batch['resource_usage'], batch_size=len(jobs))
+
+        runs = []
+        for index, engine in enumerate(engines):
+            result = results.get(index)
+            farm_node = leases[engine]['node_id'] if engine in leases else None
+            if result is None:
+                # The batch process died or was killed before this script reported
+                runs.append({
+                    'browser': engine, 'returncode': batch['returncode'] or -1, 'timed_out': batch['timed_out'],
+                    'termination': batch['termination'], 'stdout': '', 'stderr': batch['stderr'], 'stats': None,
+                    'resource_usage': usage, 'duration': usage['wall_seconds'], 'artifact_run_id': None, 'passed': False,
+                    'farm_node': farm_node
+                })
+                continue
+            stats = result['stats']
+            stats['resource_usage'] = usage
+            if metrics:
+                stats['runner'] = metrics
+            run = {
+                'browser': engine,
+                'returncode': 1 if result['error'] else 0,
+                'timed_out': result['timed_out'],
+                'termination': result['error'] if result['timed_out'] else None,
+                'stdout': result['stdout'],
+                'stderr': result['error'] or '',
+                'stats': stats,
+                'resource_usage': usage,
+                'duration': result['duration'],
+                'artifact_run_id': None,
+                'farm_node': farm_node
+            }
+            run['passed'] = not result['error'] and not stats.get('assertions_failed') and not stats.get('errors')
+            runs.append(run)
+
+        for index, run in enumerate(runs):
+            if run['passed']:
+                continue
+            artifacts_dir = os.path.join(run_dir, f'artifacts_{index}')
+            os.makedirs(artifacts_dir, exist_ok=True)
+            with open(os.path.join(artifacts_dir, 'output.log'), 'w', encoding='utf-8') as f:
+                f.write(f"{run['stdout']}\n--- stderr ---\n{run['stderr']}")
+            run_id = jobs[index].get('artifact_run_id') or artifacts.new_run_id()
+            if artifacts.collect_run(run_id, artifacts_dir, prefix=jobs[index].get('artifact_prefix') or ''):
+                run['artifact_run_id'] = run_id
+        return runs
+    finally:
+        for lease in leases.values():
+            release(lease)
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+def main(argv):
+    if len(argv) < 2:
+        print('Usage: python -m utils.async_runner <manifest_path>', file=sys.stderr)
+        return 2
+    with open(argv[1], encoding='utf-8') as f:
+        manifest = json.load(f)
+    asyncio.run(run_batch(manifest))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
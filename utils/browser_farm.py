@@ -0,0 +1,263 @@
+"""
+Distributed browser farm.
+
+Browser nodes run `playwright run-server` and register themselves in Redis
+with their websocket endpoint and per-engine capacity, then keep a heartbeat
+alive while the server answers its health check. The script runner leases a
+slot on the least-loaded healthy node for the run's engine and the bootstrap
+turns the script's browser launch into `BrowserType.connect` to that node, so
+browser capacity scales with the number of nodes rather than with the Celery
+workers that run the LLM agents.
+
+Usage:
+    python -m utils.browser_farm node --port 3100 --capacity chromium=4,firefox=2
+    python -m utils.browser_farm local --nodes 3 --base-port 3100 --capacity chromium=2
+    python -m utils.browser_farm status
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import redis
+import requests
+from extensions import redis_client
+
+FARM_ENABLED = (os.environ.get('PW_BROWSER_FARM') or 'false').lower() == 'true'
+# How long a run waits for a free farm slot before launching a local browser instead
+ACQUIRE_WAIT = int(os.environ.get('PW_FARM_WAIT_SECONDS') or 60)
+LOCAL_FALLBACK = (os.environ.get('PW_FARM_LOCAL_FALLBACK') or 'true').lower() == 'true'
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TTL = 30
+HEALTH_TIMEOUT = 5
+
+PREFIX = 'browserfarm'
+NODES_KEY = f'{PREFIX}:nodes'   # hash node_id -> node JSON
+
+class NoBrowserCapacity(Exception):
+    """No healthy farm node had a free slot for the engine in time."""
+
+def _alive_key(node_id):
+    return f'{PREFIX}:alive:{node_id}'
+
+def _leases_key(node_id):
+    return f'{PREFIX}:leases:{node_id}'   # zset lease_id -> expiry
+
+def parse_capacity(text):
+    """'chromium=4,firefox=2' -> {'chromium': 4, 'firefox': 2}"""
+    capacity = {}
+    for part in (text or '').split(','):
+        if part.strip():
+            engine, _, count = part.partition('=')
+            capacity[engine.strip()] = int(count or 1)
+    return capacity
+
+def register_node(node_id, ws_endpoint, capacity):
+    """Add or update a node and mark it alive."""
+    node = {'id': node_id, 'ws_endpoint': ws_endpoint, 'capacity': capacity, 'registered_at': time.time()}
+    pipe = redis_client.pipeline()
+    pipe.hset(NODES_KEY, node_id, json.dumps(node))
+    pipe.set(_alive_key(node_id), 1, ex=HEARTBEAT_TTL)
+    pipe.execute()
+    return node
+
+def heartbeat(node_id):
+    redis_client.set(_alive_key(node_id), 1, ex=HEARTBEAT_TTL)
+
+def deregister_node(node_id):
+    pipe = redis_client.pipeline()
+    pipe.hdel(NODES_KEY, node_id)
+    pipe.delete(_alive_key(node_id), _leases_key(node_id))
+    pipe.execute()
+
+def nodes():
+    """Registered nodes with health and current load."""
+    now = time.time()
+    result = []
+    for node_id, data in redis_client.hgetall(NODES_KEY).items():
+        node = json.loads(data)
+        redis_client.zremrangebyscore(_leases_key(node_id), 0, now)
+        node['healthy'] = bool(redis_client.exists(_alive_key(node_id)))
+        node['load'] = redis_client.zcard(_leases_key(node_id))
+        result.append(node)
+    return result
+
+def pick_node(candidates, engine):
+    """Least-loaded healthy node with a free slot for `engine` (load relative to capacity), or None."""
+    best = None
+    for node in candidates:
+        capacity = node['capacity'].get(engine, 0)
+        # Engines share a node's CPU, so its total load counts against every engine's capacity
+        if not node['healthy'] or node['load'] >= capacity:
+            continue
+        utilisation = node['load'] / capacity
+        if best is None or utilisation < best[0]:
+            best = (utilisation, node)
+    return best[1] if best else None
+
+def acquire(engine, lease_seconds, wait=ACQUIRE_WAIT):
+    """
+    Lease a slot for one browser of `engine` on the least-loaded node.
+    Returns {'lease_id', 'node_id', 'ws_endpoint'}; raises NoBrowserCapacity after `wait` seconds.
+    Leases expire on their own, so a crashed runner never holds a slot for longer than `lease_seconds`.
+    """
+    deadline = time.time() + wait
+    while True:
+        with redis_client.lock(f'{PREFIX}:lock', timeout=10, blocking_timeout=10):
+            node = pick_node(nodes(), engine)
+            if node:
+                lease_id = uuid.uuid4().hex
+                redis_client.zadd(_leases_key(node['id']), {lease_id: time.time() + lease_seconds})
+                return {'lease_id': lease_id, 'node_id': node['id'], 'ws_endpoint': node['ws_endpoint']}
+        if time.time() >= deadline:
+            raise NoBrowserCapacity(f'No browser farm node has a free {engine} slot.')
+        time.sleep(1)
+
+def release(lease):
+    if lease:
+        try:
+            redis_client.zrem(_leases_key(lease['node_id']), lease['lease_id'])
+        except redis.RedisError:
+            pass
+
+def lease_for_run(engine, timeout):
+    """
+    Lease used by the runners: None when the farm is off, or when it has no capacity
+    in time and local launches are allowed as a fallback.
+    """
+    if not FARM_ENABLED:
+        return None
+    try:
+        return acquire(engine or 'chromium', lease_seconds=timeout + 60)
+    except (NoBrowserCapacity, redis.RedisError):
+        if LOCAL_FALLBACK:
+            return None
+        raise
+
+def is_healthy(port, host='127.0.0.1'):
+    """run-server answers plain HTTP requests on its websocket port."""
+    try:
+        return requests.get(f'http://{host}:{port}/', timeout=HEALTH_TIMEOUT).status_code == 200
+    except requests.RequestException:
+        return False
+
+class BrowserNode:
+    """One `playwright run-server` process plus the thread that registers it and keeps it healthy."""
+
+    def __init__(self, port, capacity, host=None, node_id=None):
+        self.port = port
+        self.capacity = capacity
+        self.host = host or os.environ.get('PW_FARM_ADVERTISE_HOST') or socket.gethostname()
+        self.node_id = node_id or f'{self.host}:{port}'
+        self.process = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def ws_endpoint(self):
+        return f'ws://{self.host}:{self.port}/'
+
+    def _start_server(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'playwright', 'run-server', '--port', str(self.port),
+             '--max-clients', str(sum(self.capacity.values()))],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+    def _wait_healthy(self, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline and not self._stop.is_set():
+            if is_healthy(self.port):
+                return True
+            time.sleep(0.5)
+        return False
+
+    def _loop(self):
+        registered = False
+        while not self._stop.is_set():
+            try:
+                if self.process.poll() is not None:
+                    # The server died: stop advertising it until a restarted one answers
+                    redis_client.delete(_alive_key(self.node_id))
+                    self._start_server()
+                    self._wait_healthy()
+                if is_healthy(self.port):
+                    if registered:
+                        heartbeat(self.node_id)
+                    else:
+                        register_node(self.node_id, self.ws_endpoint, self.capacity)
+                        registered = True
+            except redis.RedisError as e:
+                print(f'Browser node {self.node_id}: {e}', file=sys.stderr)
+            self._stop.wait(HEARTBEAT_INTERVAL)
+
+    def start(self):
+        self._start_server()
+        if not self._wait_healthy():
+            raise RuntimeError(f'playwright run-server on port {self.port} did not become healthy')
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        try:
+            deregister_node(self.node_id)
+        except redis.RedisError:
+            pass
+        if self.process and self.process.poll() is None:
+            # The Python wrapper runs the Node.js server as a child; stop the whole group
+            os.killpg(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+
+def _serve(farm_nodes):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    for node in farm_nodes:
+        node.start()
+        print(f'Browser node {node.node_id} serving {node.capacity} at {node.ws_endpoint}', flush=True)
+    try:
+        while not stop.is_set():
+            stop.wait(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for node in farm_nodes:
+            node.stop()
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m utils.browser_farm')
+    commands = parser.add_subparsers(dest='command', required=True)
+    node = commands.add_parser('node', help='Run one browser server and register it')
+    node.add_argument('--port', type=int, default=3100)
+    node.add_argument('--capacity', default='chromium=4')
+    node.add_argument('--host', help='Host name workers use to reach this node')
+    local = commands.add_parser('local', help='Run several browser servers on this machine')
+    local.add_argument('--nodes', type=int, default=3)
+    local.add_argument('--base-port', type=int, default=3100)
+    local.add_argument('--capacity', default='chromium=2')
+    commands.add_parser('status', help='Show registered nodes and their load')
+    args = parser.parse_args(argv[1:])
+
+    if args.command == 'node':
+        _serve([BrowserNode(args.port, parse_capacity(args.capacity), host=args.host)])
+    elif args.command == 'local':
+        _serve([BrowserNode(args.base_port + i, parse_capacity(args.capacity), host='127.0.0.1')
+                for i in range(args.nodes)])
+    else:
+        for farm_node in sorted(nodes(), key=lambda n: n['id']):
+            state = 'healthy' if farm_node['healthy'] else 'down'
+            print(f"{farm_node['id']:<24} {state:<8} load {farm_node['load']:<3} "
+                  f"{json.dumps(farm_node['capacity'])} {farm_node['ws_endpoint']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
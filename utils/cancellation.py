@@ -0,0 +1,107 @@
+"""
+Cooperative cancellation of generation jobs.
+
+Cancelling sets a flag in Redis. Graphs run through `run_graph` check it
+between nodes, and the sandbox watchdog checks it while a script runs and
+kills the whole process tree, so a cancelled job frees its browser within a
+second and the task can still save what it produced so far.
+"""
+
+import redis
+from extensions import redis_client
+
+CANCEL_PREFIX = 'cancel:'
+CANCEL_TTL = 3600
+# Who started a job, plus anyone attached to it by single-flight coalescing; only they may cancel it
+OWNER_PREFIX = 'job-owner:'
+OWNER_TTL = 86400
+# "<job>/<part>" keys name a cancellable part of a job (e.g. one speculative candidate)
+KEY_SEPARATOR = '/'
+
+class JobCancelled(Exception):
+    """Raised by run_graph; carries the state accumulated before the cancel."""
+
+    def __init__(self, state, node=None):
+        super().__init__(f'Job cancelled after {node}.' if node else 'Job cancelled.')
+        self.state = state
+        self.node = node
+
+def register_job(job_id, user_id):
+    """
+    Record `user_id` as the owner of a starting job and drop any cancel flag an
+    earlier job with the same id left behind. Returns False when another user owns the id.
+    """
+    key = f'{OWNER_PREFIX}{job_id}'
+    try:
+        if redis_client.sadd(key, user_id) and redis_client.scard(key) > 1:
+            redis_client.srem(key, user_id)
+            return False
+        redis_client.expire(key, OWNER_TTL)
+        redis_client.delete(f'{CANCEL_PREFIX}{job_id}')
+    except redis.RedisError:
+        # Without Redis the job cannot be cancelled anyway; let it run
+        pass
+    return True
+
+def attach_job(job_id, user_id):
+    """Add `user_id` as an owner of a running job it was coalesced onto."""
+    key = f'{OWNER_PREFIX}{job_id}'
+    try:
+        redis_client.sadd(key, user_id)
+        redis_client.expire(key, OWNER_TTL)
+    except redis.RedisError:
+        pass
+
+def detach_job(job_id, user_id):
+    """Drop `user_id` from the job's owners; returns how many owners are still attached."""
+    pipe = redis_client.pipeline()
+    pipe.srem(f'{OWNER_PREFIX}{job_id}', user_id)
+    pipe.scard(f'{OWNER_PREFIX}{job_id}')
+    return pipe.execute()[1]
+
+def owns_job(job_id, user_id):
+    """True when `user_id` started the job or is attached to it. A Redis outage denies."""
+    try:
+        return bool(redis_client.sismember(f'{OWNER_PREFIX}{job_id}', user_id))
+    except redis.RedisError:
+        return False
+
+def request_cancel(job_id):
+    redis_client.set(f'{CANCEL_PREFIX}{job_id}', 1, ex=CANCEL_TTL)
+
+def child_key(job_id, part):
+    """Cancel key for a part of a job; cancelling the job cancels every part too."""
+    return f'{job_id}{KEY_SEPARATOR}{part}'
+
+def is_cancelled(job_id):
+    """True once the job, or the job it is a part of, was cancelled. A Redis outage never cancels a job."""
+    if not job_id:
+        return False
+    parts = str(job_id).split(KEY_SEPARATOR)
+    keys = [f'{CANCEL_PREFIX}{KEY_SEPARATOR.join(parts[:i])}' for i in range(1, len(parts) + 1)]
+    try:
+        return bool(redis_client.exists(*keys))
+    except redis.RedisError:
+        return False
+
+def run_graph(graph, inputs, job_id=None):
+    """
+    Run a compiled graph step by step, checking for cancellation after every node.
+    Returns the final state dict or raises JobCancelled with the partial state.
+    """
+    state = dict(inputs)
+    for update in graph.stream(inputs):
+        for node, values in update.items():
+            if isinstance(values, dict):
+                state.update(values)
+            elif hasattr(values, 'model_dump'):
+                state.update(values.model_dump(exclude_unset=True))
+            if job_id and is_cancelled(job_id):
+                raise JobCancelled(state, node)
+    return state
+
+def cancelled_result(error):
+    """Execution result text recorded for a cancelled job."""
+    partial = error.state.get("execution_result")
+    text = f"[CANCELLED] {error}"
+    return f"{text}\n\nPartial result:\n{partial}" if partial else text
@@ -0,0 +1,174 @@
+"""
+Per-user weighted fair queue in front of Celery.
+
+Jobs wait in a Redis list per user and are handed to Celery by `dispatch`,
+which runs whenever a job is enqueued or finishes. Users take turns by
+stride scheduling: every dispatched job advances its user's virtual time by
+1 / role weight, and the user with the lowest virtual time goes next, so a
+user with 50 queued jobs cannot starve someone with one. Each user also has
+a role-based cap on concurrently running jobs, and the queue as a whole never
+runs more than FAIR_QUEUE_MAX_RUNNING jobs.
+
+A job that runs several things at once (a suite chunk) is enqueued with that
+many `slots` and counts that much against both caps. A job that does not fit
+the free capacity yet holds the queue rather than letting smaller jobs keep
+overtaking it.
+"""
+
+import json
+import math
+import os
+import time
+from extensions import redis_client
+
+ROLE_WEIGHTS = {'admin': 3, 'developer': 2, 'qa': 1}
+ROLE_QUOTAS = {
+    'admin': int(os.environ.get('FAIR_QUEUE_QUOTA_ADMIN') or 4),
+    'developer': int(os.environ.get('FAIR_QUEUE_QUOTA_DEVELOPER') or 3),
+    'qa': int(os.environ.get('FAIR_QUEUE_QUOTA_QA') or 2)
+}
+MAX_RUNNING = int(os.environ.get('FAIR_QUEUE_MAX_RUNNING') or 8)
+# Running entries older than the Celery hard time limit belong to dead workers
+STALE_AFTER = 660
+
+PREFIX = 'fairqueue'
+USERS_KEY = f'{PREFIX}:users'      # zset user_id -> virtual time, users with queued jobs
+RUNNING_KEY = f'{PREFIX}:running'  # zset task_id -> dispatch time
+CLOCK_KEY = f'{PREFIX}:clock'      # virtual time of the last dispatched job
+SLOTS_KEY = f'{PREFIX}:slots'      # hash task_id -> slots held by a running job
+
+def _pending_key(user_id):
+    return f'{PREFIX}:pending:{user_id}'
+
+def _job_key(task_id):
+    return f'{PREFIX}:job:{task_id}'
+
+def _user_running_key(user_id):
+    return f'{PREFIX}:running:{user_id}'
+
+def enqueue(task, args, kwargs, task_id, user_id, role, slots=1):
+    """
+    Queue a Celery task for `user_id`; it starts once the fair scheduler picks it.
+    `slots` is how many runs the task does at once.
+    """
+    job = {'task': task.name, 'args': args, 'kwargs': kwargs, 'task_id': task_id,
+           'user_id': user_id, 'role': role, 'slots': slots, 'enqueued_at': time.time()}
+    pipe = redis_client.pipeline()
+    pipe.set(_job_key(task_id), json.dumps(job), ex=86400)
+    pipe.rpush(_pending_key(user_id), task_id)
+    # A user joining the queue starts at the current virtual time, not with banked credit
+    pipe.zadd(USERS_KEY, {user_id: float(redis_client.get(CLOCK_KEY) or 0)}, nx=True)
+    pipe.execute()
+    dispatch()
+    return task_id
+
+def _load(task_ids):
+    """Slots held by the given running jobs."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return 0
+    return sum(int(slots or 1) for slots in redis_client.hmget(SLOTS_KEY, task_ids))
+
+def _slots_needed(job):
+    # A job wider than its user's quota (or the whole queue) runs alone rather than never
+    quota = ROLE_QUOTAS.get(job['role'], 1)
+    return max(1, min(int(job.get('slots') or 1), quota, MAX_RUNNING))
+
+def _reap_stale():
+    cutoff = time.time() - STALE_AFTER
+    for task_id in redis_client.zrangebyscore(RUNNING_KEY, 0, cutoff):
+        job_finished(task_id, dispatch_next=False)
+
+def dispatch():
+    """Start queued jobs while there is capacity, fairest user first."""
+    from celery_app import celery
+
+    with redis_client.lock(f'{PREFIX}:lock', timeout=30, blocking_timeout=10):
+        _reap_stale()
+        while True:
+            job = _next_job(MAX_RUNNING - _load(redis_client.zrange(RUNNING_KEY, 0, -1)))
+            if job is None:
+                return
+            celery.send_task(job['task'], args=job['args'], kwargs=job['kwargs'], task_id=job['task_id'])
+
+def _next_job(free):
+    # Users ordered by virtual time; skip those whose next job would exceed their running quota
+    if free <= 0:
+        return None
+    for user_id, vtime in redis_client.zrange(USERS_KEY, 0, -1, withscores=True):
+        task_id = redis_client.lindex(_pending_key(user_id), 0)
+        if task_id is None:
+            redis_client.zrem(USERS_KEY, user_id)
+            continue
+        data = redis_client.get(_job_key(task_id))
+        if data is None:
+            redis_client.lpop(_pending_key(user_id))
+            continue
+        job = json.loads(data)
+        slots = _slots_needed(job)
+        if _load(redis_client.smembers(_user_running_key(user_id))) + slots > ROLE_QUOTAS.get(job['role'], 1):
+            continue
+        if slots > free:
+            # The fairest job waits for capacity instead of being overtaken by smaller ones
+            return None
+
+        pipe = redis_client.pipeline()
+        pipe.lpop(_pending_key(user_id))
+        pipe.zadd(RUNNING_KEY, {task_id: time.time()})
+        pipe.sadd(_user_running_key(user_id), task_id)
+        pipe.hset(SLOTS_KEY, task_id, slots)
+        pipe.set(CLOCK_KEY, vtime)
+        pipe.zadd(USERS_KEY, {user_id: vtime + 1.0 / ROLE_WEIGHTS.get(job['role'], 1)})
+        pipe.execute()
+        if not redis_client.llen(_pending_key(user_id)):
+            redis_client.zrem(USERS_KEY, user_id)
+        return job
+    return None
+
+def job_finished(task_id, dispatch_next=True):
+    """Free the job's running slot; called by tasks when they end."""
+    data = redis_client.get(_job_key(task_id))
+    pipe = redis_client.pipeline()
+    pipe.zrem(RUNNING_KEY, task_id)
+    pipe.hdel(SLOTS_KEY, task_id)
+    if data:
+        pipe.srem(_user_running_key(json.loads(data)['user_id']), task_id)
+    pipe.delete(_job_key(task_id))
+    pipe.execute()
+    if dispatch_next:
+        dispatch()
+
+def remove(task_id):
+    """Drop a job that has not started yet (e.g. cancelled). Returns True if it was queued."""
+    data = redis_client.get(_job_key(task_id))
+    if not data:
+        return False
+    removed = redis_client.lrem(_pending_key(json.loads(data)['user_id']), 1, task_id)
+    if removed:
+        redis_client.delete(_job_key(task_id))
+    return bool(removed)
+
+def queue_position(task_id):
+    """
+    Approximate number of jobs that start before this one (1 = next), or None when
+    the job is not waiting. Other users contribute in proportion to their role weight.
+    """
+    data = redis_client.get(_job_key(task_id))
+    if not data:
+        return None
+    job = json.loads(data)
+    own = redis_client.lrange(_pending_key(job['user_id']), 0, -1)
+    if task_id not in own:
+        return None
+    index = own.index(task_id)
+    weight = ROLE_WEIGHTS.get(job['role'], 1)
+
+    ahead = index
+    for user_id in redis_client.zrange(USERS_KEY, 0, -1):
+        if user_id == str(job['user_id']):
+            continue
+        pending = redis_client.lrange(_pending_key(user_id), 0, 0)
+        other = json.loads(redis_client.get(_job_key(pending[0])) or '{}') if pending else {}
+        other_weight = ROLE_WEIGHTS.get(other.get('role'), 1)
+        ahead += min(redis_client.llen(_pending_key(user_id)), math.ceil((index + 1) * other_weight / weight))
+    return ahead + 1
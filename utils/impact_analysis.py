@@ -0,0 +1,259 @@
+"""
+Test impact analysis for re-uploaded projects.
+
+After a code generation job passes, the project's per-file hashes, a
+dependency map (route -> view module and its local imports -> templates,
+following extends/include -> static assets) and the routes the Playwright
+run reached are stored with the job's result. Routes come from the URLs the
+run's pages actually navigated to or fetched on the app under test (links,
+form posts, redirects and fetch() included, see pwstats.watch_page), not from
+the script's source. When the same developer
+re-uploads the project for the same requirement, the changed files are
+checked against the tested routes' dependencies: if none of them can affect
+what the test exercised, the stored result is reused instead of generating
+and running everything again.
+
+Projects are identified by their owner and top-level layout, so edits inside
+the project keep its identity. Route detection covers decorator-based routes
+(Flask `@x.route`, FastAPI `@x.get`); when a reached URL matches no route, or
+the run recorded no URLs, any change to the project reruns the job.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_PATH = os.environ.get('PW_IMPACT_STORE') or os.path.join(PROJECT_ROOT, 'instance', 'impact.db')
+ENABLED = (os.environ.get('PW_IMPACT_ANALYSIS') or 'true').lower() == 'true'
+MAX_AGE = int(os.environ.get('PW_IMPACT_MAX_AGE') or 7 * 86400)
+# Result fields of a code generation job that are stored and reused
+RESULT_FIELDS = ('generated_code', 'integration_instructions', 'playwright_script', 'execution_result',
+                 'test_stats', 'test_stats_report', 'artifact_run_id', 'app_status')
+
+_ROUTE_RE = re.compile(r"""^[ \t]*@\w+(?:\.\w+)*\.(?:route|get|post|put|patch|delete)\(\s*['"]([^'"]*)['"]""", re.MULTILINE)
+_TOP_LEVEL_RE = re.compile(r'^\S', re.MULTILINE)
+_HTML_RE = re.compile(r"""['"]([\w./-]+\.html)['"]""")
+_TEMPLATE_REF_RE = re.compile(r"""{%-?\s*(?:extends|include|import|from)\s+['"]([^'"]+)['"]""")
+_STATIC_REF_RE = re.compile(r"""url_for\(\s*['"]static['"]\s*,\s*filename\s*=\s*['"]([^'"]+)['"]|(?:href|src)\s*=\s*['"]/?static/([^'"?#]+)""")
+_IMPORT_RE = re.compile(r'^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w.]+))', re.MULTILINE)
+_PARAM_RE = re.compile(r'<(?:[^:<>]+:)?[^<>]+>|\{[^{}]+\}')
+LOOPBACK_HOSTS = {'127.0.0.1', 'localhost', '::1'}
+# Files outside the dependency map that cannot change what the app serves (docs and VCS metadata)
+INERT_EXTENSIONS = ('.md', '.rst', '.gitignore', '.gitattributes')
+INERT_NAMES = ('LICENSE', 'AUTHORS', 'CHANGELOG')
+
+def file_hashes(extracted_code):
+    """path -> short content hash for every project file."""
+    return {path: hashlib.sha256(str(content).encode('utf-8')).hexdigest()[:16]
+            for path, content in (extracted_code or {}).items()}
+
+def project_key(user_id, extracted_code):
+    """Identity of a project across re-uploads: its owner and top-level entries."""
+    top_level = sorted({path.split('/')[0] for path in extracted_code or {}})
+    return hashlib.sha256(json.dumps([str(user_id), top_level]).encode('utf-8')).hexdigest()[:16]
+
+def changed_files(old_hashes, new_hashes):
+    """Paths added, removed or modified between two uploads."""
+    return sorted(path for path in set(old_hashes) | set(new_hashes) if old_hashes.get(path) != new_hashes.get(path))
+
+def _resolve(files, suffix):
+    """Shallowest project file whose path is `suffix` or ends with /`suffix`."""
+    matches = [path for path in files if path == suffix or path.endswith(f'/{suffix}')]
+    return min(matches, key=lambda path: (path.count('/'), path)) if matches else None
+
+def _module_file(files, module):
+    base = module.replace('.', '/')
+    return _resolve(files, f'{base}.py') or _resolve(files, f'{base}/__init__.py')
+
+def _python_closure(files, path, seen):
+    """`path` and the project modules it imports, transitively."""
+    if path in seen:
+        return
+    seen.add(path)
+    for from_module, import_module in _IMPORT_RE.findall(files[path]):
+        target = _module_file(files, from_module or import_module)
+        if target:
+            _python_closure(files, target, seen)
+
+def _template_closure(files, path, seen):
+    """A template, the templates it extends/includes and the static files they reference."""
+    if path in seen:
+        return
+    seen.add(path)
+    content = files[path]
+    for name in _TEMPLATE_REF_RE.findall(content):
+        target = _resolve(files, f'templates/{name}')
+        if target:
+            _template_closure(files, target, seen)
+    for url_for_name, href_name in _STATIC_REF_RE.findall(content):
+        target = _resolve(files, f'static/{url_for_name or href_name}')
+        if target:
+            seen.add(target)
+
+def _view_bodies(source):
+    """(rule, body text) for each decorated route in a module."""
+    starts = [match.start() for match in _TOP_LEVEL_RE.finditer(source)] + [len(source)]
+    for match in _ROUTE_RE.finditer(source):
+        # The view runs from its decorator to the next top-level statement after its def
+        def_at = source.find('def ', match.end())
+        end = next((start for start in starts if start > def_at), len(source))
+        yield match.group(1), source[match.start():end]
+
+def dependency_map(files):
+    """rule -> {'module', 'templates', 'files'} where `files` is every project file the route depends on."""
+    routes = {}
+    for path, content in files.items():
+        if not path.endswith('.py'):
+            continue
+        for rule, body in _view_bodies(content):
+            modules, templates = set(), set()
+            _python_closure(files, path, modules)
+            for name in _HTML_RE.findall(body):
+                target = _resolve(files, f'templates/{name}') or _resolve(files, name)
+                if target:
+                    _template_closure(files, target, templates)
+            entry = routes.setdefault(rule or '/', {'module': path, 'templates': [], 'files': []})
+            entry['templates'] = sorted(set(entry['templates']) | {t for t in templates if t.endswith('.html')})
+            entry['files'] = sorted(set(entry['files']) | modules | templates)
+    return routes
+
+def _rule_regex(rule):
+    rule = rule.rstrip('/')
+    if not rule:
+        return re.compile(r'^/?$')
+    pattern = ''.join(re.escape(part) if index % 2 == 0 else '[^/]+' for index, part in enumerate(_interleave(rule)))
+    # Blueprint url_prefixes are registered elsewhere, so allow any prefix in front of the rule
+    return re.compile(f'^(?:/.*)?{pattern}/?$')
+
+def _interleave(rule):
+    """Literal text and parameter placeholders of a rule, alternating and starting with literal text."""
+    parts, last = [], 0
+    for match in _PARAM_RE.finditer(rule):
+        parts += [rule[last:match.start()], match.group(0)]
+        last = match.end()
+    return parts + [rule[last:]]
+
+def _on_app(url, app_url):
+    """True when `url` is served by the app under test; any URL is when its address is unknown."""
+    if not app_url:
+        return True
+    parts, app = urlsplit(url), urlsplit(app_url)
+    same_host = parts.hostname == app.hostname or {parts.hostname, app.hostname} <= LOOPBACK_HOSTS
+    return same_host and parts.port == app.port
+
+def visited_paths(urls, app_url=None):
+    """Paths on the app under test among the URLs a run reached (its stats' `visited_urls`)."""
+    return list(dict.fromkeys(urlsplit(url).path or '/' for url in urls or [] if _on_app(url, app_url)))
+
+def tested_routes(paths, routes, base_routes=None):
+    """
+    Rules the run visited, plus the rules the generated code added when the
+    routes of the project before generation (`base_routes`) are given. A visited
+    path that matches no rule cannot be attributed, so nothing is: returns [].
+    """
+    matched = set()
+    for path in paths:
+        rules = {rule for rule in routes if _rule_regex(rule).match(path)}
+        if not rules:
+            return []
+        matched |= rules
+    added = set(routes) - set(base_routes) if base_routes is not None else set()
+    return sorted(matched | added)
+
+def _connect():
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    conn = sqlite3.connect(STORE_PATH, timeout=5)
+    conn.execute("""CREATE TABLE IF NOT EXISTS impact (
+        project TEXT NOT NULL,
+        requirement TEXT NOT NULL,
+        browser TEXT NOT NULL,
+        hashes TEXT NOT NULL,
+        routes TEXT NOT NULL,
+        tested TEXT NOT NULL,
+        result TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (project, requirement, browser)
+    )""")
+    return conn
+
+def _requirement_key(requirement):
+    return ' '.join((requirement or '').split())
+
+def record_result(user_id, requirement, browser, extracted_code, state):
+    """Store a passed job's hashes, dependency map, tested routes and result. Never raises."""
+    if not ENABLED or "[PASS]" not in (state.get("execution_result") or ""):
+        return
+    from utils.app_runner import apply_generated_code
+
+    files = apply_generated_code(extracted_code, state.get("generated_code"))
+    routes = dependency_map(files)
+    urls = (state.get("test_stats") or {}).get("visited_urls")
+    # Without the run's URLs nothing is known to be untested, so nothing is attributed
+    tested = (tested_routes(visited_paths(urls, state.get("app_url")), routes, dependency_map(extracted_code))
+              if urls is not None else [])
+    result = {field: state.get(field) for field in RESULT_FIELDS}
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO impact VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (project_key(user_id, extracted_code), _requirement_key(requirement), browser or '',
+                              json.dumps(file_hashes(extracted_code)), json.dumps(routes), json.dumps(tested),
+                              json.dumps(result, default=str), time.time()))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+def _is_inert(path):
+    name = path.rsplit('/', 1)[-1]
+    return name.endswith(INERT_EXTENSIONS) or name.split('.')[0] in INERT_NAMES
+
+def affected_files(changed, routes, tested, generated_files=()):
+    """
+    Changed files that can affect the tested routes: their dependencies, files the
+    generated code touches, and any file no route depends on (app setup, config,
+    assets loaded in ways the map misses) unless it is inert documentation.
+    """
+    if not tested:
+        return list(changed)
+    depended_on = {path for entry in routes.values() for path in entry['files']}
+    tested_files = {path for rule in tested for path in (routes.get(rule) or {}).get('files', [])}
+    return [path for path in changed
+            if path in tested_files or path in generated_files
+            or (path not in depended_on and not _is_inert(path))]
+
+def reusable_result(user_id, requirement, browser, extracted_code, now=None):
+    """
+    The stored state for this project and requirement when no changed file affects
+    the tested routes, with a note on what was reused; otherwise None. Never raises.
+    """
+    if not ENABLED or not os.path.exists(STORE_PATH):
+        return None
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute("SELECT hashes, routes, tested, result, updated_at FROM impact "
+                               "WHERE project = ? AND requirement = ? AND browser = ?",
+                               (project_key(user_id, extracted_code), _requirement_key(requirement), browser or '')).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    if not row or (now or time.time()) - row[4] > MAX_AGE:
+        return None
+    hashes, routes, tested, result = (json.loads(value) for value in row[:4])
+    changed = changed_files(hashes, file_hashes(extracted_code))
+    generated_files = ((result.get('generated_code') or {}).get('files') or {}).keys()
+    if affected_files(changed, routes, tested, generated_files):
+        return None
+
+    reason = (f"{len(changed)} changed file{'s' if len(changed) != 1 else ''} ({', '.join(changed[:5])}"
+              f"{', ...' if len(changed) > 5 else ''}) do not affect" if changed else "No project files changed for")
+    note = f"♻️ Reused the previous result: {reason} the tested routes ({', '.join(tested)})."
+    return dict(result, execution_result=f"{note}\n\n{result.get('execution_result') or ''}", impact_reused=True)
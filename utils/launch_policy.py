@@ -0,0 +1,83 @@
+"""
+Executor-owned browser launch policy.
+
+Generated scripts do not choose their own launch settings: the bootstrap
+applies this policy to every BrowserType.launch()/launch_persistent_context()
+call, so each run is headless with a lean, per-engine args profile and a
+consistent viewport whatever the script asked for. Scripts can call
+`launch_browser(p)` to get a browser handle launched with the policy.
+"""
+
+import json
+import os
+
+HEADLESS = (os.environ.get('PW_HEADLESS') or 'true').lower() not in ('0', 'false', 'no')
+CHROMIUM_SANDBOX = (os.environ.get('PW_CHROMIUM_SANDBOX') or 'false').lower() in ('1', 'true', 'yes')
+DEFAULT_VIEWPORT = {'width': 1280, 'height': 720}
+
+ENGINE_ARGS = {
+    'chromium': [
+        '--disable-gpu',
+        '--disable-dev-shm-usage',
+        '--disable-extensions',
+        '--disable-background-networking',
+        '--disable-background-timer-throttling',
+        '--disable-renderer-backgrounding',
+        '--disable-component-update',
+        '--no-first-run',
+        '--mute-audio'
+    ],
+    'firefox': [],
+    'webkit': []
+}
+FIREFOX_PREFS = {
+    'media.autoplay.default': 5,
+    'browser.cache.disk.enable': False,
+    'layers.acceleration.disabled': True
+}
+# run-server launches the browser it serves with the options sent in this header
+LAUNCH_OPTIONS_HEADER = 'x-playwright-launch-options'
+# Settings a script may not override
+POLICY_KEYS = ('headless', 'devtools', 'slow_mo', 'args', 'chromium_sandbox', 'ignore_default_args')
+
+LAUNCH_PROMPT_GUIDE = """Browser launch rules:
+- Launch the browser with `from utils.launch_policy import launch_browser` and `browser = launch_browser(p)` inside `with sync_playwright() as p:`.
+- Do not pass headless, args, slow_mo or a viewport; the executor sets them."""
+
+def launch_options(engine, requested=None):
+    """Launch kwargs for `engine`: the script's own options with the policy settings forced."""
+    options = {key: value for key, value in (requested or {}).items() if key not in POLICY_KEYS}
+    options['headless'] = HEADLESS
+    options['args'] = list(ENGINE_ARGS.get(engine, []))
+    if engine == 'chromium':
+        options['chromium_sandbox'] = CHROMIUM_SANDBOX
+    elif engine == 'firefox':
+        options['firefox_user_prefs'] = dict(FIREFOX_PREFS, **options.get('firefox_user_prefs', {}))
+    return options
+
+def _camel(key):
+    head, *rest = key.split('_')
+    return head + ''.join(part.capitalize() for part in rest)
+
+def connect_options(launch):
+    """BrowserType.connect() kwargs that make a remote browser server launch with `launch` options."""
+    # run-server reads the protocol's camelCase option names; nested values (e.g. Firefox prefs) are kept as they are
+    header = {_camel(key): value for key, value in launch.items()}
+    return {'headers': {LAUNCH_OPTIONS_HEADER: json.dumps(header, default=str)}}
+
+def context_options(requested=None):
+    """Context kwargs with the default viewport, unless the script emulates a device or sets its own."""
+    options = dict(requested or {})
+    if 'viewport' not in options and 'no_viewport' not in options:
+        options['viewport'] = dict(DEFAULT_VIEWPORT)
+    return options
+
+def launch_browser(playwright, engine=None):
+    """
+    Launch the executor's browser for a generated script.
+    The engine comes from the runner options (cross-browser matrix) and falls back to chromium.
+    """
+    if engine is None:
+        options = json.loads(os.environ.get('PW_RUNNER_OPTIONS') or '{}')
+        engine = options.get('engine') or 'chromium'
+    return getattr(playwright, engine).launch(**launch_options(engine))
@@ -0,0 +1,142 @@
+"""
+Persistent store of known-good locators per site.
+
+Entries are keyed by origin, page path and a semantic element name
+("search button", "login email field"). Generated scripts resolve elements
+through `pwstats.locate`, which tries the stored selectors for that key before
+the ones the script proposes. The executor records which selector worked once
+a run has passed, and counts selectors that failed, so the generator and
+debugger can be offered selectors that are known to match.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_PATH = os.environ.get('PW_LOCATOR_STORE') or os.path.join(PROJECT_ROOT, 'instance', 'locators.db')
+MAX_CANDIDATES = 3
+MAX_PROMPT_ENTRIES = 30
+
+LOCATOR_PROMPT_GUIDE = """Locator rules:
+- Resolve elements with `from pwstats import locate` and `locate(page, "<element name>", "<selector>", "<alternate selector>")`, e.g. `locate(page, "search button", "role=button[name='Search']", "#search-btn")`.
+- Name elements by what they are for, not how they look; reuse the same name for the same element across scripts.
+- Prefer the known-good selectors listed below where one exists for the page."""
+
+_URL_RE = re.compile(r"https?://[^\s'\"<>)]+")
+# Path segments that identify a record rather than a page (ids, hashes, uuids)
+_ID_SEGMENT_RE = re.compile(r'^(\d+|[0-9a-f]{8,}|[0-9a-f-]{36})$', re.IGNORECASE)
+
+def page_key(url):
+    """(origin, path) for a URL; query, fragment and id-like path segments are ignored."""
+    parts = urlsplit(url or '')
+    if not parts.scheme or not parts.netloc:
+        return None, None
+    segments = [':id' if _ID_SEGMENT_RE.match(s) else s for s in parts.path.split('/') if s]
+    return f'{parts.scheme}://{parts.netloc}', '/' + '/'.join(segments)
+
+def _name_key(name):
+    return ' '.join(str(name).lower().split())
+
+def _connect():
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    conn = sqlite3.connect(STORE_PATH, timeout=5)
+    conn.execute("""CREATE TABLE IF NOT EXISTS locators (
+        origin TEXT NOT NULL,
+        path TEXT NOT NULL,
+        name TEXT NOT NULL,
+        selector TEXT NOT NULL,
+        successes INTEGER NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        last_success REAL,
+        PRIMARY KEY (origin, path, name, selector)
+    )""")
+    return conn
+
+def candidates(url, name, limit=MAX_CANDIDATES):
+    """Known-good selectors for `name` on the page at `url`, best first. Never raises."""
+    origin, path = page_key(url)
+    if not origin or not os.path.exists(STORE_PATH):
+        return []
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                "SELECT selector FROM locators WHERE origin = ? AND path = ? AND name = ? AND successes > failures "
+                "ORDER BY successes - failures DESC, last_success DESC LIMIT ?",
+                (origin, path, _name_key(name), limit)
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+    return [row[0] for row in rows]
+
+def record_run(entries, passed):
+    """
+    Record the locators a run resolved (stats['locators'] from pwstats).
+    Selectors that matched only count as known-good when the whole run passed;
+    selectors that did not match always count against themselves.
+    """
+    rows = []
+    for entry in entries or []:
+        origin, path = page_key(entry.get('url'))
+        if not origin or not entry.get('name') or not entry.get('selector'):
+            continue
+        if entry.get('ok') and not passed:
+            continue
+        rows.append((origin, path, _name_key(entry['name']), entry['selector'], bool(entry.get('ok'))))
+    if not rows:
+        return 0
+
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                for origin, path, name, selector, ok in rows:
+                    conn.execute(
+                        "INSERT INTO locators (origin, path, name, selector, successes, failures, last_success) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (origin, path, name, selector) DO UPDATE SET "
+                        "successes = successes + excluded.successes, failures = failures + excluded.failures, "
+                        "last_success = COALESCE(excluded.last_success, last_success)",
+                        (origin, path, name, selector, int(ok), int(not ok), now if ok else None)
+                    )
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+    return len(rows)
+
+def known_locators(origins, limit=MAX_PROMPT_ENTRIES):
+    """Best selector per (path, name) for the given origins, most used first."""
+    origins = list(dict.fromkeys(o for o in origins if o))
+    if not origins or not os.path.exists(STORE_PATH):
+        return []
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                f"SELECT origin, path, name, selector, MAX(successes - failures) AS score FROM locators "
+                f"WHERE origin IN ({', '.join('?' * len(origins))}) AND successes > failures "
+                f"GROUP BY origin, path, name ORDER BY score DESC LIMIT ?",
+                (*origins, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+    return [{'origin': o, 'path': p, 'name': n, 'selector': s} for o, p, n, s, _ in rows]
+
+def prompt_context(*texts):
+    """Locator guidance for prompts, listing known-good selectors for every site URL found in `texts`."""
+    origins = [page_key(url)[0] for text in texts if text for url in _URL_RE.findall(text)]
+    known = known_locators(origins)
+    if not known:
+        return LOCATOR_PROMPT_GUIDE
+    lines = [LOCATOR_PROMPT_GUIDE, "Known-good locators (origin + path: element name -> selector):"]
+    for entry in known:
+        lines.append(f"- {entry['origin']}{entry['path']}: \"{entry['name']}\" -> {entry['selector']}")
+    return "\n".join(lines)
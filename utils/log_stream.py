@@ -0,0 +1,89 @@
+"""
+Live execution logs over Redis.
+
+The script runner publishes every stdout/stderr line and every structured
+step event of a run to the task's channel as it happens. A capped backlog
+list lets subscribers that connect late catch up before following the live
+channel. The task publishes an `end` event when it finishes.
+"""
+
+import json
+import time
+import redis
+from extensions import redis_client
+
+CHANNEL_PREFIX = 'runlog:'
+BACKLOG_LINES = 500
+BACKLOG_TTL = 3600
+HEARTBEAT_SECONDS = 15
+STEP_MARKER = 'STEP_EVENT'
+
+def channel_for(task_id):
+    return f'{CHANNEL_PREFIX}{task_id}'
+
+def publish(channel, event):
+    """Send one event to live subscribers and the channel backlog."""
+    if not channel:
+        return
+    seq = redis_client.incr(f'{channel}:seq')
+    data = json.dumps(dict(event, seq=seq, ts=round(time.time(), 3)))
+    pipe = redis_client.pipeline()
+    pipe.publish(channel, data)
+    pipe.rpush(f'{channel}:backlog', data)
+    pipe.ltrim(f'{channel}:backlog', -BACKLOG_LINES, -1)
+    pipe.expire(f'{channel}:backlog', BACKLOG_TTL)
+    pipe.expire(f'{channel}:seq', BACKLOG_TTL)
+    pipe.execute()
+
+def line_publisher(channel, browser=None):
+    """
+    on_line callback for utils.sandbox: turns STEP_EVENT lines into step
+    events and everything else into log lines.
+    """
+    def on_line(stream, line):
+        text = line.rstrip('\n')
+        if stream == 'stdout' and text.startswith(STEP_MARKER):
+            try:
+                publish(channel, dict(json.loads(text[len(STEP_MARKER):]), type='step', browser=browser))
+                return
+            except ValueError:
+                pass
+        publish(channel, {'type': 'line', 'stream': stream, 'browser': browser, 'text': text})
+    return on_line
+
+def publish_end(channel, status):
+    """Tell subscribers the task is over; never raises, since it runs in task cleanup."""
+    try:
+        publish(channel, {'type': 'end', 'status': status})
+    except redis.RedisError:
+        pass
+
+def follow(channel):
+    """
+    Yield the backlog and then live events for a channel until its `end`
+    event. Yields None as a heartbeat while the channel is quiet.
+    """
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+    try:
+        # Subscribe before reading the backlog so nothing published in between is lost
+        last_seq = 0
+        for data in redis_client.lrange(f'{channel}:backlog', 0, -1):
+            event = json.loads(data)
+            last_seq = event['seq']
+            yield event
+            if event.get('type') == 'end':
+                return
+        while True:
+            message = pubsub.get_message(timeout=HEARTBEAT_SECONDS)
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message['data'])
+            if event['seq'] <= last_seq:
+                continue
+            yield event
+            if event.get('type') == 'end':
+                return
+    finally:
+        pubsub.close()
@@ -0,0 +1,206 @@
+"""
+Executor-level request routing for generated scripts.
+
+Every browser context the script opens gets a route handler that blocks
+configured resource types and third-party domains, and serves static
+assets from an on-disk response cache. A route pauses each request it
+matches, so the handler only sees every request when resource types are
+blocked or the cache is on; with domain blocking alone it only sees requests
+to the blocked domains, and with no rules no route is installed.
+
+Cache modes (PW_NETWORK_MODE):
+    off     - only blocking rules apply (the default)
+    record  - always fetch from the network and refresh the cache
+    replay  - serve cached responses, fetching and recording on a miss
+
+Cached responses are keyed by URL only, so a site that changes its assets
+without changing their URLs would be tested against stale files. Caching is
+therefore opt-in, and PW_RESPONSE_CACHE_DOMAINS limits it to the CDN and
+third-party hosts whose assets are versioned. Loopback hosts and the host
+generated-code app servers are reached on (utils.app_runner) are never cached:
+their files change between runs and their ports are reused by other projects.
+"""
+
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('PW_RESPONSE_CACHE_DIR') or os.path.join(PROJECT_ROOT, 'instance', 'response_cache')
+CACHE_TTL = int(os.environ.get('PW_RESPONSE_CACHE_TTL') or 86400)
+MODES = ('off', 'record', 'replay')
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ['media']
+DEFAULT_BLOCKED_DOMAINS = [
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'facebook.net',
+    'hotjar.com',
+    'segment.io',
+    'nr-data.net',
+    'backtrace.io'
+]
+CACHEABLE_RESOURCE_TYPES = ('stylesheet', 'script', 'image', 'font')
+
+def _env_list(name, default):
+    value = os.environ.get(name)
+    return [item.strip() for item in value.split(',') if item.strip()] if value is not None else list(default)
+
+def default_rules():
+    """Routing rules from the environment, falling back to the defaults above."""
+    from utils.app_runner import ADVERTISE_HOST
+    mode = os.environ.get('PW_NETWORK_MODE') or 'off'
+    return {
+        'mode': mode if mode in MODES else 'off',
+        'block_resource_types': _env_list('PW_BLOCK_RESOURCE_TYPES', DEFAULT_BLOCKED_RESOURCE_TYPES),
+        'block_domains': _env_list('PW_BLOCK_DOMAINS', DEFAULT_BLOCKED_DOMAINS),
+        # Empty means every host's static assets may be cached
+        'cache_domains': _env_list('PW_RESPONSE_CACHE_DOMAINS', []),
+        'cache_exclude_hosts': _env_list('PW_RESPONSE_CACHE_EXCLUDE', []) + [ADVERTISE_HOST],
+        'cache_dir': CACHE_DIR,
+        'cache_ttl': CACHE_TTL
+    }
+
+def is_blocked(url, resource_type, rules):
+    """True when a request matches a blocked resource type or domain."""
+    if resource_type in rules.get('block_resource_types', []):
+        return True
+    return _host_matches(urlsplit(url).hostname or '', rules.get('block_domains', []))
+
+def _host_matches(host, domains):
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+def route_pattern(rules):
+    """URL pattern the routing handler has to see for `rules`, or None when nothing needs intercepting."""
+    if rules.get('block_resource_types') or rules.get('mode', 'off') != 'off':
+        return '**/*'
+    domains = rules.get('block_domains') or []
+    if not domains:
+        return None
+    # Matches the blocked domains and their subdomains, like _host_matches
+    hosts = '|'.join(re.escape(domain) for domain in domains)
+    return re.compile(rf'^[a-z][a-z0-9+.-]*://([^/?#@]*@)?([^/?#@:]*\.)?({hosts})(:\d+)?([/?#]|$)', re.IGNORECASE)
+
+def _is_loopback(host):
+    if host == 'localhost' or host.endswith('.localhost'):
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def is_cacheable(request, rules):
+    """True when the cache mode is on and the request is a GET for a static asset on a cacheable host."""
+    if rules.get('mode', 'off') == 'off' or request.method != 'GET' or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+        return False
+    host = urlsplit(request.url).hostname or ''
+    if _is_loopback(host) or _host_matches(host, rules.get('cache_exclude_hosts') or []):
+        return False
+    domains = rules.get('cache_domains') or []
+    return not domains or _host_matches(host, domains)
+
+class ResponseCache:
+    """Responses stored as <sha256(url)>.body plus a .json metadata file."""
+
+    def __init__(self, cache_dir, ttl=CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.json', base + '.body'
+
+    def get(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['saved_at'] + self.ttl < time.time():
+                return None
+            with open(body_path, 'rb') as f:
+                return meta, f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, url, status, headers, body):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # Body first, so a readable .json always has its body next to it
+        tmp_body = f'{body_path}.{os.getpid()}.tmp'
+        with open(tmp_body, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_body, body_path)
+        tmp_meta = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'status': status, 'headers': headers, 'saved_at': time.time()}, f)
+        os.replace(tmp_meta, meta_path)
+
+def install_network_rules(context, rules, counters):
+    """Attach the routing handler to a browser context; `counters` collects hit/miss/blocked totals."""
+    pattern = route_pattern(rules)
+    if pattern is None:
+        return
+    mode = rules.get('mode', 'off')
+    cache = ResponseCache(rules.get('cache_dir', CACHE_DIR), rules.get('cache_ttl', CACHE_TTL))
+
+    def handle(route, request):
+        if is_blocked(request.url, request.resource_type, rules):
+            counters['blocked'] = counters.get('blocked', 0) + 1
+            return route.abort('blockedbyclient')
+
+        if not is_cacheable(request, rules):
+            return route.continue_()
+
+        if mode == 'replay':
+            cached = cache.get(request.url)
+            if cached:
+                meta, body = cached
+                counters['cache_hits'] = counters.get('cache_hits', 0) + 1
+                return route.fulfill(status=meta['status'], headers=meta['headers'], body=body)
+
+        counters['cache_misses'] = counters.get('cache_misses', 0) + 1
+        response = route.fetch()
+        body = response.body()
+        if response.status == 200:
+            cache.put(request.url, response.status, response.headers, body)
+        return route.fulfill(response=response, body=body)
+
+    context.route(pattern, handle)
+
+async def install_network_rules_async(context, rules, counters):
+    """Async-API counterpart of install_network_rules, for contexts of utils.async_runner."""
+    pattern = route_pattern(rules)
+    if pattern is None:
+        return
+    mode = rules.get('mode', 'off')
+    cache = ResponseCache(rules.get('cache_dir', CACHE_DIR), rules.get('cache_ttl', CACHE_TTL))
+
+    async def handle(route, request):
+        if is_blocked(request.url, request.resource_type, rules):
+            counters['blocked'] = counters.get('blocked', 0) + 1
+            return await route.abort('blockedbyclient')
+
+        if not is_cacheable(request, rules):
+            return await route.continue_()
+
+        if mode == 'replay':
+            cached = cache.get(request.url)
+            if cached:
+                meta, body = cached
+                counters['cache_hits'] = counters.get('cache_hits', 0) + 1
+                return await route.fulfill(status=meta['status'], headers=meta['headers'], body=body)
+
+        counters['cache_misses'] = counters.get('cache_misses', 0) + 1
+        response = await route.fetch()
+        body = await response.body()
+        if response.status == 200:
+            cache.put(request.url, response.status, response.headers, body)
+        return await route.fulfill(response=response, body=body)
+
+    await context.route(pattern, handle)
@@ -0,0 +1,224 @@
+"""
+Page model snapshots for the script generator.
+
+Before a script is generated, the target page is opened once headlessly and
+reduced to a compact summary: title, an outline of its accessibility tree and
+the interactive elements with the attributes selectors can be built from.
+Summaries are cached per URL for PW_PAGE_MODEL_TTL seconds; an expired entry
+whose page sent an ETag or Last-Modified is revalidated with a conditional
+request instead of opening a browser again.
+
+Usage (inside the sandboxed subprocess): python -m utils.page_model <url>
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('PW_PAGE_MODEL_DIR') or os.path.join(PROJECT_ROOT, 'instance', 'page_models')
+DEFAULT_TTL = int(os.environ.get('PW_PAGE_MODEL_TTL') or 3600)
+CRAWL_TIMEOUT = 60
+NAVIGATION_TIMEOUT_MS = 30000
+MAX_OUTLINE_LINES = 60
+MAX_ELEMENTS = 60
+MAX_PAGES = 2
+RESULT_MARKER = 'PAGE_MODEL_JSON'
+
+_URL_RE = re.compile(r"https?://[^\s'\"<>)]+")
+# Start pages of sites requirements often name without a URL
+SITE_START_URLS = {'amazon': 'https://www.amazon.com/', 'saucedemo': 'https://www.saucedemo.com/'}
+_SITE_RE = re.compile(r'\b(amazon|sauce\s?demo)\b', re.IGNORECASE)
+# Accessibility roles worth showing in the outline; everything else only contributes its children
+OUTLINE_ROLES = {'banner', 'navigation', 'main', 'contentinfo', 'form', 'search', 'dialog', 'region',
+                 'heading', 'list', 'table', 'tablist', 'menu', 'button', 'link', 'textbox', 'searchbox',
+                 'combobox', 'checkbox', 'radio', 'tab', 'menuitem', 'img', 'alert'}
+
+_ELEMENTS_JS = """(max) => {
+    const selector = 'a[href], button, input, select, textarea, [role=button], [role=link], [role=tab], [data-testid], [data-test]';
+    const out = [];
+    for (const el of document.querySelectorAll(selector)) {
+        const rect = el.getBoundingClientRect();
+        if (!rect.width || !rect.height || getComputedStyle(el).visibility === 'hidden') continue;
+        const attrs = {};
+        for (const name of ['id', 'name', 'type', 'placeholder', 'aria-label', 'data-testid', 'data-test', 'href']) {
+            const value = el.getAttribute(name);
+            if (value) attrs[name] = value.slice(0, 80);
+        }
+        out.push({tag: el.tagName.toLowerCase(), text: (el.innerText || el.value || '').trim().slice(0, 60), attrs});
+        if (out.length >= max) break;
+    }
+    return out;
+}"""
+
+def extract_urls(text, limit=MAX_PAGES):
+    """
+    Distinct http(s) URLs mentioned in a requirement, in order. A requirement
+    without URLs gets the start pages of the known sites it names, and a
+    predefined requirement the start page of its flow.
+    """
+    from config import PREDEFINED_REQUIREMENTS, PREDEFINED_START_URL
+
+    urls = [url.rstrip('.,;') for url in _URL_RE.findall(text or '')]
+    if not urls:
+        urls = [SITE_START_URLS[re.sub(r'\s', '', name.lower())] for name in _SITE_RE.findall(text or '')]
+    normalized = ' '.join((text or '').lower().split())
+    if not urls and normalized in {' '.join(r.lower().split()) for r in PREDEFINED_REQUIREMENTS.values()}:
+        urls = [PREDEFINED_START_URL]
+    return list(dict.fromkeys(urls))[:limit]
+
+def _entry_path(url):
+    return os.path.join(CACHE_DIR, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json")
+
+def load(url):
+    try:
+        with open(_entry_path(url), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save(url, entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _entry_path(url)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+def _outline(node, depth=0, lines=None):
+    """Indented `role "name"` lines for the interesting nodes of an accessibility snapshot."""
+    lines = [] if lines is None else lines
+    if not node or len(lines) >= MAX_OUTLINE_LINES:
+        return lines
+    role, name = node.get('role'), (node.get('name') or '').strip()
+    shown = role in OUTLINE_ROLES and (name or role not in ('link', 'img', 'button'))
+    if shown:
+        label = f'{role} "{name[:60]}"' if name else role
+        if role == 'heading' and node.get('level'):
+            label += f" (h{node['level']})"
+        lines.append(f"{'  ' * depth}- {label}")
+    for child in node.get('children') or []:
+        _outline(child, depth + 1 if shown else depth, lines)
+    return lines
+
+def summarize(snapshot):
+    """Compact text summary of a crawled page, as handed to the script generator."""
+    lines = [f"Page: {snapshot['url']}", f"Title: {snapshot.get('title') or ''}"]
+    outline = _outline(snapshot.get('accessibility'))
+    if outline:
+        lines.append("Accessibility outline:")
+        lines.extend(outline)
+    elements = snapshot.get('elements') or []
+    if elements:
+        lines.append("Interactive elements (tag, attributes, text):")
+        for element in elements:
+            attrs = ' '.join(f'{k}="{v}"' for k, v in element['attrs'].items())
+            text = f' "{element["text"]}"' if element['text'] else ''
+            lines.append(f"- <{element['tag']}{' ' + attrs if attrs else ''}>{text}")
+    return "\n".join(lines)
+
+def crawl_page(url):
+    """Open `url` headlessly and return its raw snapshot. Runs inside the sandbox."""
+    from playwright.sync_api import sync_playwright
+    from utils.launch_policy import launch_browser, context_options
+
+    with sync_playwright() as p:
+        browser = launch_browser(p, 'chromium')
+        try:
+            page = browser.new_context(**context_options()).new_page()
+            response = page.goto(url, wait_until='domcontentloaded', timeout=NAVIGATION_TIMEOUT_MS)
+            try:
+                page.wait_for_load_state('load', timeout=5000)
+            except Exception:
+                pass
+            headers = response.headers if response else {}
+            return {
+                'url': page.url,
+                'title': page.title(),
+                'etag': headers.get('etag'),
+                'last_modified': headers.get('last-modified'),
+                'accessibility': page.accessibility.snapshot(),
+                'elements': page.evaluate(_ELEMENTS_JS, MAX_ELEMENTS)
+            }
+        finally:
+            browser.close()
+
+def _crawl_sandboxed(url, cancel_key=None):
+    from utils.cancellation import is_cancelled
+    from utils.sandbox import run_sandboxed
+
+    run_dir = tempfile.mkdtemp(prefix='pwpagemodel_')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in [PROJECT_ROOT, env.get('PYTHONPATH')] if p)
+    results = []
+
+    def on_line(stream, line):
+        if stream == 'stdout' and line.startswith(RESULT_MARKER):
+            results.append(line[len(RESULT_MARKER):])
+
+    try:
+        run = run_sandboxed([sys.executable, '-m', 'utils.page_model', url], cwd=run_dir, env=env,
+                            timeout=CRAWL_TIMEOUT, on_line=on_line,
+                            should_stop=cancel_key and (lambda: is_cancelled(cancel_key)))
+        if run['returncode'] != 0 or not results:
+            print(f"Page model crawl of {url} failed: {run['termination'] or run['stderr'][-500:]}", file=sys.stderr)
+            return None
+        return json.loads(results[-1])
+    except ValueError:
+        return None
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+def _not_modified(url, entry):
+    """Conditional GET against the cached validators; True when the server answers 304."""
+    import requests
+
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    if not headers:
+        return False
+    try:
+        return requests.get(url, headers=headers, timeout=10, allow_redirects=True).status_code == 304
+    except requests.RequestException:
+        return False
+
+def summary_for(url, ttl=DEFAULT_TTL, cancel_key=None, now=None):
+    """Summary of the page at `url`, from the cache when fresh or still valid. None if it cannot be crawled."""
+    now = now or time.time()
+    entry = load(url)
+    if entry and now - entry['fetched_at'] < ttl:
+        return entry['summary']
+    if entry and _not_modified(url, entry):
+        entry['fetched_at'] = now
+        save(url, entry)
+        return entry['summary']
+
+    snapshot = _crawl_sandboxed(url, cancel_key)
+    if snapshot is None:
+        # A stale summary still beats writing the script blind
+        return entry['summary'] if entry else None
+    entry = {'url': url, 'fetched_at': now, 'etag': snapshot.get('etag'),
+             'last_modified': snapshot.get('last_modified'), 'summary': summarize(snapshot)}
+    try:
+        save(url, entry)
+    except OSError:
+        pass
+    return entry['summary']
+
+def main(argv):
+    if len(argv) < 2:
+        print('Usage: python -m utils.page_model <url>', file=sys.stderr)
+        return 2
+    print(f'{RESULT_MARKER} {json.dumps(crawl_page(argv[1]))}', flush=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
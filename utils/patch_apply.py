@@ -0,0 +1,147 @@
+"""
+Unified diff applier for generated code.
+
+Applies a model-written unified diff to the extracted project files held in
+memory. Model diffs are rarely exact, so the applier is lenient where that is
+safe: hunk header counts are recomputed from the hunk body, a hunk that is not
+at its stated line is searched for nearby, and trailing whitespace is ignored
+as a last resort. A hunk whose context is not in the file is never guessed at;
+every such hunk is reported in one PatchError so the model can fix them together.
+"""
+
+import re
+
+_HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+_FENCE_RE = re.compile(r'^```[\w-]*\s*$')
+
+class PatchError(Exception):
+    """The diff could not be parsed or one or more hunks did not apply."""
+
+    def __init__(self, problems):
+        self.problems = problems if isinstance(problems, list) else [problems]
+        super().__init__('\n'.join(self.problems))
+
+def _path(header):
+    path = header.split('\t')[0].strip()
+    if path == '/dev/null':
+        return None
+    path = path[2:] if path[:2] in ('a/', 'b/') else path
+    # Paths are relative to the project root; anything that could escape it is refused
+    parts = [part for part in path.replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts or path.startswith(('/', '\\')) or re.match(r'^[A-Za-z]:', path) or '..' in parts:
+        raise PatchError(f'Unsafe file path in diff header: {path!r}')
+    return '/'.join(parts)
+
+def parse_patch(text):
+    """
+    [{'old_path', 'new_path', 'hunks': [{'old_start', 'lines': [(tag, text)]}]}]
+    where tag is ' ', '-' or '+'. A path is None for /dev/null (file created or deleted).
+    """
+    patches = []
+    current = hunk = None
+    lines = [line for line in (text or '').splitlines() if not _FENCE_RE.match(line)]
+    for index, line in enumerate(lines):
+        if line.startswith('--- ') and index + 1 < len(lines) and lines[index + 1].startswith('+++ '):
+            current = {'old_path': _path(line[4:]), 'new_path': None, 'hunks': []}
+            patches.append(current)
+            hunk = None
+        elif line.startswith('+++ ') and current is not None and not current['hunks'] and current['new_path'] is None:
+            current['new_path'] = _path(line[4:])
+        elif line.startswith('@@'):
+            match = _HUNK_RE.match(line)
+            if current is None or not match:
+                raise PatchError(f'Malformed hunk header: {line!r}')
+            hunk = {'old_start': int(match.group(1)), 'lines': []}
+            current['hunks'].append(hunk)
+        elif hunk is not None and line[:1] in (' ', '-', '+'):
+            hunk['lines'].append((line[0], line[1:]))
+        elif hunk is not None and line == '':
+            # Editors and models often strip the leading space of blank context lines
+            hunk['lines'].append((' ', ''))
+        elif hunk is not None and line.startswith('\\'):
+            continue
+        else:
+            hunk = None
+    for patch in patches:
+        for h in patch['hunks']:
+            while h['lines'] and h['lines'][-1] == (' ', ''):
+                h['lines'].pop()
+    if not patches:
+        raise PatchError('No file headers (---/+++) found in the diff.')
+    return patches
+
+def _find_block(lines, block, start, normalize):
+    """Index where `block` occurs in `lines`, the occurrence closest to `start` first, or None."""
+    if not block:
+        return min(max(start, 0), len(lines))
+    wanted = [normalize(line) for line in block]
+    candidates = range(0, len(lines) - len(block) + 1)
+    for index in sorted(candidates, key=lambda i: abs(i - start)):
+        if [normalize(line) for line in lines[index:index + len(block)]] == wanted:
+            return index
+    return None
+
+def _split(content):
+    newline = '\r\n' if '\r\n' in content else '\n'
+    return content.splitlines(), newline, content.endswith(('\n', '\r'))
+
+def _apply_hunks(path, content, hunks, problems):
+    lines, newline, trailing = _split(content)
+    applied = []
+    offset = 0
+    for number, hunk in enumerate(hunks, 1):
+        old = [text for tag, text in hunk['lines'] if tag != '+']
+        new = [text for tag, text in hunk['lines'] if tag != '-']
+        start = hunk['old_start'] - 1 + offset
+        index = _find_block(lines, old, start, lambda line: line)
+        if index is None:
+            index = _find_block(lines, old, start, str.rstrip)
+        if index is None:
+            problems.append(f"{path}: hunk {number} (@@ -{hunk['old_start']}) does not match the file; "
+                            f"its context/removed lines were not found:\n" + '\n'.join(old[:8]))
+            continue
+        lines[index:index + len(old)] = new
+        offset = index - (hunk['old_start'] - 1) + len(new) - len(old)
+        applied.append({
+            'line': index + 1,
+            'anchor': next((text for tag, text in hunk['lines'] if tag == ' ' and text.strip()), None),
+            'removed': [text for tag, text in hunk['lines'] if tag == '-'],
+            'added': [text for tag, text in hunk['lines'] if tag == '+']
+        })
+    return newline.join(lines) + (newline if trailing or not content else ''), applied
+
+def apply_patch(files, text):
+    """
+    Apply a unified diff to `files` (path -> content).
+    Returns (new_files, changes): the full file set after the patch and, per
+    touched file, {'path', 'action': create|modify|delete, 'hunks': [...]}
+    with the line each hunk landed on. Raises PatchError listing every problem.
+    """
+    result = dict(files or {})
+    changes = []
+    problems = []
+    for patch in parse_patch(text):
+        old_path, new_path = patch['old_path'], patch['new_path']
+        if old_path is None and new_path is None:
+            problems.append('A file header names /dev/null on both sides.')
+        elif old_path is None:
+            if new_path in result and result[new_path].strip():
+                problems.append(f'{new_path}: the diff creates this file, but it already exists.')
+                continue
+            added = [text for hunk in patch['hunks'] for tag, text in hunk['lines'] if tag == '+']
+            result[new_path] = '\n'.join(added) + '\n'
+            changes.append({'path': new_path, 'action': 'create', 'hunks': []})
+        elif old_path not in result:
+            problems.append(f'{old_path}: the diff modifies a file that is not in the project.')
+        elif new_path is None:
+            del result[old_path]
+            changes.append({'path': old_path, 'action': 'delete', 'hunks': []})
+        else:
+            content, applied = _apply_hunks(old_path, result[old_path], patch['hunks'], problems)
+            if new_path != old_path:
+                del result[old_path]
+            result[new_path] = content
+            changes.append({'path': new_path, 'action': 'modify', 'hunks': applied})
+    if problems:
+        raise PatchError(problems)
+    return result, changes
@@ -0,0 +1,148 @@
+"""
+Readiness helpers imported by generated scripts.
+
+Replaces the fixed `wait_for_load_state('networkidle')` after every goto with
+waits that finish as soon as the page is usable: a locator becoming visible,
+or the DOM going quiet. Time-to-ready is recorded per origin in SQLite, so
+concurrent runs never lose each other's samples, and the learned p90 is used
+as the wait budget on later runs. Waits that ran out their budget are not
+recorded: they say nothing about how long the page takes to be ready.
+"""
+
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMINGS_PATH = os.environ.get('PW_READINESS_TIMINGS') or os.path.join(PROJECT_ROOT, 'instance', 'readiness_timings.db')
+MIN_BUDGET_MS = 2000
+MAX_BUDGET_MS = 30000
+DEFAULT_BUDGET_MS = 15000
+QUIET_WINDOW_MS = 150
+MAX_SAMPLES = 20
+
+READINESS_PROMPT_GUIDE = """Page readiness rules:
+- Import the helpers with `from utils.readiness import goto_ready, wait_for_ready`.
+- Never call page.wait_for_load_state('networkidle') or time.sleep().
+- Navigate with `goto_ready(page, url, ready=<locator for an element the next step needs>)`.
+- After actions that change the page, call `wait_for_ready(page, ready=<locator>)`; omit `ready` only when no specific element signals readiness."""
+
+_QUIESCENCE_JS = """([quietMs, timeoutMs]) => new Promise(resolve => {
+    const started = performance.now();
+    let timer = null;
+    const finish = () => { observer.disconnect(); resolve(performance.now() - started); };
+    const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(finish, quietMs); });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    timer = setTimeout(finish, quietMs);
+    setTimeout(finish, timeoutMs);
+})"""
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+def _connect():
+    os.makedirs(os.path.dirname(TIMINGS_PATH), exist_ok=True)
+    conn = sqlite3.connect(TIMINGS_PATH, timeout=5)
+    conn.execute("""CREATE TABLE IF NOT EXISTS timings (
+        origin TEXT NOT NULL,
+        elapsed_ms INTEGER NOT NULL,
+        recorded_at REAL NOT NULL
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS timings_origin ON timings (origin)")
+    return conn
+
+def _samples(origin):
+    if not os.path.exists(TIMINGS_PATH):
+        return []
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute("SELECT elapsed_ms FROM timings WHERE origin = ? ORDER BY rowid DESC LIMIT ?",
+                                (origin, MAX_SAMPLES)).fetchall()
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error):
+        return []
+    return [row[0] for row in rows]
+
+def record_timing(origin, elapsed_ms):
+    """Remember how long `origin` took to become ready, keeping its last MAX_SAMPLES samples. Never raises."""
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("INSERT INTO timings (origin, elapsed_ms, recorded_at) VALUES (?, ?, ?)",
+                             (origin, round(elapsed_ms), time.time()))
+                conn.execute("DELETE FROM timings WHERE origin = ? AND rowid NOT IN "
+                             "(SELECT rowid FROM timings WHERE origin = ? ORDER BY rowid DESC LIMIT ?)",
+                             (origin, origin, MAX_SAMPLES))
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error):
+        pass
+
+def learned_budget_ms(origin):
+    """Wait budget for an origin: twice its p90 time-to-ready, within sane bounds."""
+    samples = sorted(_samples(origin))
+    if len(samples) < 3:
+        return DEFAULT_BUDGET_MS
+    p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+    return max(MIN_BUDGET_MS, min(MAX_BUDGET_MS, p90 * 2))
+
+def wait_for_dom_quiescence(page, quiet_ms=QUIET_WINDOW_MS, timeout_ms=DEFAULT_BUDGET_MS):
+    """Resolve once no DOM mutation has happened for `quiet_ms`. Returns the elapsed ms."""
+    return page.evaluate(_QUIESCENCE_JS, [quiet_ms, timeout_ms])
+
+def wait_for_ready(page, ready=None, timeout_ms=None):
+    """
+    Wait until the current page is usable.
+    `ready` may be a Locator or a selector string; without it the DOM must go quiet.
+    """
+    origin = _origin(page.url)
+    budget = timeout_ms or learned_budget_ms(origin)
+    started = time.time()
+
+    if ready is not None:
+        locator = page.locator(ready) if isinstance(ready, str) else ready
+        locator.first.wait_for(state='visible', timeout=budget)
+    else:
+        wait_for_dom_quiescence(page, timeout_ms=budget)
+
+    elapsed_ms = (time.time() - started) * 1000
+    # A locator wait that runs out raises; a quiescence wait that does returns at the budget
+    if elapsed_ms < budget:
+        record_timing(origin, elapsed_ms)
+    return elapsed_ms
+
+def goto_ready(page, url, ready=None, timeout_ms=None):
+    """Navigate without waiting for network idle, then wait for readiness. Returns seconds taken."""
+    started = time.time()
+    page.goto(url, wait_until='domcontentloaded')
+    wait_for_ready(page, ready=ready, timeout_ms=timeout_ms)
+    return time.time() - started
+
+async def wait_for_ready_async(page, ready=None, timeout_ms=None):
+    """Async-API counterpart of wait_for_ready."""
+    origin = _origin(page.url)
+    budget = timeout_ms or learned_budget_ms(origin)
+    started = time.time()
+
+    if ready is not None:
+        locator = page.locator(ready) if isinstance(ready, str) else ready
+        await locator.first.wait_for(state='visible', timeout=budget)
+    else:
+        await page.evaluate(_QUIESCENCE_JS, [QUIET_WINDOW_MS, budget])
+
+    elapsed_ms = (time.time() - started) * 1000
+    if elapsed_ms < budget:
+        record_timing(origin, elapsed_ms)
+    return elapsed_ms
+
+async def goto_ready_async(page, url, ready=None, timeout_ms=None):
+    """Async-API counterpart of goto_ready. Returns seconds taken."""
+    started = time.time()
+    await page.goto(url, wait_until='domcontentloaded')
+    await wait_for_ready_async(page, ready=ready, timeout_ms=timeout_ms)
+    return time.time() - started
@@ -0,0 +1,400 @@
+"""
+Resource-limited execution of generated scripts.
+
+Each script runs in its own process group with per-process rlimits (CPU time,
+open files, no core dumps), applied by a small exec wrapper so nothing runs
+between fork and exec in the (multi-threaded) worker. When SANDBOX_CGROUP_ROOT points at a delegated cgroup v2
+directory, every run also gets its own cgroup with hard memory and process
+caps. Either way a watchdog samples the whole process tree - including the
+browsers Playwright starts in their own process groups - enforces the
+tree-wide limits, and kills every process the run started once it exits,
+times out or goes over a limit.
+
+The watchdog follows the tree through /proc/<pid>/task/*/children instead of
+scanning all of /proc. Memory is the cgroup's memory.current when there is
+one; otherwise the tree's summed RSS, re-checked as PSS before killing, since
+RSS counts the pages a browser's processes share once per process.
+"""
+
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+CGROUP_ROOT = os.environ.get('SANDBOX_CGROUP_ROOT')
+MEMORY_MB = int(os.environ.get('SANDBOX_MEMORY_MB') or 2048)
+CPU_SECONDS = int(os.environ.get('SANDBOX_CPU_SECONDS') or 600)
+MAX_PROCESSES = int(os.environ.get('SANDBOX_MAX_PROCESSES') or 256)
+MAX_OPEN_FILES = int(os.environ.get('SANDBOX_MAX_OPEN_FILES') or 1024)
+POLL_INTERVAL = float(os.environ.get('SANDBOX_POLL_INTERVAL') or 1.0)
+STOP_CHECK_INTERVAL = 1.0
+TAIL_LINES = 400
+LOG_NAME = 'output.log'
+RUN_TOKEN_ENV = 'PW_SANDBOX_RUN'
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+# Needs CONFIG_PROC_CHILDREN; without it the watchdog scans all of /proc
+_HAS_CHILDREN = os.path.exists(f'/proc/self/task/{os.getpid()}/children')
+
+def default_limits():
+    """Limits from the environment."""
+    return {
+        'memory_mb': MEMORY_MB,
+        'cpu_seconds': CPU_SECONDS,
+        'max_processes': MAX_PROCESSES,
+        'max_open_files': MAX_OPEN_FILES
+    }
+
+def _stat(pid):
+    # ppid, start time, cumulative CPU seconds and RSS bytes, from /proc/<pid>/stat
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read().decode('utf-8', 'replace')
+    except OSError:
+        return None
+    fields = data[data.rfind(')') + 2:].split()
+    return {
+        'ppid': int(fields[1]),
+        'start': int(fields[19]),
+        'cpu': (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS,
+        'rss': int(fields[21]) * _PAGE_SIZE
+    }
+
+def _proc_table():
+    # pid -> _stat() of every process
+    table = {}
+    for name in os.listdir('/proc'):
+        if name.isdigit():
+            info = _stat(name)
+            if info is not None:
+                table[int(name)] = info
+    return table
+
+def _children(pid):
+    children = []
+    try:
+        tids = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return children
+    for tid in tids:
+        try:
+            with open(f'/proc/{pid}/task/{tid}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return children
+
+def _tree_table(roots):
+    """
+    pid -> _stat() of every live process descending from `roots` (pid -> expected
+    start time), reading only the tree's own /proc entries. Recycled root pids are skipped.
+    """
+    if not _HAS_CHILDREN:
+        table = _proc_table()
+        live = {pid for pid, start in roots.items() if pid in table and table[pid]['start'] == start}
+        return {pid: table[pid] for pid in _tree(live, table)}
+    table, stack = {}, list(roots)
+    while stack:
+        pid = stack.pop()
+        if pid in table:
+            continue
+        info = _stat(pid)
+        if info is None or roots.get(pid, info['start']) != info['start']:
+            continue
+        table[pid] = info
+        stack.extend(_children(pid))
+    return table
+
+def _pss(pid):
+    # Proportional set size: shared pages split between the processes mapping them
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def _tree(roots, table):
+    """Every live process in `table` descending from one of `roots`."""
+    children = {}
+    for pid, info in table.items():
+        children.setdefault(info['ppid'], []).append(pid)
+    found, stack = set(), [pid for pid in roots if pid in table]
+    while stack:
+        pid = stack.pop()
+        if pid not in found:
+            found.add(pid)
+            stack.extend(children.get(pid, []))
+    return found
+
+def _tagged(token, table):
+    """Processes whose environment carries the run's token, wherever they were reparented."""
+    marker = f'{RUN_TOKEN_ENV}={token}'.encode()
+    found = set()
+    for pid in table:
+        try:
+            with open(f'/proc/{pid}/environ', 'rb') as f:
+                if marker in f.read().split(b'\0'):
+                    found.add(pid)
+        except OSError:
+            continue
+    return found
+
+def _open_files(pid):
+    try:
+        return len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        return 0
+
+def _cgroup_create(limits):
+    if not CGROUP_ROOT:
+        return None
+    path = os.path.join(CGROUP_ROOT, f'pwrun-{uuid.uuid4().hex[:12]}')
+    try:
+        os.mkdir(path)
+    except OSError:
+        return None
+    _cgroup_write(path, 'memory.max', limits['memory_mb'] * 1024 * 1024)
+    _cgroup_write(path, 'memory.swap.max', 0)
+    _cgroup_write(path, 'pids.max', limits['max_processes'])
+    return path
+
+def _cgroup_write(path, name, value):
+    try:
+        with open(os.path.join(path, name), 'w') as f:
+            f.write(str(value))
+    except OSError:
+        pass
+
+def _cgroup_read(path, name):
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+def _cgroup_usage(path):
+    usage = {}
+    peak = _cgroup_read(path, 'memory.peak').strip()
+    if peak.isdigit():
+        usage['peak_memory_mb'] = round(int(peak) / (1024 * 1024), 1)
+    for line in _cgroup_read(path, 'cpu.stat').splitlines():
+        key, _, value = line.partition(' ')
+        if key == 'usage_usec' and value.isdigit():
+            usage['cpu_seconds'] = round(int(value) / 1e6, 2)
+    for line in _cgroup_read(path, 'memory.events').splitlines():
+        key, _, value = line.partition(' ')
+        if key == 'oom_kill' and value.strip().isdigit() and int(value) > 0:
+            usage['oom_killed'] = True
+    return usage
+
+def _cgroup_remove(path):
+    _cgroup_write(path, 'cgroup.kill', 1)
+    for _ in range(20):
+        try:
+            os.rmdir(path)
+            return
+        except OSError:
+            time.sleep(0.05)
+
+def _exec_limited(argv):
+    """
+    Exec wrapper: `python sandbox.py <limits json> <cgroup path or ""> <cmd...>`.
+    Joins the run's cgroup and sets the rlimits in its own process, then execs the
+    command, so the limits hold from the command's first instruction.
+    """
+    limits, cgroup_path, cmd = json.loads(argv[0]), argv[1], argv[2:]
+    if cgroup_path:
+        _cgroup_write(cgroup_path, 'cgroup.procs', os.getpid())
+    cpu = limits['cpu_seconds']
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 5))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limits['max_open_files'], limits['max_open_files']))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    os.execvp(cmd[0], cmd)
+
+def _limited_command(cmd, limits, cgroup_path):
+    return [sys.executable, os.path.abspath(__file__), json.dumps(limits), cgroup_path or ''] + list(cmd)
+
+def kill_tree(known, token=None):
+    """
+    SIGKILL every process in `known` (pid -> start time), everything they
+    started and everything tagged with the run's `token`. Start times and the
+    token find browsers that were reparented after their parent died, while
+    recycled pids are left alone.
+    """
+    known = dict(known)
+    for _ in range(5):
+        table = _proc_table()
+        live = {pid for pid, start in known.items() if pid in table and table[pid]['start'] == start}
+        if token:
+            live |= _tagged(token, table)
+        targets = _tree(live, table) - {os.getpid()}
+        if not targets:
+            return
+        for pid in targets:
+            known.setdefault(pid, table[pid]['start'])
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        time.sleep(0.05)
+
+def _pump(pipe, stream, log, log_lock, tail, on_line):
+    # Streams one pipe line by line: full output to the log file, the last lines to `tail`
+    for raw in iter(pipe.readline, b''):
+        line = raw.decode('utf-8', 'replace')
+        with log_lock:
+            log.write(line if stream == 'stdout' else f'[stderr] {line}')
+        keep = True
+        if on_line[0]:
+            try:
+                keep = on_line[0](stream, line) is not False
+            except Exception:
+                # A broken consumer (e.g. Redis down) must not stall the script
+                on_line[0] = None
+        if keep:
+            tail.append(line)
+    pipe.close()
+
+def run_sandboxed(cmd, cwd, env, timeout, limits=None, on_line=None, tail_lines=TAIL_LINES, should_stop=None):
+    """
+    Run `cmd` under the sandbox limits and return a dict with returncode,
+    stdout, stderr, timed_out, termination (why the run was killed, if it was)
+    and resource_usage.
+
+    Output is streamed rather than buffered: every line goes to `on_line(stream, line)`
+    and to <cwd>/output.log, and only the last `tail_lines` lines of each stream are returned;
+    a line for which `on_line` returns False is left out of the returned tail.
+    `should_stop()` is polled about once a second; when it returns True the run is killed.
+    """
+    limits = dict(default_limits(), **(limits or {}))
+    cgroup_path = _cgroup_create(limits)
+    tails = {'stdout': deque(maxlen=tail_lines), 'stderr': deque(maxlen=tail_lines)}
+    callback = [on_line]
+    log_lock = threading.Lock()
+
+    token = uuid.uuid4().hex
+    env = dict(env, **{RUN_TOKEN_ENV: token})
+    started = time.time()
+    known = {}
+    peak = {'rss': 0, 'processes': 0, 'open_files': 0}
+    cpu_by_pid = {}
+    termination = None
+    timed_out = False
+    last_stop_check = 0
+
+    with open(os.path.join(cwd, LOG_NAME), 'w', encoding='utf-8') as log:
+        proc = subprocess.Popen(_limited_command(cmd, limits, cgroup_path), cwd=cwd, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                process_group=0)
+        pumps = [
+            threading.Thread(target=_pump, args=(pipe, stream, log, log_lock, tails[stream], callback), daemon=True)
+            for stream, pipe in (('stdout', proc.stdout), ('stderr', proc.stderr))
+        ]
+        for pump in pumps:
+            pump.start()
+        root = _stat(proc.pid)
+        if root:
+            known[proc.pid] = root['start']
+        memory_limit = limits['memory_mb'] * 1024 * 1024
+        try:
+            while proc.poll() is None:
+                table = _tree_table(known)
+                tree = set(table)
+                for pid in tree:
+                    known.setdefault(pid, table[pid]['start'])
+                    cpu_by_pid[(pid, known[pid])] = table[pid]['cpu']
+
+                current = _cgroup_read(cgroup_path, 'memory.current').strip() if cgroup_path else ''
+                if current.isdigit():
+                    memory = int(current)
+                else:
+                    memory = sum(table[pid]['rss'] for pid in tree)
+                    if memory > memory_limit:
+                        memory = sum(_pss(pid) or table[pid]['rss'] for pid in tree)
+                open_files = sum(_open_files(pid) for pid in tree)
+                peak['rss'] = max(peak['rss'], memory)
+                peak['processes'] = max(peak['processes'], len(tree))
+                peak['open_files'] = max(peak['open_files'], open_files)
+
+                if time.time() - started > timeout:
+                    timed_out = True
+                    termination = f'Execution timed out after {timeout}s.'
+                elif memory > memory_limit:
+                    termination = f"Execution killed: memory use exceeded {limits['memory_mb']} MB."
+                elif sum(cpu_by_pid.values()) > limits['cpu_seconds']:
+                    termination = f"Execution killed: CPU time exceeded {limits['cpu_seconds']}s."
+                elif len(tree) > limits['max_processes']:
+                    termination = f"Execution killed: more than {limits['max_processes']} processes."
+                elif should_stop and time.time() - last_stop_check >= STOP_CHECK_INTERVAL:
+                    last_stop_check = time.time()
+                    if should_stop():
+                        termination = 'Execution cancelled.'
+                if termination:
+                    break
+                try:
+                    # Returns as soon as the script exits
+                    proc.wait(timeout=POLL_INTERVAL)
+                except subprocess.TimeoutExpired:
+                    pass
+        finally:
+            # Also reaps browsers a script leaked after exiting
+            kill_tree(known, token)
+            proc.wait()
+            for pump in pumps:
+                pump.join(timeout=5)
+
+    usage = {
+        'enforcement': 'cgroup' if cgroup_path else 'rlimit',
+        'wall_seconds': round(time.time() - started, 2),
+        'cpu_seconds': round(sum(cpu_by_pid.values()), 2),
+        'peak_memory_mb': round(peak['rss'] / (1024 * 1024), 1),
+        'peak_processes': peak['processes'],
+        'peak_open_files': peak['open_files'],
+        'limits': limits
+    }
+    if cgroup_path:
+        usage.update(_cgroup_usage(cgroup_path))
+        _cgroup_remove(cgroup_path)
+        if usage.pop('oom_killed', False) and not termination:
+            termination = f"Execution killed: memory use exceeded {limits['memory_mb']} MB."
+    if termination is None and proc.returncode in (-signal.SIGXCPU, -signal.SIGKILL) and usage['cpu_seconds'] >= limits['cpu_seconds']:
+        termination = f"Execution killed: CPU time exceeded {limits['cpu_seconds']}s."
+    usage['termination'] = termination
+
+    return {
+        'returncode': -1 if timed_out else proc.returncode,
+        'stdout': ''.join(tails['stdout']),
+        'stderr': ''.join(tails['stderr']),
+        'timed_out': timed_out,
+        'termination': termination,
+        'resource_usage': usage
+    }
+
+def combine_usage(usages):
+    """Resource usage of several runs (e.g. shard phases) as one report."""
+    usages = [u for u in usages if u]
+    if not usages:
+        return None
+    return {
+        'enforcement': usages[0]['enforcement'],
+        'wall_seconds': round(sum(u['wall_seconds'] for u in usages), 2),
+        'cpu_seconds': round(sum(u['cpu_seconds'] for u in usages), 2),
+        'peak_memory_mb': max(u['peak_memory_mb'] for u in usages),
+        'peak_processes': max(u['peak_processes'] for u in usages),
+        'peak_open_files': max(u['peak_open_files'] for u in usages),
+        'limits': usages[0]['limits'],
+        'termination': next((u['termination'] for u in usages if u['termination']), None)
+    }
+
+if __name__ == '__main__':
+    _exec_limited(sys.argv[1:])
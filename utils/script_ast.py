@@ -0,0 +1,18 @@
+"""
+Thread-safe parsing of generated scripts.
+
+On CPython 3.11 ast.parse() is not safe to call from several threads at once:
+concurrent parses can fail with "SystemError: AST constructor recursion depth
+mismatch". Speculative candidates, matrix browsers and suite items inspect
+their scripts on worker threads, so every parse goes through one lock.
+"""
+
+import ast
+import threading
+
+_lock = threading.Lock()
+
+def parse_script(script):
+    """ast.parse() under the module lock; raises SyntaxError like ast.parse()."""
+    with _lock:
+        return ast.parse(script)
@@ -0,0 +1,291 @@
+"""
+Entry point the script runner uses to execute generated Playwright scripts.
+Installs executor-owned hooks into the Playwright API, then runs the script as __main__.
+
+Usage: python -m utils.script_bootstrap <script_path>
+Options are passed as JSON in the PW_RUNNER_OPTIONS environment variable.
+"""
+
+import json
+import os
+import runpy
+import sys
+
+ENGINES = ('chromium', 'firefox', 'webkit')
+METRICS_MARKER = 'RUNNER_METRICS_JSON'
+STEP_MARKER = 'STEP_EVENT'
+PAGE_STEPS = ('goto', 'reload', 'go_back', 'go_forward')
+LOCATOR_STEPS = ('click', 'dblclick', 'fill', 'press', 'check', 'uncheck', 'select_option', 'hover', 'set_input_files')
+
+# Callables run on every browser context the script creates
+_context_hooks = []
+# Applied to the kwargs of every new_context() call
+_context_defaults = []
+# Executor-side metrics, printed for the runner after the script finishes
+runner_metrics = {}
+
+def _force_engine(engine):
+    """Make p.chromium / p.firefox / p.webkit all resolve to `engine`."""
+    from playwright.sync_api._generated import Playwright
+
+    target = getattr(Playwright, engine)
+    for name in ENGINES:
+        setattr(Playwright, name, target)
+
+def _patch_contexts():
+    """Route Browser.new_context/new_page through the registered context defaults and hooks."""
+    from playwright.sync_api._generated import Browser
+
+    original_new_context = Browser.new_context
+
+    def new_context(self, **kwargs):
+        for apply_defaults in _context_defaults:
+            kwargs = apply_defaults(kwargs)
+        context = original_new_context(self, **kwargs)
+        for hook in _context_hooks:
+            hook(context)
+        return context
+
+    def new_page(self, **kwargs):
+        # Open the page in a hooked context; it is closed along with the browser
+        return self.new_context(**kwargs).new_page()
+
+    Browser.new_context = new_context
+    Browser.new_page = new_page
+
+def _apply_launch_policy():
+    """Force the executor's launch policy onto every browser the script launches."""
+    from playwright.sync_api._generated import BrowserType
+    from utils.launch_policy import launch_options, context_options
+
+    original_launch = BrowserType.launch
+    original_launch_persistent_context = BrowserType.launch_persistent_context
+
+    def launch(self, **kwargs):
+        return original_launch(self, **launch_options(self.name, kwargs))
+
+    def launch_persistent_context(self, user_data_dir, **kwargs):
+        kwargs = context_options(launch_options(self.name, kwargs))
+        return original_launch_persistent_context(self, user_data_dir, **kwargs)
+
+    BrowserType.launch = launch
+    BrowserType.launch_persistent_context = launch_persistent_context
+    _context_defaults.append(context_options)
+
+def _connect_remote(ws_endpoint, launch_policy):
+    """Serve every browser launch from a browser farm node (see utils.browser_farm) instead of a local browser."""
+    from playwright.sync_api._generated import BrowserType
+    from utils.launch_policy import launch_options, connect_options
+
+    def launch(self, **kwargs):
+        options = launch_options(self.name, kwargs) if launch_policy else kwargs
+        return self.connect(ws_endpoint, **connect_options(options))
+
+    BrowserType.launch = launch
+
+def emit_step(event):
+    """Print a structured step event; the runner streams these to live log subscribers."""
+    print(f'{STEP_MARKER} {json.dumps(event)}', flush=True)
+
+def _install_step_events():
+    """Emit a step event for every navigation and locator action the script performs."""
+    import time
+    from playwright.sync_api._generated import Page, Locator
+
+    def wrap(cls, name, target):
+        original = getattr(cls, name)
+
+        def step(self, *args, **kwargs):
+            started = time.time()
+            status = 'ok'
+            try:
+                return original(self, *args, **kwargs)
+            except Exception:
+                status = 'error'
+                raise
+            finally:
+                emit_step({'action': name, 'target': target(self, args, kwargs), 'status': status,
+                           'duration_ms': round((time.time() - started) * 1000)})
+        setattr(cls, name, step)
+
+    def page_target(page, args, kwargs):
+        return kwargs.get('url') or (args[0] if args else page.url)
+
+    def locator_target(locator, args, kwargs):
+        return getattr(locator._impl_obj, '_selector', repr(locator))
+
+    for name in PAGE_STEPS:
+        wrap(Page, name, page_target)
+    for name in LOCATOR_STEPS:
+        wrap(Locator, name, locator_target)
+
+def _script_failed():
+    """Whether the running script has failed so far, judged by its stats or an exception in flight."""
+    if sys.exc_info()[0] is not None:
+        return True
+    main_module = sys.modules.get('__main__')
+    # Scripts keep their own stats dict or use the pwstats runtime's
+    stats = getattr(main_module, 'stats', None) or getattr(sys.modules.get('pwstats'), 'stats', None)
+    if isinstance(stats, dict):
+        return bool(stats.get('assertions_failed') or stats.get('errors'))
+    return False
+
+def _install_failure_artifacts():
+    """Trace every context; keep the trace and page screenshots only if the script failed."""
+    from playwright.sync_api._generated import Browser, BrowserContext
+
+    finished = set()
+    counter = iter(range(1, 1000))
+
+    def finish(context):
+        if id(context) in finished:
+            return
+        finished.add(id(context))
+        try:
+            if _script_failed():
+                n = next(counter)
+                for i, page in enumerate(context.pages, 1):
+                    page.screenshot(path=f'failure-context{n}-page{i}.png', full_page=True)
+                context.tracing.stop(path=f'trace-context{n}.zip')
+                runner_metrics['artifacts_captured'] = True
+            else:
+                context.tracing.stop()
+        except Exception as e:
+            print(f'Could not capture failure artifacts: {e}', file=sys.stderr)
+
+    original_browser_close = Browser.close
+    original_context_close = BrowserContext.close
+
+    def browser_close(self, **kwargs):
+        for context in self.contexts:
+            finish(context)
+        return original_browser_close(self, **kwargs)
+
+    def context_close(self, **kwargs):
+        finish(self)
+        return original_context_close(self, **kwargs)
+
+    Browser.close = browser_close
+    BrowserContext.close = context_close
+    _context_hooks.append(lambda context: context.tracing.start(screenshots=True, snapshots=True))
+
+def _install_storage_state(load_path, save_path):
+    """Start every context from the cached session and save the session of the first context a passing script closes."""
+    from playwright.sync_api._generated import Browser, BrowserContext
+
+    def apply_defaults(kwargs):
+        if load_path and 'storage_state' not in kwargs:
+            kwargs = dict(kwargs, storage_state=load_path)
+        return kwargs
+
+    def save(context):
+        if os.path.exists(save_path) or _script_failed():
+            return
+        try:
+            context.storage_state(path=save_path)
+        except Exception as e:
+            print(f'Could not save the storage state: {e}', file=sys.stderr)
+
+    original_browser_close = Browser.close
+    original_context_close = BrowserContext.close
+
+    def browser_close(self, **kwargs):
+        for context in self.contexts:
+            save(context)
+        return original_browser_close(self, **kwargs)
+
+    def context_close(self, **kwargs):
+        save(self)
+        return original_context_close(self, **kwargs)
+
+    Browser.close = browser_close
+    BrowserContext.close = context_close
+    _context_defaults.append(apply_defaults)
+
+def _install_session_check(origin, login_url):
+    """Flag a run whose cached session the site rejects: a 401 from the origin or a landing on its login page."""
+    from utils.storage_state_cache import is_login_page
+
+    def rejected(reason):
+        runner_metrics.setdefault('session_expired', reason)
+
+    def on_response(response):
+        if response.status == 401 and response.url.startswith(origin):
+            rejected(f'401 from {response.url}')
+
+    def on_navigated(frame):
+        if frame.parent_frame is None and frame.url.startswith(origin) and is_login_page(frame.url, login_url):
+            rejected(f'landed on the login page {frame.url}')
+
+    def watch(context):
+        context.on('response', on_response)
+        context.on('page', lambda page: page.on('framenavigated', on_navigated))
+
+    _context_hooks.append(watch)
+
+def install(options):
+    """Install the hooks described by `options` before the script runs."""
+    engine = options.get('engine')
+    if engine:
+        if engine not in ENGINES:
+            raise ValueError(f'Unsupported browser engine: {engine}')
+        _force_engine(engine)
+
+    if options.get('launch_policy'):
+        _apply_launch_policy()
+
+    if options.get('connect'):
+        _connect_remote(options['connect'], options.get('launch_policy'))
+
+    network = options.get('network')
+    if network:
+        from utils.network_rules import install_network_rules
+        counters = runner_metrics.setdefault('network', {})
+        _context_hooks.append(lambda context: install_network_rules(context, network, counters))
+
+    if options.get('artifacts'):
+        _install_failure_artifacts()
+
+    storage_state = options.get('storage_state')
+    if storage_state:
+        _install_storage_state(storage_state.get('load'), storage_state['save'])
+
+    session_check = options.get('session_check')
+    if session_check:
+        _install_session_check(session_check['origin'], session_check.get('login_url'))
+
+    if options.get('step_events'):
+        _install_step_events()
+
+    if _context_hooks or _context_defaults:
+        _patch_contexts()
+
+def _print_metrics():
+    if runner_metrics:
+        print(f'{METRICS_MARKER} {json.dumps(runner_metrics)}', flush=True)
+
+def main(argv):
+    if len(argv) < 2:
+        print('Usage: python -m utils.script_bootstrap <script_path>', file=sys.stderr)
+        return 2
+
+    options = json.loads(os.environ.get('PW_RUNNER_OPTIONS') or '{}')
+    install(options)
+
+    script_path = argv[1]
+    sys.argv = argv[1:]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+
+    try:
+        shard = options.get('shard')
+        if shard:
+            from utils.sharding import run_shard_phase
+            return run_shard_phase(script_path, shard['phase'], shard['state_path'], options.get('engine') or 'chromium')
+
+        runpy.run_path(script_path, run_name='__main__')
+        return 0
+    finally:
+        _print_metrics()
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
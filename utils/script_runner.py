@@ -0,0 +1,200 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from utils.network_rules import default_rules
+from utils import artifacts, storage_state_cache
+from utils.browser_farm import lease_for_run, release
+from utils.sandbox import run_sandboxed
+from utils.script_bootstrap import STEP_MARKER
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TIMEOUT = 300
+STATS_START = 'STATS_JSON_START'
+STATS_END = 'STATS_JSON_END'
+METRICS_MARKER = 'RUNNER_METRICS_JSON'
+
+# The pwstats runtime replaces the stats boilerplate scripts used to generate themselves
+STATS_PROMPT_GUIDE = """Stats rules:
+- Do not define a stats dict, track_assertion/track_action_time helpers or print STATS_JSON markers; they are provided.
+- `from pwstats import track_assertion, track_action_time, step` and wrap assertions as `track_assertion(expect(locator).to_be_visible)` and actions as `track_action_time(locator.click)`.
+- Call `step("<step name>")` after each completed test step. Page load times are recorded automatically."""
+
+def parse_stats(stdout):
+    """Extract the stats dict printed between the STATS_JSON markers, if any."""
+    start = stdout.rfind(STATS_START)
+    end = stdout.rfind(STATS_END)
+    if start == -1 or end == -1 or end < start:
+        return None
+    try:
+        return json.loads(stdout[start + len(STATS_START):end])
+    except ValueError:
+        return None
+
+def parse_runner_metrics(stdout):
+    """Extract the metrics line the bootstrap prints after the script finishes."""
+    for line in reversed(stdout.splitlines()):
+        if line.startswith(METRICS_MARKER):
+            try:
+                return json.loads(line[len(METRICS_MARKER):])
+            except ValueError:
+                return {}
+    return {}
+
+def marker_collector(on_line=None):
+    """
+    Line callback that keeps only the last stats block and metrics line of a
+    run's stdout, passing every line on to `on_line`. Step events are kept out
+    of the output tail once forwarded. Returns (callback, captured).
+    """
+    captured = {'stats': [], 'metrics': [], 'in_stats': False}
+
+    def collect(stream, line):
+        if stream == 'stdout':
+            if line.startswith(STATS_START):
+                captured['stats'] = [line]
+                captured['in_stats'] = True
+            elif captured['in_stats']:
+                captured['stats'].append(line)
+                captured['in_stats'] = not line.startswith(STATS_END)
+            elif line.startswith(METRICS_MARKER):
+                captured['metrics'] = [line]
+        if on_line:
+            try:
+                on_line(stream, line)
+            except Exception:
+                pass
+        return not (stream == 'stdout' and line.startswith(STEP_MARKER))
+    return collect, captured
+
+def run_passed(run):
+    """A run passes when it exits cleanly and its stats report no failures."""
+    if run['returncode'] != 0 or run['timed_out'] or run.get('termination'):
+        return False
+    stats = run['stats'] or {}
+    return not stats.get('assertions_failed') and not stats.get('errors')
+
+def run_script(script, browser=None, timeout=DEFAULT_TIMEOUT, options=None, use_cache=True):
+    """
+    Execute a generated Playwright script in a subprocess through the bootstrap.
+    `browser` forces the engine regardless of what the script launches, so one
+    script can be run on every engine. Returns a dict describing the run.
+    """
+    requested = options
+    options = dict(options or {})
+    if browser:
+        options['engine'] = browser
+    options.setdefault('launch_policy', True)
+    options.setdefault('network', default_rules())
+    options.setdefault('artifacts', True)
+    artifact_run_id = options.pop('artifact_run_id', None) or artifacts.new_run_id()
+    artifact_prefix = options.pop('artifact_prefix', '')
+    log_channel = options.pop('log_channel', None)
+    cancel_key = options.pop('cancel_key', None)
+    options.setdefault('step_events', bool(log_channel))
+
+    run_dir = tempfile.mkdtemp(prefix='pwrun_')
+    script_path = os.path.join(run_dir, 'test_script.py')
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(script)
+
+    # Scripts that opt in start from the cached login session for their site (shard phases manage their own)
+    origin = account = login_url = cached_state = None
+    if storage_state_cache.ENABLED and not options.get('shard') and 'storage_state' not in options:
+        origin, account, login_url = storage_state_cache.script_identity(script) or (None, None, None)
+    if origin:
+        cached_state = storage_state_cache.load(origin, account) if use_cache else None
+        options['storage_state'] = {'load': None, 'save': os.path.join(run_dir, 'storage_state.json')}
+        if cached_state is not None:
+            options['storage_state']['load'] = os.path.join(run_dir, 'cached_storage_state.json')
+            with open(options['storage_state']['load'], 'w', encoding='utf-8') as f:
+                json.dump(cached_state, f)
+            options['session_check'] = {'origin': origin, 'login_url': login_url}
+
+    # With the browser farm enabled the script's browser runs on a farm node
+    lease = None if options.get('connect') else lease_for_run(browser, timeout)
+    if lease:
+        options['connect'] = lease['ws_endpoint']
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in [PROJECT_ROOT, env.get('PYTHONPATH')] if p)
+    env['PW_RUNNER_OPTIONS'] = json.dumps(options)
+
+    on_line = None
+    if log_channel:
+        from utils.log_stream import line_publisher
+        on_line = line_publisher(log_channel, browser)
+    collect, captured = marker_collector(on_line)
+    should_stop = None
+    if cancel_key:
+        from utils.cancellation import is_cancelled
+        should_stop = lambda: is_cancelled(cancel_key)
+
+    started = time.time()
+    try:
+        result = run_sandboxed([sys.executable, '-m', 'utils.script_bootstrap', script_path],
+                               cwd=run_dir, env=env, timeout=timeout, limits=options.get('limits'), on_line=collect,
+                               should_stop=should_stop)
+    finally:
+        release(lease)
+    # stdout/stderr are only the tails; the full output is in run_dir/output.log
+    stdout, stderr = result['stdout'], result['stderr']
+    stats = parse_stats(''.join(captured['stats']))
+    metrics = parse_runner_metrics(''.join(captured['metrics']))
+    if stats is not None:
+        if metrics:
+            stats['runner'] = metrics
+        stats['resource_usage'] = result['resource_usage']
+
+    run = {
+        'browser': browser,
+        'returncode': result['returncode'],
+        'timed_out': result['timed_out'],
+        'termination': result['termination'],
+        'stdout': stdout,
+        'stderr': stderr,
+        'stats': stats,
+        'resource_usage': result['resource_usage'],
+        'duration': round(time.time() - started, 2),
+        'artifact_run_id': None,
+        'farm_node': lease['node_id'] if lease else None
+    }
+    run['passed'] = run_passed(run)
+    if origin and stats is not None:
+        stats['storage_state_cache'] = 'hit' if cached_state is not None else 'miss'
+
+    try:
+        # Only failed runs keep their screenshots, traces and output
+        if not run['passed']:
+            if artifacts.collect_run(artifact_run_id, run_dir, prefix=artifact_prefix):
+                run['artifact_run_id'] = artifact_run_id
+        elif origin and cached_state is None and os.path.exists(options['storage_state']['save']):
+            storage_state_cache.save(origin, account, options['storage_state']['save'])
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    if (cached_state is not None and not run['passed'] and not run['timed_out'] and not run.get('termination')
+            and storage_state_cache.session_rejected(run)):
+        # The site no longer accepts the cached session; run once more without it
+        storage_state_cache.invalidate(origin, account)
+        return run_script(script, browser=browser, timeout=timeout, options=requested, use_cache=False)
+    return run
+
+def format_execution_result(run):
+    """Render a run in the [PASS]/[FAIL] format the graph branches on."""
+    if run['passed']:
+        text = '[PASS] Execution succeeded.'
+    elif run.get('termination'):
+        text = f"[FAIL] {run['termination']}"
+    else:
+        text = f"[FAIL] Execution failed (exit code {run['returncode']})."
+        errors = (run['stats'] or {}).get('errors') or []
+        if errors:
+            text += '\n\nErrors:\n' + '\n'.join(f'- {e}' for e in errors)
+    if run['stdout'].strip():
+        text += f"\n\nOutput:\n{run['stdout'].strip()}"
+    if not run['passed'] and run['stderr'].strip():
+        text += f"\n\nStderr:\n{run['stderr'].strip()}"
+    return text
@@ -0,0 +1,219 @@
+"""
+Step-level sharding for long multi-step scripts.
+
+A script opts in by defining `setup(page)` for the shared steps (e.g. login)
+and one or more `shard_<name>(page)` functions for independent later steps.
+Setup runs once and its storage_state is saved as a checkpoint; every shard
+then runs in its own subprocess and browser context started from that
+snapshot, and the per-shard stats are merged into one report. Setup
+checkpoints of scripts that opt in (see utils.storage_state_cache) are cached
+per origin and test account, so later runs skip setup entirely while the
+cached session is still valid.
+"""
+
+import ast
+import json
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import artifacts, storage_state_cache
+from utils.sandbox import combine_usage
+from utils.script_ast import parse_script
+
+SETUP_PHASE = 'setup'
+SHARD_PREFIX = 'shard_'
+DEFAULT_MAX_SHARDS = 4
+
+SHARDING_PROMPT_GUIDE = """Sharding rules (long multi-step tests only):
+- When shared steps (e.g. login) are followed by two or more flows that do not depend on each other, define `def setup(page):` for the shared steps and one `def shard_<name>(page):` per independent flow instead of one sequential script.
+- The executor launches the browser and passes `page`; setup runs once and every shard starts from its saved session in a fresh context, so a shard must not rely on another shard's actions.
+- Keep browser code inside these functions (no `sync_playwright()` block or launch_browser call); the stats and readiness rules still apply inside them.
+- When setup only signs in with a fixed test account, add module constants `BASE_URL = "<site url>"`, `TEST_ACCOUNT = "<username>"` and `STORED_SESSION = True` so later runs reuse the session and skip setup (add `LOGIN_URL = "<login page url>"` when its path does not contain login/signin). Never do this for failed-login or signed-out scenarios.
+- For a single linear flow, write a normal script instead."""
+
+def _empty_stats():
+    return {
+        'execution_time': 0.0,
+        'assertions_passed': 0,
+        'assertions_failed': 0,
+        'total_assertions': 0,
+        'step_coverage': [],
+        'performance': {'page_loads': [], 'action_times': []},
+        'accessibility_violations': 0,
+        'locator_retries': 0,
+        'locators': [],
+        'visited_urls': [],
+        'errors': []
+    }
+
+def shard_names(script):
+    """Names of the shard functions a script defines, in definition order."""
+    try:
+        tree = parse_script(script)
+    except SyntaxError:
+        return []
+    return [node.name for node in tree.body
+            if isinstance(node, ast.FunctionDef) and node.name.startswith(SHARD_PREFIX)]
+
+def is_shardable(script):
+    """True when the script defines setup(page) and at least one shard."""
+    try:
+        tree = parse_script(script)
+    except SyntaxError:
+        return False
+    functions = {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}
+    return SETUP_PHASE in functions and any(name.startswith(SHARD_PREFIX) for name in functions)
+
+def run_shard_phase(script_path, phase, state_path, engine='chromium'):
+    """
+    Run one phase of a sharded script inside the runner subprocess.
+    Called by the bootstrap; prints the phase's stats between the usual markers.
+    """
+    from playwright.sync_api import sync_playwright
+    import pwstats
+
+    module = runpy.run_path(script_path, run_name='__shard__')
+    stats = module.get('stats')
+    if not isinstance(stats, dict):
+        stats = pwstats.stats
+    # Expose the phase's stats where the bootstrap's failure-artifact hooks look for them
+    sys.modules['__main__'].stats = stats
+    # The phase's page is watched by pwstats whatever stats dict the script keeps
+    stats['visited_urls'] = pwstats.stats['visited_urls']
+
+    start = time.time()
+    with sync_playwright() as p:
+        browser = getattr(p, engine).launch()
+        try:
+            if phase == SETUP_PHASE:
+                context = browser.new_context()
+            else:
+                context = browser.new_context(storage_state=state_path)
+            page = pwstats.watch_page(context.new_page())
+            try:
+                module[phase](page)
+                if phase == SETUP_PHASE:
+                    context.storage_state(path=state_path)
+            except Exception as e:
+                stats.setdefault('errors', []).append(f"{phase} failed: {e}")
+        finally:
+            browser.close()
+    stats['execution_time'] = time.time() - start
+
+    print("STATS_JSON_START")
+    print(json.dumps(stats, indent=4))
+    print("STATS_JSON_END")
+    # The phase's stats are printed above; stop pwstats printing its own at exit
+    pwstats.mark_reported()
+    return 0
+
+def merge_shard_stats(setup_stats, shard_stats):
+    """
+    Merge setup and per-shard stats into one report.
+    Execution time is the critical path: setup plus the slowest shard.
+    """
+    merged = _empty_stats()
+    merged['shards'] = {}
+    phases = [(SETUP_PHASE, setup_stats)] + list(shard_stats.items())
+
+    for name, stats in phases:
+        stats = stats or {}
+        for key in ('assertions_passed', 'assertions_failed', 'total_assertions',
+                    'accessibility_violations', 'locator_retries'):
+            merged[key] += stats.get(key, 0) or 0
+        merged['step_coverage'].extend(stats.get('step_coverage', []))
+        merged['locators'].extend(stats.get('locators', []))
+        for url in stats.get('visited_urls', []):
+            if url not in merged['visited_urls']:
+                merged['visited_urls'].append(url)
+        performance = stats.get('performance') or {}
+        merged['performance']['page_loads'].extend(performance.get('page_loads', []))
+        merged['performance']['action_times'].extend(performance.get('action_times', []))
+        merged['errors'].extend(f"[{name}] {error}" for error in stats.get('errors', []))
+        merged['shards'][name] = {
+            'execution_time': stats.get('execution_time', 0.0),
+            'step_coverage': stats.get('step_coverage', []),
+            'passed': bool(stats) and not stats.get('assertions_failed') and not stats.get('errors')
+        }
+
+    shard_times = [(s or {}).get('execution_time', 0.0) for s in shard_stats.values()]
+    merged['execution_time'] = (setup_stats or {}).get('execution_time', 0.0) + max(shard_times, default=0.0)
+    return merged
+
+def _cached_setup_run(browser):
+    # Stand-in for the setup phase when a cached session is restored
+    stats = _empty_stats()
+    stats['step_coverage'].append('Restore cached session')
+    return {'browser': browser, 'returncode': 0, 'timed_out': False, 'termination': None,
+            'stdout': '[storage state restored from cache]', 'stderr': '', 'stats': stats,
+            'resource_usage': None, 'duration': 0.0, 'passed': True, 'artifact_run_id': None}
+
+def run_sharded(script, browser=None, timeout=None, max_workers=DEFAULT_MAX_SHARDS, options=None, use_cache=True):
+    """Run setup once (or restore it from cache), fan the shards out in parallel and merge the results."""
+    from utils.script_runner import run_script, run_passed, DEFAULT_TIMEOUT
+
+    timeout = timeout or DEFAULT_TIMEOUT
+    origin, account, login_url = storage_state_cache.script_identity(script) or (None, None, None)
+    cached_state = storage_state_cache.load(origin, account) if use_cache and origin else None
+
+    checkpoint_dir = tempfile.mkdtemp(prefix='pwshard_')
+    state_path = os.path.join(checkpoint_dir, 'storage_state.json')
+    started = time.time()
+    options = dict(options or {})
+    artifact_run_id = options.get('artifact_run_id') or artifacts.new_run_id()
+    prefix = options.get('artifact_prefix')
+
+    def run_phase(phase):
+        phase_options = dict(options, shard={'phase': phase, 'state_path': state_path},
+                             artifact_run_id=artifact_run_id, artifact_prefix=f'{prefix}-{phase}' if prefix else phase)
+        if cached_state is not None:
+            phase_options['session_check'] = {'origin': origin, 'login_url': login_url}
+        return run_script(script, browser=browser, timeout=timeout, options=phase_options)
+
+    try:
+        if cached_state is not None:
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump(cached_state, f)
+            setup_run = _cached_setup_run(browser)
+        else:
+            setup_run = run_phase(SETUP_PHASE)
+            if origin and setup_run['passed'] and os.path.exists(state_path):
+                storage_state_cache.save(origin, account, state_path)
+
+        shard_runs = {}
+        if setup_run['passed']:
+            names = shard_names(script)
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names)))) as pool:
+                shard_runs = dict(zip(names, pool.map(run_phase, names)))
+    finally:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    runs = [(SETUP_PHASE, setup_run)] + list(shard_runs.items())
+    run = {
+        'browser': browser,
+        'returncode': next((r['returncode'] for _, r in runs if r['returncode'] != 0), 0),
+        'timed_out': any(r['timed_out'] for _, r in runs),
+        'termination': next((f"[{name}] {r['termination']}" for name, r in runs if r.get('termination')), None),
+        'stdout': '\n'.join(f"--- {name} ---\n{r['stdout'].strip()}" for name, r in runs),
+        'stderr': '\n'.join(f"--- {name} ---\n{r['stderr'].strip()}" for name, r in runs if r['stderr'].strip()),
+        'stats': merge_shard_stats(setup_run['stats'], {name: r['stats'] for name, r in shard_runs.items()}),
+        'resource_usage': combine_usage([r.get('resource_usage') for _, r in runs]),
+        'duration': round(time.time() - started, 2),
+        'artifact_run_id': artifact_run_id if any(r.get('artifact_run_id') for _, r in runs) else None
+    }
+    if origin:
+        run['stats']['storage_state_cache'] = 'hit' if cached_state is not None else 'miss'
+    if run['resource_usage']:
+        run['stats']['resource_usage'] = run['resource_usage']
+    run['passed'] = run_passed(run) and all(r['passed'] for _, r in runs)
+
+    if cached_state is not None and not run['passed'] and any(storage_state_cache.session_rejected(r) for r in shard_runs.values()):
+        # The site no longer accepts the cached session; log in again once
+        storage_state_cache.invalidate(origin, account)
+        return run_sharded(script, browser=browser, timeout=timeout, max_workers=max_workers,
+                           options=options, use_cache=False)
+    return run
@@ -0,0 +1,61 @@
+import hashlib
+import uuid
+import redis
+from celery.states import READY_STATES
+from extensions import redis_client
+from utils.cancellation import attach_job, is_cancelled, register_job
+from utils import fair_queue
+
+# In-flight keys expire on their own in case a worker dies before releasing them
+SINGLE_FLIGHT_TTL = 900
+
+def single_flight_key(pipeline, browser, *parts):
+    """Build the coalescing key for a job from its pipeline, browser and inputs."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = ' '.join(part.split()).lower().encode('utf-8')
+        digest.update(part)
+        digest.update(b'\0')
+    return f'singleflight:{pipeline}:{browser}:{digest.hexdigest()}'
+
+def submit_single_flight(task, key, args, user=None):
+    """
+    Start `task` with `args` unless an identical job is already in flight.
+    With a `user` the job goes through that user's fair queue instead of straight to Celery.
+    Returns (task_id, attached) where attached is True when an existing task was reused.
+    """
+    while True:
+        task_id = redis_client.get(key)
+        if task_id:
+            if task.AsyncResult(task_id).state not in READY_STATES and not is_cancelled(task_id):
+                if user is not None:
+                    attach_job(task_id, user.id)
+                return task_id, True
+            # Stale entry left behind by a finished or cancelled job
+            redis_client.delete(key)
+            continue
+
+        task_id = str(uuid.uuid4())
+        if redis_client.set(key, task_id, nx=True, ex=SINGLE_FLIGHT_TTL):
+            if user is not None:
+                register_job(task_id, user.id)
+                fair_queue.enqueue(task, args, {'single_flight_key': key}, task_id, user.id, user.role)
+            else:
+                task.apply_async(args=args, kwargs={'single_flight_key': key}, task_id=task_id)
+            return task_id, False
+
+def release_single_flight(key, task_id):
+    """Drop the in-flight entry if it still belongs to `task_id`."""
+    if not key:
+        return
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.get(key) == task_id:
+                pipe.multi()
+                pipe.delete(key)
+                pipe.execute()
+        except redis.WatchError:
+            # Someone else replaced the key; it expires on its own
+            pass
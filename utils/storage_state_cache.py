@@ -0,0 +1,150 @@
+"""
+On-disk cache of authenticated Playwright storage states.
+
+Entries are keyed by site origin and test account, so scripts that share a
+login (cart, checkout, invalid_payment, ...) can start from a cached session
+instead of repeating the login steps. An entry expires after its TTL or as
+soon as one of the origin's cookies expires.
+
+Only scripts that opt in with `STORED_SESSION = True` and name their test
+account use the cache; failed-login and guest scenarios must start signed out.
+A sharded script skips setup on a hit; any other script is started from the
+cached state and must check whether it is already signed in. A passing run
+saves the session it ended with. A run that fails after its cached session was
+rejected (a 401 from the site or a landing on the login page) invalidates it
+and is retried once without it.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from urllib.parse import urlsplit
+from utils.script_ast import parse_script
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('STORAGE_STATE_CACHE_DIR') or os.path.join(PROJECT_ROOT, 'instance', 'storage_state')
+DEFAULT_TTL = int(os.environ.get('STORAGE_STATE_TTL') or 3600)
+ENABLED = (os.environ.get('STORAGE_STATE_CACHE') or 'true').lower() == 'true'
+
+OPT_IN_NAME = 'STORED_SESSION'
+ORIGIN_NAMES = ('ORIGIN', 'BASE_URL')
+ACCOUNT_NAMES = ('TEST_ACCOUNT', 'USERNAME')
+LOGIN_URL_NAME = 'LOGIN_URL'
+# Login pages of sites that do not declare LOGIN_URL
+LOGIN_PATH = re.compile(r'(^|/)(log-?in|sign-?in|sign_in|auth)(/|\.|$)', re.IGNORECASE)
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}' if parts.scheme and parts.netloc else None
+
+def _entry_path(origin, account):
+    key = hashlib.sha256(f'{origin}|{account}'.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f'{key}.json')
+
+def script_identity(script):
+    """
+    Work out (origin, account, login_url) for a script that opts into the cache,
+    or None. A script opts in with `STORED_SESSION = True` and a TEST_ACCOUNT/
+    USERNAME constant. The origin comes from an ORIGIN/BASE_URL constant, otherwise
+    the first page.goto() URL; LOGIN_URL is optional.
+    """
+    try:
+        tree = parse_script(script)
+    except SyntaxError:
+        return None
+
+    opted_in = False
+    origin = account = login_url = None
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or not isinstance(node.value, ast.Constant):
+            continue
+        names = [t.id for t in node.targets if isinstance(t, ast.Name)]
+        if OPT_IN_NAME in names:
+            opted_in = node.value.value is True
+        if not isinstance(node.value.value, str):
+            continue
+        if origin is None and any(n in ORIGIN_NAMES for n in names):
+            origin = _origin(node.value.value)
+        if account is None and any(n in ACCOUNT_NAMES for n in names):
+            account = node.value.value
+        if LOGIN_URL_NAME in names:
+            login_url = node.value.value
+    if not opted_in or not account:
+        return None
+
+    if origin is None:
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'goto'
+                    and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+                origin = _origin(node.args[0].value)
+                if origin:
+                    break
+
+    return (origin, account, login_url) if origin else None
+
+def is_login_page(url, login_url=None):
+    """True when `url` is the site's login page: LOGIN_URL when declared, else a /login-like path."""
+    parts = urlsplit(url)
+    if login_url:
+        login = urlsplit(login_url)
+        return (parts.scheme, parts.netloc, parts.path.rstrip('/')) == (login.scheme, login.netloc, login.path.rstrip('/'))
+    return bool(LOGIN_PATH.search(parts.path))
+
+def session_rejected(run):
+    """True when a run that started from a cached session saw the site reject it (see script_bootstrap)."""
+    return bool(((run.get('stats') or {}).get('runner') or {}).get('session_expired'))
+
+def is_expired(entry, now=None, ttl=DEFAULT_TTL):
+    """An entry is stale once its TTL passes or any of the origin's cookies expire."""
+    now = now or time.time()
+    if entry.get('saved_at', 0) + ttl < now:
+        return True
+    host = urlsplit(entry.get('origin') or '').hostname or ''
+    for cookie in entry.get('state', {}).get('cookies', []):
+        expires = cookie.get('expires', -1)
+        domain = cookie.get('domain', '').lstrip('.')
+        if expires and expires > 0 and expires < now and (not domain or host.endswith(domain)):
+            return True
+    return False
+
+def load(origin, account, ttl=DEFAULT_TTL):
+    """Return the cached storage state dict, or None when missing or expired."""
+    if not origin:
+        return None
+    path = _entry_path(origin, account)
+    try:
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if is_expired(entry, ttl=ttl):
+        invalidate(origin, account)
+        return None
+    return entry['state']
+
+def save(origin, account, state):
+    """Store a storage state (dict or path to a storage_state file)."""
+    if not origin:
+        return
+    if isinstance(state, str):
+        with open(state, encoding='utf-8') as f:
+            state = json.load(f)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = {'origin': origin, 'account': account, 'saved_at': time.time(), 'state': state}
+    # Write then rename so concurrent readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, _entry_path(origin, account))
+
+def invalidate(origin, account):
+    """Drop a cached entry, e.g. after the site rejected it."""
+    try:
+        os.unlink(_entry_path(origin, account))
+    except OSError:
+        pass
@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import re
+
+BROWSERS = ('chromium', 'firefox', 'webkit')
+REQUIREMENT_PATTERN = re.compile(r'^[a-zA-Z0-9\s\.,!?\'"_\-@/:]+$')
+# Tags the tasks put in front of saved history requirements
+HISTORY_PREFIXES = ('[SUITE]', '[CODE GEN]')
+# Submitted suites (owner, items and chunk task ids) and their item results are kept in Redis for status lookups
+SUITE_PREFIX = 'suite:'
+SUITE_TTL = 7 * 86400
+
+class SuiteValidationError(ValueError):
+    """Raised when a batch suite submission is malformed."""
+
+def _check_requirement(requirement):
+    # Same constraints as GenerateForm.requirement
+    if not 10 <= len(requirement) <= 1000:
+        raise SuiteValidationError(f'Requirement must be between 10 and 1000 characters: {requirement[:50]!r}')
+    if not REQUIREMENT_PATTERN.match(requirement):
+        raise SuiteValidationError(f'Requirement contains invalid characters: {requirement[:50]!r}')
+
+def history_requirement(requirement):
+    """The requirement as it was submitted, without the tag its history entry was saved with."""
+    requirement = (requirement or '').strip()
+    while requirement.startswith(HISTORY_PREFIXES):
+        prefix = next(p for p in HISTORY_PREFIXES if requirement.startswith(p))
+        requirement = requirement[len(prefix):].strip()
+    return requirement
+
+def _check_browsers(browsers):
+    for browser in browsers:
+        if browser not in BROWSERS:
+            raise SuiteValidationError(f'Unsupported browser: {browser!r}')
+
+def parse_suite_items(payload=None, csv_text=None, max_items=500):
+    """
+    Expand a suite submission into a list of (requirement, browser) items.
+    Accepts a JSON payload with "requirements" and optional "browsers", or CSV
+    text with a "requirement" column and an optional "browser" column.
+    """
+    payload = payload or {}
+    default_browsers = payload.get('browsers') or ['chromium']
+    _check_browsers(default_browsers)
+
+    items = []
+    if csv_text is not None:
+        reader = csv.DictReader(io.StringIO(csv_text))
+        if not reader.fieldnames or 'requirement' not in reader.fieldnames:
+            raise SuiteValidationError('CSV must have a "requirement" column.')
+        for row in reader:
+            requirement = (row.get('requirement') or '').strip()
+            if not requirement:
+                continue
+            browsers = [row['browser'].strip()] if (row.get('browser') or '').strip() else default_browsers
+            _check_requirement(requirement)
+            _check_browsers(browsers)
+            items.extend((requirement, browser) for browser in browsers)
+    else:
+        requirements = payload.get('requirements') or []
+        if not isinstance(requirements, list):
+            raise SuiteValidationError('"requirements" must be a list.')
+        for requirement in requirements:
+            requirement = str(requirement).strip()
+            _check_requirement(requirement)
+            items.extend((requirement, browser) for browser in default_browsers)
+
+    if not items:
+        raise SuiteValidationError('Suite contains no requirements.')
+    if len(items) > max_items:
+        raise SuiteValidationError(f'Suite has {len(items)} items; the limit is {max_items}.')
+    return items
+
+def chunk_size_for(item_count, max_concurrency, max_size):
+    """
+    Chunk size that spreads a small suite over `max_concurrency` chunks. A chunk
+    never holds more than `max_size` items: they all run side by side, so a chunk
+    takes as long as its slowest item and fits in one task's time limit.
+    """
+    return max(1, min(max_size, -(-item_count // max(1, max_concurrency))))
+
+def build_suite_report(results):
+    """Aggregate per-item results into a suite-level report."""
+    total = len(results)
+    passed = sum(1 for r in results if r.get('passed'))
+    errored = sum(1 for r in results if r.get('error'))
+    failed = total - passed - errored
+
+    by_browser = {}
+    for r in results:
+        entry = by_browser.setdefault(r.get('browser') or 'unknown', {'total': 0, 'passed': 0})
+        entry['total'] += 1
+        entry['passed'] += 1 if r.get('passed') else 0
+
+    durations = [r.get('duration', 0.0) for r in results]
+    slowest = sorted(results, key=lambda r: r.get('duration', 0.0), reverse=True)[:5]
+
+    return {
+        'total': total,
+        'passed': passed,
+        'failed': failed,
+        'errored': errored,
+        'pass_rate': round(passed / total * 100, 1) if total else 0.0,
+        'by_browser': by_browser,
+        'total_duration': round(sum(durations), 2),
+        'slowest': [
+            {'requirement': r.get('requirement'), 'browser': r.get('browser'), 'duration': r.get('duration')}
+            for r in slowest
+        ],
+        'failures': [
+            {'requirement': r.get('requirement'), 'browser': r.get('browser'),
+             'history_id': r.get('history_id'), 'error': r.get('error') or r.get('execution_result', '')[:500]}
+            for r in results if not r.get('passed')
+        ]
+    }
+
+def save_suite(suite_id, suite):
+    from extensions import redis_client
+    redis_client.set(f'{SUITE_PREFIX}{suite_id}', json.dumps(suite), ex=SUITE_TTL)
+
+def load_suite(suite_id):
+    """The stored suite record, or None when it is unknown or expired."""
+    from extensions import redis_client
+    data = redis_client.get(f'{SUITE_PREFIX}{suite_id}')
+    return json.loads(data) if data else None
+
+def save_suite_item(suite_id, index, item):
+    """Store one item's result as soon as it finishes, so a chunk that dies keeps what it completed."""
+    from extensions import redis_client
+    key = f'{SUITE_PREFIX}{suite_id}:items'
+    pipe = redis_client.pipeline()
+    pipe.hset(key, str(index), json.dumps(item))
+    pipe.expire(key, SUITE_TTL)
+    pipe.execute()
+
+def load_suite_items(suite_id):
+    """Stored item results of a suite, by item index."""
+    from extensions import redis_client
+    return {int(index): json.loads(item) for index, item in redis_client.hgetall(f'{SUITE_PREFIX}{suite_id}:items').items()}
+
+def collect_items(suite, stored, failed_chunks):
+    """
+    Item results of a suite in submission order: the stored ones, and an error for
+    each item of a chunk that died before storing it (`failed_chunks` maps chunk
+    index -> error). Items still queued or running are left out.
+    """
+    items = []
+    for index, (requirement, browser) in enumerate(suite['items']):
+        chunk = index // suite['chunk_size']
+        if index in stored:
+            items.append(stored[index])
+        elif chunk in failed_chunks:
+            items.append({'requirement': requirement, 'browser': browser, 'passed': False,
+                          'error': f"The suite chunk failed: {failed_chunks[chunk]}", 'duration': 0.0})
+    return items